@@ -0,0 +1,40 @@
+"""Job worker lease columns
+
+Revision ID: 002_job_worker_lease
+Revises: 001_initial
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '002_job_worker_lease'
+down_revision: Union[str, None] = '001_initial'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Columnas para que los workers reclamen jobs y reporten heartbeats
+    op.add_column('jobs', sa.Column('worker_id', sa.String(length=255), nullable=True))
+    op.add_column('jobs', sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('jobs', sa.Column('attempts', sa.Integer(), server_default='0', nullable=False))
+
+    # Índice para la cola: jobs en cola ordenados por antigüedad
+    op.create_index(
+        'ix_jobs_queued_created_at',
+        'jobs',
+        ['created_at'],
+        unique=False,
+        postgresql_where=sa.text("status = 'QUEUED'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_jobs_queued_created_at', table_name='jobs')
+    op.drop_column('jobs', 'attempts')
+    op.drop_column('jobs', 'heartbeat_at')
+    op.drop_column('jobs', 'worker_id')
@@ -0,0 +1,39 @@
+"""Keyset pagination indexes
+
+Revision ID: 003_pagination_indexes
+Revises: 002_job_worker_lease
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '003_pagination_indexes'
+down_revision: Union[str, None] = '002_job_worker_lease'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # GET /jobs: WHERE user_id = ? ORDER BY created_at DESC, id DESC
+    op.create_index(
+        'ix_jobs_user_id_created_at_id',
+        'jobs',
+        ['user_id', 'created_at', 'id'],
+        unique=False,
+    )
+
+    # GET /jobs/{id}/findings: WHERE job_id = ? ORDER BY severity DESC, created_at DESC, id DESC
+    op.create_index(
+        'ix_findings_job_id_severity_created_at_id',
+        'findings',
+        ['job_id', 'severity', 'created_at', 'id'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_findings_job_id_severity_created_at_id', table_name='findings')
+    op.drop_index('ix_jobs_user_id_created_at_id', table_name='jobs')
@@ -0,0 +1,51 @@
+"""Per-user findings rollup for metrics
+
+Revision ID: 004_finding_rollups
+Revises: 003_pagination_indexes
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '004_finding_rollups'
+down_revision: Union[str, None] = '003_pagination_indexes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'finding_rollups',
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('tool', sa.String(length=100), nullable=False),
+        sa.Column(
+            'severity',
+            postgresql.ENUM('INFO', 'LOW', 'MEDIUM', 'HIGH', 'CRITICAL', name='findingseverity', create_type=False),
+            nullable=False
+        ),
+        sa.Column('target_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('count', sa.BigInteger(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['target_id'], ['targets.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'day', 'tool', 'severity', 'target_id')
+    )
+    op.create_index('ix_finding_rollups_user_id_day', 'finding_rollups', ['user_id', 'day'], unique=False)
+
+    # Backfill con el histórico existente (equivale a python -m app.services.metrics_rollup)
+    op.execute("""
+        INSERT INTO finding_rollups (user_id, day, tool, severity, target_id, count)
+        SELECT jobs.user_id, date(findings.created_at), findings.tool, findings.severity, jobs.target_id, count(findings.id)
+        FROM findings JOIN jobs ON findings.job_id = jobs.id
+        GROUP BY jobs.user_id, date(findings.created_at), findings.tool, findings.severity, jobs.target_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_finding_rollups_user_id_day', table_name='finding_rollups')
+    op.drop_table('finding_rollups')
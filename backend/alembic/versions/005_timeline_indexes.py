@@ -0,0 +1,26 @@
+"""Index for the hourly metrics timeline
+
+Revision ID: 005_timeline_indexes
+Revises: 004_finding_rollups
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '005_timeline_indexes'
+down_revision: Union[str, None] = '004_finding_rollups'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # GET /metrics/timeline?granularity=hour: findings WHERE created_at >= inicio de la ventana.
+    # El lado de jobs usa ix_jobs_user_id_created_at_id (003) y el de día/semana el rollup (004).
+    op.create_index('ix_findings_created_at', 'findings', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_findings_created_at', table_name='findings')
@@ -0,0 +1,105 @@
+"""Denormalize user_id / target_id onto findings
+
+Revision ID: 006_findings_owner_columns
+Revises: 005_timeline_indexes
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '006_findings_owner_columns'
+down_revision: Union[str, None] = '005_timeline_indexes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Filas actualizadas por transacción durante el backfill
+BACKFILL_BATCH_SIZE = 10000
+
+
+def upgrade() -> None:
+    # Columnas nullable: ADD COLUMN sin default no reescribe la tabla
+    op.add_column('findings', sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=True))
+    op.add_column('findings', sa.Column('target_id', postgresql.UUID(as_uuid=True), nullable=True))
+
+    # Las FKs se crean NOT VALID (sin recorrer la tabla) y se validan al final
+    op.execute(
+        "ALTER TABLE findings ADD CONSTRAINT findings_user_id_fkey "
+        "FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE NOT VALID"
+    )
+    op.execute(
+        "ALTER TABLE findings ADD CONSTRAINT findings_target_id_fkey "
+        "FOREIGN KEY (target_id) REFERENCES targets (id) ON DELETE CASCADE NOT VALID"
+    )
+
+    with op.get_context().autocommit_block():
+        # Backfill por lotes, cada uno en su propia transacción: los bloqueos
+        # de fila duran un lote y los escaneos pueden seguir insertando
+        connection = op.get_bind()
+        while True:
+            result = connection.execute(sa.text("""
+                UPDATE findings
+                SET user_id = jobs.user_id, target_id = jobs.target_id
+                FROM jobs
+                WHERE findings.job_id = jobs.id
+                  AND findings.id IN (
+                      SELECT id FROM findings WHERE user_id IS NULL LIMIT :batch_size
+                  )
+            """), {"batch_size": BACKFILL_BATCH_SIZE})
+            if result.rowcount == 0:
+                break
+
+        op.execute("ALTER TABLE findings VALIDATE CONSTRAINT findings_user_id_fkey")
+        op.execute("ALTER TABLE findings VALIDATE CONSTRAINT findings_target_id_fkey")
+
+        # NOT NULL sin recorrer la tabla con ACCESS EXCLUSIVE: un CHECK
+        # validado aparte permite a PostgreSQL omitir el recorrido
+        op.execute(
+            "ALTER TABLE findings ADD CONSTRAINT findings_owner_not_null "
+            "CHECK (user_id IS NOT NULL AND target_id IS NOT NULL) NOT VALID"
+        )
+        op.execute("ALTER TABLE findings VALIDATE CONSTRAINT findings_owner_not_null")
+        op.execute("ALTER TABLE findings ALTER COLUMN user_id SET NOT NULL")
+        op.execute("ALTER TABLE findings ALTER COLUMN target_id SET NOT NULL")
+        op.execute("ALTER TABLE findings DROP CONSTRAINT findings_owner_not_null")
+
+        # Índices de métricas sin bloquear escrituras
+        op.create_index(
+            'ix_findings_user_id_severity', 'findings', ['user_id', 'severity'],
+            unique=False, postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_findings_user_id_tool', 'findings', ['user_id', 'tool'],
+            unique=False, postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_findings_user_id_created_at', 'findings', ['user_id', 'created_at'],
+            unique=False, postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_findings_target_id', 'findings', ['target_id'],
+            unique=False, postgresql_concurrently=True
+        )
+        # Sustituido por (user_id, created_at)
+        op.drop_index('ix_findings_created_at', table_name='findings', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_findings_created_at', 'findings', ['created_at'],
+            unique=False, postgresql_concurrently=True
+        )
+        op.drop_index('ix_findings_target_id', table_name='findings', postgresql_concurrently=True)
+        op.drop_index('ix_findings_user_id_created_at', table_name='findings', postgresql_concurrently=True)
+        op.drop_index('ix_findings_user_id_tool', table_name='findings', postgresql_concurrently=True)
+        op.drop_index('ix_findings_user_id_severity', table_name='findings', postgresql_concurrently=True)
+
+    op.drop_constraint('findings_target_id_fkey', 'findings', type_='foreignkey')
+    op.drop_constraint('findings_user_id_fkey', 'findings', type_='foreignkey')
+    op.drop_column('findings', 'target_id')
+    op.drop_column('findings', 'user_id')
@@ -0,0 +1,133 @@
+"""Monthly range partitioning of findings on created_at
+
+Revision ID: 007_partition_findings
+Revises: 006_findings_owner_columns
+Create Date: 2026-10-18
+
+"""
+from datetime import date, datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '007_partition_findings'
+down_revision: Union[str, None] = '006_findings_owner_columns'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Meses futuros con partición creada de antemano (el worker mantiene el resto)
+PARTITIONS_AHEAD = 3
+
+_COLUMNS = (
+    "id, job_id, user_id, target_id, severity, title, description, "
+    "evidence, recommendation, tool, created_at"
+)
+
+# Índices de la tabla findings (se recrean sobre la tabla particionada)
+_INDEXES = [
+    ('ix_findings_id', ['id']),
+    ('ix_findings_job_id', ['job_id']),
+    ('ix_findings_severity', ['severity']),
+    ('ix_findings_tool', ['tool']),
+    ('ix_findings_job_id_severity_created_at_id', ['job_id', 'severity', 'created_at', 'id']),
+    ('ix_findings_user_id_severity', ['user_id', 'severity']),
+    ('ix_findings_user_id_tool', ['user_id', 'tool']),
+    ('ix_findings_user_id_created_at', ['user_id', 'created_at']),
+    ('ix_findings_target_id', ['target_id']),
+]
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _create_partition(month: date) -> None:
+    upper = _add_months(month, 1)
+    op.execute(
+        f"CREATE TABLE findings_y{month.year:04d}m{month.month:02d} PARTITION OF findings "
+        f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{upper.isoformat()} 00:00:00+00')"
+    )
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    oldest = connection.execute(sa.text(
+        "SELECT min(created_at) AT TIME ZONE 'UTC' FROM findings"
+    )).scalar()
+    today = datetime.now(timezone.utc).date()
+    current = date(today.year, today.month, 1)
+    first = date(oldest.year, oldest.month, 1) if oldest else current
+
+    # Tabla nueva particionada por mes. La PK debe incluir la clave de partición.
+    op.execute("""
+        CREATE TABLE findings_partitioned (
+            id UUID NOT NULL,
+            job_id UUID NOT NULL CONSTRAINT findings_job_id_fkey REFERENCES jobs (id) ON DELETE CASCADE,
+            user_id UUID NOT NULL CONSTRAINT findings_user_id_fkey REFERENCES users (id) ON DELETE CASCADE,
+            target_id UUID NOT NULL CONSTRAINT findings_target_id_fkey REFERENCES targets (id) ON DELETE CASCADE,
+            severity findingseverity NOT NULL,
+            title VARCHAR(500) NOT NULL,
+            description TEXT,
+            evidence TEXT,
+            recommendation TEXT,
+            tool VARCHAR(100) NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+            CONSTRAINT findings_partitioned_pkey PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+
+    # RENAME exige ACCESS EXCLUSIVE: se toma desde el principio (sin escalar
+    # desde un bloqueo menor) y lecturas y escrituras de findings esperan
+    # hasta el commit de la migración, así ningún finding queda sin copiar
+    op.execute("LOCK TABLE findings IN ACCESS EXCLUSIVE MODE")
+    op.execute("ALTER TABLE findings RENAME TO findings_legacy")
+    op.execute("ALTER TABLE findings_partitioned RENAME TO findings")
+
+    month = first
+    while month <= _add_months(current, PARTITIONS_AHEAD):
+        _create_partition(month)
+        month = _add_months(month, 1)
+    # Filas fuera de los meses creados (p. ej. created_at muy futuro): el
+    # worker las mueve a su partición cuando la crea
+    op.execute("CREATE TABLE findings_default PARTITION OF findings DEFAULT")
+
+    # Copia única; los índices se crean después, más rápido que mantenerlos fila a fila
+    op.execute(f"INSERT INTO findings ({_COLUMNS}) SELECT {_COLUMNS} FROM findings_legacy")
+    op.execute("DROP TABLE findings_legacy")
+    op.execute("ALTER TABLE findings RENAME CONSTRAINT findings_partitioned_pkey TO findings_pkey")
+
+    for name, columns in _INDEXES:
+        op.create_index(name, 'findings', columns, unique=False)
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE findings RENAME TO findings_partitioned")
+    op.execute("ALTER TABLE findings_partitioned RENAME CONSTRAINT findings_pkey TO findings_partitioned_pkey")
+    for name, _ in _INDEXES:
+        op.execute(f"ALTER INDEX {name} RENAME TO {name}_partitioned")
+
+    op.execute("""
+        CREATE TABLE findings (
+            id UUID NOT NULL,
+            job_id UUID NOT NULL CONSTRAINT findings_job_id_fkey REFERENCES jobs (id) ON DELETE CASCADE,
+            user_id UUID NOT NULL CONSTRAINT findings_user_id_fkey REFERENCES users (id) ON DELETE CASCADE,
+            target_id UUID NOT NULL CONSTRAINT findings_target_id_fkey REFERENCES targets (id) ON DELETE CASCADE,
+            severity findingseverity NOT NULL,
+            title VARCHAR(500) NOT NULL,
+            description TEXT,
+            evidence TEXT,
+            recommendation TEXT,
+            tool VARCHAR(100) NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+            CONSTRAINT findings_pkey PRIMARY KEY (id)
+        )
+    """)
+    op.execute(f"INSERT INTO findings ({_COLUMNS}) SELECT {_COLUMNS} FROM findings_partitioned")
+    # Elimina también todas las particiones
+    op.execute("DROP TABLE findings_partitioned")
+
+    for name, columns in _INDEXES:
+        op.create_index(name, 'findings', columns, unique=False)
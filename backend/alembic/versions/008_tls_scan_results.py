@@ -0,0 +1,37 @@
+"""TLS scan result cache and per-tool result origin on jobs
+
+Revision ID: 008_tls_scan_results
+Revises: 007_partition_findings
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '008_tls_scan_results'
+down_revision: Union[str, None] = '007_partition_findings'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'tls_scan_results',
+        sa.Column('hostname', sa.String(length=255), nullable=False),
+        sa.Column('port', sa.Integer(), nullable=False),
+        sa.Column('tool_version', sa.String(length=255), nullable=False),
+        sa.Column('output', sa.Text(), nullable=False),
+        sa.Column('scanned_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('hostname', 'port', 'tool_version')
+    )
+
+    # Origen del resultado de cada herramienta (escaneo o caché)
+    op.add_column('jobs', sa.Column('tool_results', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('jobs', 'tool_results')
+    op.drop_table('tls_scan_results')
@@ -0,0 +1,53 @@
+"""Single-flight deduplication of identical in-flight jobs
+
+Revision ID: 009_job_dedup
+Revises: 008_tls_scan_results
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '009_job_dedup'
+down_revision: Union[str, None] = '008_tls_scan_results'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Los jobs existentes quedan sin clave: nunca actúan como líderes
+    op.add_column('jobs', sa.Column('dedup_key', sa.String(length=64), nullable=True))
+    op.add_column('jobs', sa.Column('leader_job_id', postgresql.UUID(as_uuid=True), nullable=True))
+    op.create_foreign_key(
+        'jobs_leader_job_id_fkey', 'jobs', 'jobs', ['leader_job_id'], ['id'], ondelete='SET NULL'
+    )
+
+    # create_job: líder en curso con la misma clave
+    op.create_index(
+        'ix_jobs_dedup_key_inflight',
+        'jobs',
+        ['dedup_key'],
+        unique=False,
+        postgresql_where=sa.text("status IN ('QUEUED', 'RUNNING') AND leader_job_id IS NULL"),
+    )
+
+    # Seguidores de un líder al terminar o reencolarse
+    op.create_index(
+        'ix_jobs_leader_job_id',
+        'jobs',
+        ['leader_job_id'],
+        unique=False,
+        postgresql_where=sa.text("leader_job_id IS NOT NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_jobs_leader_job_id', table_name='jobs')
+    op.drop_index('ix_jobs_dedup_key_inflight', table_name='jobs')
+    op.drop_constraint('jobs_leader_job_id_fkey', 'jobs', type_='foreignkey')
+    op.drop_column('jobs', 'leader_job_id')
+    op.drop_column('jobs', 'dedup_key')
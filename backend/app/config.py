@@ -15,6 +15,17 @@ class Settings(BaseSettings):
     postgres_password: str
     postgres_db: str
     postgres_port: int = 5432
+    async_database_url: Optional[str] = None  # Por defecto: DATABASE_URL con driver asyncpg
+    
+    # Pool de conexiones de la API (cada engine, síncrono y asíncrono)
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: int = 30  # Segundos esperando una conexión libre
+    db_pool_recycle: int = 1800  # Reabrir conexiones más antiguas (segundos)
+    
+    # Pool de conexiones de los workers de escaneo
+    worker_db_pool_size: int = 10
+    worker_db_max_overflow: int = 5
     
     # API
     api_host: str = "0.0.0.0"
@@ -26,6 +37,30 @@ class Settings(BaseSettings):
     jwt_algorithm: str = "HS256"
     jwt_access_token_expire_minutes: int = 30
     
+    # Hashing de contraseñas
+    bcrypt_rounds: int = 12  # Factor de trabajo de bcrypt
+    password_hash_workers: int = 4  # Hilos dedicados a bcrypt por proceso
+    password_hash_max_pending: int = 32  # Por encima se responde 429
+    
+    # Caché de autenticación (por proceso)
+    auth_cache_ttl_seconds: int = 60
+    auth_cache_max_entries: int = 10000
+    
+    # Caché de respuestas de /metrics (por proceso, invalidada vía NOTIFY)
+    metrics_cache_ttl_seconds: int = 300
+    metrics_cache_max_entries: int = 10000
+    metrics_timeline_max_days: int = 366  # Ventana máxima de /metrics/timeline
+    metrics_timeline_max_buckets: int = 744  # Puntos máximos (p. ej. 31 días por hora)
+    
+    # Paginación (GET /jobs, GET /jobs/{id}/findings)
+    pagination_default_limit: int = 100
+    pagination_max_limit: int = 500
+    
+    # Exportación de findings (GET /jobs/{id}/findings/export)
+    reports_dir: str = "/app/reports"  # Volumen ./reports de docker-compose
+    export_batch_size: int = 1000  # Filas leídas por vuelta del cursor de servidor
+    gzip_minimum_size: int = 1024  # Respuestas más pequeñas no se comprimen
+    
     # Seguridad
     allowed_scan_domains: str = "localhost,127.0.0.1"
     scan_timeout_seconds: int = 300
@@ -34,7 +69,70 @@ class Settings(BaseSettings):
     zap_baseline_timeout: int = 300
     nuclei_timeout: int = 300
     nuclei_rate_limit: int = 150
+    nuclei_stream_batch_size: int = 100  # Findings por lote insertado durante el escaneo
+    nuclei_batch_enabled: bool = False  # Agrupar targets de varios jobs en una ejecución con -l
+    nuclei_batch_max_targets: int = 50
+    nuclei_batch_max_wait_seconds: float = 5.0  # Espera máxima del primer target de un lote
+    nuclei_batch_timeout: int = 1800  # Timeout de la ejecución de un lote completo
     sslyze_timeout: int = 120
+    sslyze_backend: str = "docker"  # "docker" (contenedor por escaneo) o "python" (API de sslyze en procesos)
+    sslyze_process_workers: int = 2  # Procesos del backend "python"
+    sslyze_batch_size: int = 16  # Hostnames máximos por instancia de sslyze.Scanner
+    tls_cache_ttl_seconds: int = 21600  # Reutilizar resultados TLS por hostname (0 = desactivado)
+    
+    # Ingesta de findings
+    findings_insert_batch_size: int = 500  # Filas por INSERT multi-fila
+    findings_copy_threshold: int = 5000  # A partir de aquí se usa COPY
+    
+    # Particiones mensuales de findings (mantenidas por el worker)
+    findings_partitions_ahead: int = 3  # Meses futuros con partición ya creada
+    findings_retention_months: int = 0  # > 0: desadjuntar particiones más antiguas
+    findings_drop_detached: bool = False  # Eliminar en lugar de conservar para archivar
+    findings_partition_check_seconds: int = 3600
+    
+    # Docker
+    docker_base_url: str = "unix:///var/run/docker.sock"
+    docker_max_pool_size: int = 10  # Conexiones HTTP simultáneas al socket
+    docker_api_timeout: int = 900  # Mínimo; se amplía hasta cubrir los timeouts de Nuclei
+    docker_health_check_interval_seconds: int = 30
+    
+    # Imágenes de scanners
+    scanner_state_dir: str = "/app/state"  # Estado compartido entre API y workers
+    scanner_images_offline: bool = False  # Nodo sin red: usar solo imágenes locales
+    scanner_image_refresh_seconds: int = 21600  # Re-descarga periódica de tags
+    
+    # Directorio de trabajo montado en los contenedores de scanners.
+    # Debe existir con la MISMA ruta en el host y en el worker.
+    scanner_work_dir: str = "/tmp/auditor-scans"
+    
+    # Caché de plantillas de Nuclei y add-ons de ZAP, montada en solo lectura
+    # en los escaneos. También con la MISMA ruta en el host y en el worker.
+    scanner_cache_dir: str = "/var/cache/auditor-scanners"
+    scanner_data_refresh_seconds: int = 21600  # Actualización periódica de plantillas/add-ons
+    scanner_data_update_timeout: int = 900
+    scanner_data_keep_versions: int = 2  # Versiones anteriores que aún pueden usar escaneos en curso
+    
+    # Pool de contenedores precalentados (ZAP daemon, Nuclei con plantillas)
+    scanner_warm_pool_enabled: bool = False
+    warm_pool_zap_size: int = 1
+    warm_pool_nuclei_size: int = 2
+    warm_pool_idle_seconds: int = 900  # Contenedores ociosos más tiempo se eliminan
+    warm_pool_start_timeout: int = 180  # Espera máxima a que un contenedor esté listo
+    warm_pool_zap_base_port: int = 18080  # Los daemons ZAP usan la red del host
+    warm_pool_zap_port_range: int = 100
+    
+    # Instancias simultáneas de cada herramienta por proceso worker
+    zap_max_concurrency: int = 1  # Cada contenedor ZAP reserva 2g de memoria
+    nuclei_max_concurrency: int = 2
+    sslyze_max_concurrency: int = 4
+    
+    # Workers de escaneo
+    worker_concurrency: int = 2  # Jobs simultáneos por nodo worker
+    worker_poll_interval_seconds: float = 2.0
+    worker_heartbeat_interval_seconds: int = 15
+    worker_lease_timeout_seconds: int = 120  # Sin heartbeat durante este tiempo => worker caído
+    worker_max_attempts: int = 3  # Reintentos antes de marcar el job como failed
+    job_dedup_enabled: bool = True  # Jobs idénticos en curso comparten una sola ejecución
     
     class Config:
         env_file = ".env"
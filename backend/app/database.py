@@ -2,21 +2,138 @@
 Configuración de base de datos
 SQLAlchemy setup y sesión
 """
-from sqlalchemy import create_engine
+import threading
+import time
+from typing import Any, Dict
+
+from sqlalchemy import create_engine, exc
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from app.config import settings
 
+
+class _CheckoutMetricsMixin:
+    """Mide la latencia de obtener una conexión del pool y los timeouts"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._metrics_lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_seconds_total = 0.0
+        self.checkout_seconds_max = 0.0
+        self.checkout_timeouts = 0
+    
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            with self._metrics_lock:
+                self.checkout_timeouts += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._metrics_lock:
+                self.checkouts += 1
+                self.checkout_seconds_total += elapsed
+                self.checkout_seconds_max = max(self.checkout_seconds_max, elapsed)
+
+
+class InstrumentedQueuePool(_CheckoutMetricsMixin, QueuePool):
+    """QueuePool con métricas de checkout"""
+
+
+class InstrumentedAsyncQueuePool(_CheckoutMetricsMixin, AsyncAdaptedQueuePool):
+    """Pool del engine asíncrono con métricas de checkout"""
+
+
+def _pool_options(pool_size: int, max_overflow: int) -> Dict[str, Any]:
+    return {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": True,  # Verificar conexiones antes de usarlas
+    }
+
+
 # Crear engine
 engine = create_engine(
     settings.database_url,
-    pool_pre_ping=True,  # Verificar conexiones antes de usarlas
+    poolclass=InstrumentedQueuePool,
     echo=False,  # Cambiar a True para ver queries SQL en desarrollo
+    **_pool_options(settings.db_pool_size, settings.db_max_overflow)
 )
 
 # SessionLocal para crear sesiones
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Engine propio de los workers de escaneo: sus sesiones largas no compiten
+# por el pool de la API (solo abre conexiones en el proceso que lo usa)
+worker_engine = create_engine(
+    settings.database_url,
+    poolclass=InstrumentedQueuePool,
+    echo=False,
+    **_pool_options(settings.worker_db_pool_size, settings.worker_db_max_overflow)
+)
+
+WorkerSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=worker_engine)
+
+
+def _async_database_url() -> str:
+    """URL para el driver asyncpg (derivada de DATABASE_URL si no se configura)"""
+    if settings.async_database_url:
+        return settings.async_database_url
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if settings.database_url.startswith(prefix):
+            return "postgresql+asyncpg://" + settings.database_url[len(prefix):]
+    return settings.database_url
+
+
+# Engine asíncrono para los endpoints de lectura más consultados (polling).
+# Convive con el engine síncrono, que siguen usando escrituras y workers.
+async_engine = create_async_engine(
+    _async_database_url(),
+    poolclass=InstrumentedAsyncQueuePool,
+    echo=False,
+    **_pool_options(settings.db_pool_size, settings.db_max_overflow)
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+
+def pool_stats(sync_engine) -> Dict[str, Any]:
+    """
+    Estado del pool de conexiones de un engine
+    
+    Returns:
+        Tamaño configurado, conexiones en uso, overflow y latencia de checkout
+    """
+    pool = sync_engine.pool
+    stats = {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "max_overflow": pool._max_overflow,
+    }
+    if isinstance(pool, _CheckoutMetricsMixin):
+        with pool._metrics_lock:
+            stats.update({
+                "checkouts": pool.checkouts,
+                "checkout_avg_ms": round(1000 * pool.checkout_seconds_total / pool.checkouts, 3) if pool.checkouts else 0.0,
+                "checkout_max_ms": round(1000 * pool.checkout_seconds_max, 3),
+                "checkout_timeouts": pool.checkout_timeouts,
+            })
+    return stats
+
 # Base para modelos
 Base = declarative_base()
 
@@ -33,7 +150,16 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """
+    Dependency para obtener una sesión asíncrona de BD
+    Usar en endpoints `async def` para no bloquear el event loop
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 # Importar todos los modelos para que SQLAlchemy los registre
 # Esto es necesario para que Alembic pueda detectarlos
-from app.models import User, Target, Job, Finding  # noqa: F401, E402
+from app.models import User, Target, Job, Finding, FindingRollup, TlsScanResult  # noqa: F401, E402
 
@@ -4,6 +4,7 @@ FastAPI application entry point
 """
 from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from sqlalchemy.orm import Session
 
 from app.database import get_db
@@ -22,8 +23,29 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # Cursor de paginación legible desde el navegador
 )
 
+# Compresión gzip (incluye las exportaciones en streaming) si el cliente la acepta
+app.add_middleware(GZipMiddleware, minimum_size=settings.gzip_minimum_size)
+
+
+@app.on_event("startup")
+async def start_metrics_listener():
+    """Escuchar los avisos de invalidación de métricas que emiten los workers"""
+    from app.database import _async_database_url
+    from app.services.metrics_cache import MetricsInvalidationListener
+    
+    app.state.metrics_listener = MetricsInvalidationListener(
+        _async_database_url().replace("+asyncpg", "", 1)
+    )
+    app.state.metrics_listener.start()
+
+
+@app.on_event("shutdown")
+async def stop_metrics_listener():
+    await app.state.metrics_listener.stop()
+
 
 @app.get("/")
 async def root():
@@ -37,12 +59,59 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint (público)"""
-    return {"status": "healthy"}
+    """
+    Health check endpoint (público)
+    
+    Incluye el estado de pre-descarga de las imágenes de scanners y la
+    versión de plantillas/add-ons publicada por los workers.
+    """
+    from app.services.scanner_data import scanner_data
+    from app.services.scanner_images import image_registry
+    return {
+        "status": "healthy",
+        "scanner_images": image_registry.status(),
+        "scanner_data": scanner_data.status(),
+    }
+
+
+@app.get("/health/cache")
+async def health_check_cache():
+    """
+    Estadísticas de las cachés en memoria de este proceso
+    
+    Aciertos, fallos y desalojos de las cachés de autenticación y de
+    respuestas de /metrics.
+    """
+    from app.security.dependencies import user_cache
+    from app.security.jwt import token_cache
+    from app.services.metrics_cache import metrics_cache
+    return {
+        "auth_users": user_cache.stats(),
+        "auth_tokens": token_cache.stats(),
+        "metrics": {
+            **metrics_cache.stats(),
+            "listener_connected": app.state.metrics_listener.connected,
+        },
+    }
+
+
+@app.get("/health/db/pool")
+async def health_check_db_pool():
+    """
+    Métricas de los pools de conexiones de este proceso
+    
+    Conexiones en uso, overflow, latencia de checkout y timeouts,
+    para dimensionar DB_POOL_SIZE / DB_MAX_OVERFLOW.
+    """
+    from app.database import engine, async_engine, pool_stats
+    return {
+        "sync": pool_stats(engine),
+        "async": pool_stats(async_engine.sync_engine),
+    }
 
 
 @app.get("/health/db")
-async def health_check_db(db: Session = Depends(get_db)):
+def health_check_db(db: Session = Depends(get_db)):
     """
     Health check de base de datos
     
@@ -6,6 +6,8 @@ from app.models.user import User, UserRole
 from app.models.target import Target
 from app.models.job import Job, JobStatus
 from app.models.finding import Finding, FindingSeverity
+from app.models.finding_rollup import FindingRollup
+from app.models.tls_scan_result import TlsScanResult
 
 # Importar todos los modelos aquí para que Alembic los detecte
 __all__ = [
@@ -16,4 +18,6 @@ __all__ = [
     "JobStatus",
     "Finding",
     "FindingSeverity",
+    "FindingRollup",
+    "TlsScanResult",
 ]
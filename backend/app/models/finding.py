@@ -2,7 +2,7 @@
 Modelo de Finding
 Representa un hallazgo de seguridad encontrado por una herramienta
 """
-from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Enum, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -28,28 +28,45 @@ class Finding(Base):
     Campos:
     - id: UUID único del finding
     - job_id: UUID del job asociado (FK a jobs)
+    - user_id: UUID del usuario propietario del job (desnormalizado, FK a users)
+    - target_id: UUID del target del job (desnormalizado, FK a targets)
     - severity: Severidad del hallazgo (info, low, medium, high, critical)
     - title: Título del hallazgo
     - description: Descripción detallada
     - evidence: Evidencia del hallazgo (logs, datos técnicos)
     - recommendation: Recomendación para remediar
     - tool: Herramienta que detectó el hallazgo (ZAP, Nuclei, SSLyze, etc.)
-    - created_at: Fecha de creación
+    - created_at: Fecha de creación (clave de partición mensual)
     
     Relaciones:
     - job: Job asociado al finding
     """
     __tablename__ = "findings"
+    __table_args__ = (
+        # Paginación por cursor de GET /jobs/{id}/findings
+        Index("ix_findings_job_id_severity_created_at_id", "job_id", "severity", "created_at", "id"),
+        # Métricas filtradas por usuario sin pasar por jobs
+        Index("ix_findings_user_id_severity", "user_id", "severity"),
+        Index("ix_findings_user_id_tool", "user_id", "tool"),
+        Index("ix_findings_user_id_created_at", "user_id", "created_at"),
+        Index("ix_findings_target_id", "target_id"),
+        # Particiones mensuales (ver app/services/findings_partitions.py)
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
     job_id = Column(UUID(as_uuid=True), ForeignKey("jobs.id", ondelete="CASCADE"), nullable=False, index=True)
+    # Copias de jobs.user_id / jobs.target_id (se fijan al insertar)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    target_id = Column(UUID(as_uuid=True), ForeignKey("targets.id", ondelete="CASCADE"), nullable=False)
     severity = Column(Enum(FindingSeverity), nullable=False, index=True)
     title = Column(String(500), nullable=False)
     description = Column(Text, nullable=True)
     evidence = Column(Text, nullable=True)  # JSON o texto con evidencia técnica
     recommendation = Column(Text, nullable=True)
     tool = Column(String(100), nullable=False, index=True)  # ZAP, Nuclei, SSLyze, etc.
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    # Clave de partición: forma parte de la PK (id, created_at)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), primary_key=True, nullable=False)
 
     # Relaciones
     job = relationship("Job", back_populates="findings")
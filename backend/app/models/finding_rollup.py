@@ -0,0 +1,42 @@
+"""
+Modelo de FindingRollup
+Conteo agregado de findings por usuario, día, herramienta, severidad y target
+"""
+from sqlalchemy import Column, String, Date, ForeignKey, Enum, BigInteger, Index
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.database import Base
+from app.models.finding import FindingSeverity
+
+
+class FindingRollup(Base):
+    """
+    Modelo de rollup de findings (tabla de métricas)
+    
+    Se mantiene de forma incremental en la misma transacción que inserta
+    los findings (ver app/services/metrics_rollup.py), de modo que los
+    endpoints de /metrics no recorren la tabla findings.
+    
+    Campos:
+    - user_id: UUID del usuario propietario (FK a users)
+    - day: Día de creación de los findings
+    - tool: Herramienta que detectó los findings
+    - severity: Severidad de los findings
+    - target_id: UUID del target escaneado (FK a targets)
+    - count: Número de findings
+    """
+    __tablename__ = "finding_rollups"
+    __table_args__ = (
+        # Timeline del usuario por rango de días
+        Index("ix_finding_rollups_user_id_day", "user_id", "day"),
+    )
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    tool = Column(String(100), primary_key=True)
+    severity = Column(Enum(FindingSeverity), primary_key=True)
+    target_id = Column(UUID(as_uuid=True), ForeignKey("targets.id", ondelete="CASCADE"), primary_key=True)
+    count = Column(BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<FindingRollup(user_id={self.user_id}, day={self.day}, tool={self.tool}, severity={self.severity}, count={self.count})>"
@@ -2,7 +2,7 @@
 Modelo de Job
 Representa una ejecución de escaneo de seguridad
 """
-from sqlalchemy import Column, String, DateTime, ForeignKey, JSON, Enum
+from sqlalchemy import Column, String, DateTime, ForeignKey, JSON, Enum, Integer, Index, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -33,6 +33,14 @@ class Job(Base):
     - created_at: Fecha de creación
     - started_at: Fecha de inicio de ejecución
     - finished_at: Fecha de finalización
+    - worker_id: Identificador del worker que ejecuta el job
+    - heartbeat_at: Último heartbeat del worker (para detectar workers caídos)
+    - attempts: Número de veces que un worker ha tomado el job
+    - tool_results: Origen del resultado de cada herramienta
+      (p. ej. {"SSLyze": {"source": "cache", "scanned_at": "..."}})
+    - dedup_key: Hash de la URL normalizada y las herramientas (escaneos idénticos)
+    - leader_job_id: Job idéntico en curso cuyos resultados recibirá este job;
+      los workers no reclaman jobs con líder
     
     Relaciones:
     - user: Usuario propietario del job
@@ -40,6 +48,17 @@ class Job(Base):
     - findings: Lista de hallazgos encontrados
     """
     __tablename__ = "jobs"
+    __table_args__ = (
+        # Paginación por cursor de GET /jobs
+        Index("ix_jobs_user_id_created_at_id", "user_id", "created_at", "id"),
+        # Búsqueda del job líder en curso para un escaneo idéntico
+        Index(
+            "ix_jobs_dedup_key_inflight",
+            "dedup_key",
+            postgresql_where=text("status IN ('QUEUED', 'RUNNING') AND leader_job_id IS NULL")
+        ),
+        Index("ix_jobs_leader_job_id", "leader_job_id", postgresql_where=text("leader_job_id IS NOT NULL")),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
@@ -49,6 +68,12 @@ class Job(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     started_at = Column(DateTime(timezone=True), nullable=True)
     finished_at = Column(DateTime(timezone=True), nullable=True)
+    worker_id = Column(String(255), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+    attempts = Column(Integer, default=0, server_default="0", nullable=False)
+    tool_results = Column(JSON(none_as_null=True), nullable=True)  # None se guarda como NULL, no como JSON null
+    dedup_key = Column(String(64), nullable=True)
+    leader_job_id = Column(UUID(as_uuid=True), ForeignKey("jobs.id", ondelete="SET NULL"), nullable=True)
 
     # Relaciones
     user = relationship("User", back_populates="jobs")
@@ -0,0 +1,34 @@
+"""
+Modelo de TlsScanResult
+Salida cacheada de escaneos TLS por hostname, puerto y versión de la herramienta
+"""
+from sqlalchemy import Column, String, Integer, Text, DateTime
+
+from app.database import Base
+
+
+class TlsScanResult(Base):
+    """
+    Modelo de resultado TLS cacheado
+    
+    Los escaneos TLS solo dependen del servidor, no del usuario ni del job:
+    jobs de distintos usuarios sobre el mismo host reutilizan la salida
+    mientras no supere `tls_cache_ttl_seconds` (ver app/services/tls_cache.py).
+    
+    Campos:
+    - hostname: Hostname escaneado
+    - port: Puerto escaneado
+    - tool_version: Versión de la herramienta que produjo la salida
+    - output: Salida JSON de la herramienta
+    - scanned_at: Fecha del escaneo
+    """
+    __tablename__ = "tls_scan_results"
+
+    hostname = Column(String(255), primary_key=True)
+    port = Column(Integer, primary_key=True)
+    tool_version = Column(String(255), primary_key=True)
+    output = Column(Text, nullable=False)
+    scanned_at = Column(DateTime(timezone=True), nullable=False)
+
+    def __repr__(self):
+        return f"<TlsScanResult(hostname={self.hostname}, port={self.port}, tool_version={self.tool_version}, scanned_at={self.scanned_at})>"
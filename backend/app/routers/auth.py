@@ -2,18 +2,29 @@
 Router de Autenticación
 """
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models.user import User
 from app.schemas.user import UserCreate, UserLogin, UserResponse
 from app.schemas.token import Token
-from app.security.hashing import hash_password, verify_password
+from app.security.hashing import hash_password_async, verify_password_async
 from app.security.jwt import create_access_token
 from app.security.dependencies import get_current_user
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
+def _get_user_by_email(db: Session, email: str):
+    return db.query(User).filter(User.email == email).first()
+
+
+def _save_user(db: Session, user: User) -> None:
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+
+
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     """
@@ -24,8 +35,9 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     - Crear usuario en BD
     - Retornar usuario (sin password_hash)
     """
+    # Las consultas síncronas y bcrypt se ejecutan fuera del event loop
     # Verificar si el email ya existe
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    existing_user = await run_in_threadpool(_get_user_by_email, db, user_data.email)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -33,7 +45,7 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Hashear la contraseña
-    password_hash = hash_password(user_data.password)
+    password_hash = await hash_password_async(user_data.password)
     
     # Crear nuevo usuario
     new_user = User(
@@ -42,9 +54,7 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
         role=user_data.role
     )
     
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await run_in_threadpool(_save_user, db, new_user)
     
     return new_user
 
@@ -59,7 +69,7 @@ async def login(user_data: UserLogin, db: Session = Depends(get_db)):
     - Retornar token
     """
     # Buscar usuario por email
-    user = db.query(User).filter(User.email == user_data.email).first()
+    user = await run_in_threadpool(_get_user_by_email, db, user_data.email)
     
     if not user:
         raise HTTPException(
@@ -68,7 +78,7 @@ async def login(user_data: UserLogin, db: Session = Depends(get_db)):
         )
     
     # Verificar contraseña
-    if not verify_password(user_data.password, user.password_hash):
+    if not await verify_password_async(user_data.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Email o contraseña incorrectos"
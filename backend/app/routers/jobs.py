@@ -1,26 +1,34 @@
 """
 Router de Jobs
 """
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Literal, Optional
+from uuid import UUID
 from datetime import datetime
-from app.database import get_db
+from app.config import settings
+from app.database import get_db, get_async_db
+from app.models.finding import Finding, FindingSeverity
 from app.models.job import Job, JobStatus
 from app.models.target import Target
 from app.models.user import User
 from app.schemas.job import JobCreate, JobResponse
 from app.schemas.finding import FindingResponse
 from app.security.dependencies import get_current_user
-from app.services.scanner_service import ScannerService
+from app.services import job_queue
+from app.services.metrics_cache import notify_metrics_changed
+from app.services.report_export import MEDIA_TYPES, stream_findings
+from app.utils.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
 
 router = APIRouter(prefix="/jobs", tags=["jobs"])
 
 
 @router.post("", response_model=JobResponse, status_code=status.HTTP_201_CREATED)
-async def create_job(
+def create_job(
     job_data: JobCreate,
-    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -30,7 +38,10 @@ async def create_job(
     - Validar target_id (debe pertenecer al usuario)
     - Validar herramientas seleccionadas
     - Crear job con status "queued"
-    - Iniciar escaneo en background
+    - Un worker (app/worker.py) reclamará el job desde la cola
+    - Si ya hay un job idéntico (misma URL normalizada y herramientas) en
+      cola o en ejecución, el nuevo job se une a él (leader_job_id) y
+      recibe una copia de sus findings al terminar
     """
     # Verificar que el target pertenezca al usuario
     target = db.query(Target).filter(
@@ -53,62 +64,95 @@ async def create_job(
             detail=f"Herramientas inválidas: {', '.join(invalid_tools)}. Herramientas válidas: {', '.join(valid_tools)}"
         )
     
+    # Single-flight: el lock por clave se mantiene hasta el commit
+    key = job_queue.dedup_key(target.url, job_data.tools_used)
+    leader = None
+    if settings.job_dedup_enabled:
+        job_queue.lock_dedup_key(db, key)
+        leader = job_queue.find_leader(db, key)
+    
     # Crear job
     new_job = Job(
         user_id=current_user.id,
         target_id=target.id,
-        status=JobStatus.QUEUED,
-        tools_used=job_data.tools_used
+        status=leader.status if leader else JobStatus.QUEUED,
+        started_at=leader.started_at if leader else None,
+        tools_used=job_data.tools_used,
+        dedup_key=key,
+        leader_job_id=leader.id if leader else None
     )
     
     db.add(new_job)
+    notify_metrics_changed(db, current_user.id)  # total de jobs y timeline
     db.commit()
     db.refresh(new_job)
     
-    # Iniciar escaneo en background
-    # IMPORTANTE: No pasar db como parámetro porque la sesión se cierra
-    # cuando termina el request. La background task creará su propia sesión.
-    background_tasks.add_task(
-        ScannerService.execute_scan,
-        job_id=str(new_job.id),
-        target_url=target.url,
-        tools=job_data.tools_used
-    )
-    
+    # El escaneo no se ejecuta en el proceso de la API: el job queda
+    # persistido como QUEUED y un worker lo reclamará con SKIP LOCKED.
     return new_job
 
 
 @router.get("", response_model=List[JobResponse])
 async def list_jobs(
+    response: Response,
     status_filter: Optional[JobStatus] = None,
+    limit: int = Query(settings.pagination_default_limit, ge=1, le=settings.pagination_max_limit),
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Listar jobs del usuario (con filtro opcional por status)
+    
+    Paginación por cursor sobre (created_at, id), del más reciente al más
+    antiguo. Si hay más resultados, el header X-Next-Cursor trae el cursor
+    de la página siguiente.
     """
-    query = db.query(Job).filter(Job.user_id == current_user.id)
+    query = select(Job).where(Job.user_id == current_user.id)
     
     if status_filter:
-        query = query.filter(Job.status == status_filter)
+        query = query.where(Job.status == status_filter)
+    
+    if cursor:
+        created_at, job_id = _parse_cursor(cursor, *_JOB_CURSOR)
+        query = query.where(tuple_(Job.created_at, Job.id) < (created_at, job_id))
+    
+    result = await db.execute(
+        query.order_by(Job.created_at.desc(), Job.id.desc()).limit(limit + 1)
+    )
+    jobs = result.scalars().all()
+    
+    if len(jobs) > limit:
+        jobs = jobs[:limit]
+        last = jobs[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor([last.created_at.isoformat(), last.id])
     
-    jobs = query.order_by(Job.created_at.desc()).all()
     return jobs
 
 
-@router.get("/{job_id}", response_model=JobResponse)
-async def get_job(
-    job_id: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    """
-    Obtener un job específico (solo si pertenece al usuario)
-    """
-    job = db.query(Job).filter(
-        Job.id == job_id,
-        Job.user_id == current_user.id
-    ).first()
+# Parsers de los valores de cada cursor, en el orden de encode_cursor
+_JOB_CURSOR = (datetime.fromisoformat, UUID)
+_FINDING_CURSOR = (lambda name: FindingSeverity[name], datetime.fromisoformat, UUID)
+
+
+def _parse_cursor(cursor: str, *parsers):
+    """Decodificar un cursor y convertir cada valor con su parser"""
+    values = decode_cursor(cursor, len(parsers))
+    try:
+        return [parser(value) for parser, value in zip(parsers, values)]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor inválido"
+        )
+
+
+async def _get_user_job(db: AsyncSession, job_id: UUID, user_id) -> Job:
+    """Obtener un job del usuario o responder 404"""
+    result = await db.execute(
+        select(Job).where(Job.id == job_id, Job.user_id == user_id)
+    )
+    job = result.scalar_one_or_none()
     
     if not job:
         raise HTTPException(
@@ -119,35 +163,92 @@ async def get_job(
     return job
 
 
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: UUID,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Obtener un job específico (solo si pertenece al usuario)
+    """
+    return await _get_user_job(db, job_id, current_user.id)
+
+
 @router.get("/{job_id}/findings", response_model=List[FindingResponse])
 async def get_job_findings(
-    job_id: str,
-    severity_filter: Optional[str] = None,
+    job_id: UUID,
+    response: Response,
+    severity_filter: Optional[FindingSeverity] = None,
+    limit: int = Query(settings.pagination_default_limit, ge=1, le=settings.pagination_max_limit),
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Listar findings de un job (con filtro opcional por severidad)
+    
+    Paginación por cursor sobre (severity, created_at, id): primero los más
+    graves. Si hay más resultados, el header X-Next-Cursor trae el cursor
+    de la página siguiente.
     """
     # Verificar que el job pertenezca al usuario
-    job = db.query(Job).filter(
-        Job.id == job_id,
-        Job.user_id == current_user.id
-    ).first()
+    job = await _get_user_job(db, job_id, current_user.id)
     
-    if not job:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Job no encontrado"
+    # Obtener findings. Son posteriores al job: el filtro por created_at
+    # descarta las particiones mensuales anteriores
+    query = select(Finding).where(
+        Finding.job_id == job_id,
+        Finding.created_at >= job.created_at
+    )
+    
+    if severity_filter:
+        query = query.where(Finding.severity == severity_filter)
+    
+    if cursor:
+        severity, created_at, finding_id = _parse_cursor(cursor, *_FINDING_CURSOR)
+        query = query.where(
+            tuple_(Finding.severity, Finding.created_at, Finding.id) < (severity, created_at, finding_id)
         )
     
-    # Obtener findings
-    from app.models.finding import Finding
-    query = db.query(Finding).filter(Finding.job_id == job_id)
+    result = await db.execute(
+        query.order_by(
+            Finding.severity.desc(), Finding.created_at.desc(), Finding.id.desc()
+        ).limit(limit + 1)
+    )
+    findings = result.scalars().all()
     
-    if severity_filter:
-        query = query.filter(Finding.severity == severity_filter)
+    if len(findings) > limit:
+        findings = findings[:limit]
+        last = findings[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            [last.severity.name, last.created_at.isoformat(), last.id]
+        )
     
-    findings = query.order_by(Finding.severity.desc(), Finding.created_at.desc()).all()
     return findings
 
+
+@router.get("/{job_id}/findings/export")
+async def export_job_findings(
+    job_id: UUID,
+    export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Exportar todos los findings de un job en NDJSON o CSV
+    
+    La respuesta se genera en streaming (memoria constante aunque el job
+    tenga cientos de miles de findings) y se guarda una copia en el
+    volumen de reports.
+    """
+    # Verificar que el job pertenezca al usuario
+    job = await _get_user_job(db, job_id, current_user.id)
+    
+    return StreamingResponse(
+        stream_findings(job_id, job.created_at, export_format),
+        media_type=MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{job_id}-findings.{export_format}"'
+        }
+    )
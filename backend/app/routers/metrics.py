@@ -1,14 +1,15 @@
 """
 Router de Métricas
 """
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
-from datetime import datetime, timedelta
-from typing import Dict
-from app.database import get_db
-from app.models.job import Job
-from app.models.finding import Finding, FindingSeverity
+import functools
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select
+from datetime import timedelta
+from typing import Literal
+from app.config import settings
+from app.database import get_async_db
+from app.models.finding_rollup import FindingRollup
 from app.models.target import Target
 from app.models.user import User
 from app.schemas.metrics import (
@@ -23,179 +24,165 @@ from app.schemas.metrics import (
     TargetCount
 )
 from app.security.dependencies import get_current_user
+from app.services.metrics_cache import CachedResponse, metrics_cache
+from app.services.metrics_service import TIMELINE_STEPS, get_findings_summary, timeline_query
 
 router = APIRouter(prefix="/metrics", tags=["metrics"])
 
 
+def cached_metrics(endpoint):
+    """
+    Cachear la respuesta de un endpoint de métricas por usuario
+    
+    El endpoint debe recibir `request` y `current_user`. Las respuestas
+    llevan ETag: si coincide con If-None-Match se responde 304 sin cuerpo.
+    La caché se invalida cuando el worker termina una herramienta o un job
+    (ver app/services/metrics_cache.py).
+    """
+    @functools.wraps(endpoint)
+    async def wrapper(**kwargs):
+        request: Request = kwargs["request"]
+        user_id = kwargs["current_user"].id
+        key = f"{request.url.path}?{sorted(request.query_params.multi_items())}"
+        
+        # La generación se toma antes de calcular: si llega una invalidación
+        # mientras tanto, el resultado no se vuelve a servir
+        generation = metrics_cache.generation(user_id)
+        cached = metrics_cache.get(user_id, generation, key)
+        if cached is None:
+            result = await endpoint(**kwargs)
+            cached = metrics_cache.set(user_id, generation, key, result.model_dump_json().encode("utf-8"))
+        
+        return _etag_response(request, cached)
+    
+    return wrapper
+
+
+def _etag_response(request: Request, cached: CachedResponse) -> Response:
+    headers = {"ETag": cached.etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if cached.etag in candidates or "*" in candidates:
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
+
+
 @router.get("/summary", response_model=MetricsSummary)
+@cached_metrics
 async def get_metrics_summary(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    current_user: User = Depends(get_current_user)
 ):
     """
     Obtener resumen general de métricas del usuario
     """
-    # Total de jobs
-    total_jobs = db.query(Job).filter(Job.user_id == current_user.id).count()
-    
-    # Total de findings
-    total_findings = db.query(Finding).join(Job, Finding.job_id == Job.id).filter(
-        Job.user_id == current_user.id
-    ).count()
-    
-    # Findings por severidad
-    findings_by_severity = db.query(
-        Finding.severity,
-        func.count(Finding.id).label("count")
-    ).join(Job, Finding.job_id == Job.id).filter(
-        Job.user_id == current_user.id
-    ).group_by(Finding.severity).all()
-    
-    severity_dict = {severity.value: 0 for severity in FindingSeverity}
-    for severity, count in findings_by_severity:
-        severity_dict[severity.value] = count
-    
-    # Findings por herramienta
-    findings_by_tool = db.query(
-        Finding.tool,
-        func.count(Finding.id).label("count")
-    ).join(Job, Finding.job_id == Job.id).filter(
-        Job.user_id == current_user.id
-    ).group_by(Finding.tool).all()
-    
-    tool_dict = {tool: count for tool, count in findings_by_tool}
+    summary = await get_findings_summary(current_user.id)
     
     return MetricsSummary(
-        total_jobs=total_jobs,
-        total_findings=total_findings,
-        findings_by_severity=severity_dict,
-        findings_by_tool=tool_dict
+        total_jobs=summary.total_jobs,
+        total_findings=summary.total_findings,
+        findings_by_severity=summary.by_severity,
+        findings_by_tool=summary.by_tool
     )
 
 
 @router.get("/by-severity", response_model=MetricsBySeverityResponse)
+@cached_metrics
 async def get_metrics_by_severity(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    current_user: User = Depends(get_current_user)
 ):
     """
     Obtener métricas agrupadas por severidad
     """
-    results = db.query(
-        Finding.severity,
-        func.count(Finding.id).label("count")
-    ).join(Job, Finding.job_id == Job.id).filter(
-        Job.user_id == current_user.id
-    ).group_by(Finding.severity).all()
+    summary = await get_findings_summary(current_user.id)
     
+    # El resumen incluye todas las severidades (con 0 si no hay findings)
     data = [
-        SeverityCount(severity=severity.value, count=count)
-        for severity, count in results
+        SeverityCount(severity=severity, count=count)
+        for severity, count in summary.by_severity.items()
     ]
     
-    # Asegurar que todas las severidades estén presentes
-    all_severities = {s.value for s in FindingSeverity}
-    present_severities = {item.severity for item in data}
-    for severity in all_severities - present_severities:
-        data.append(SeverityCount(severity=severity, count=0))
-    
     return MetricsBySeverityResponse(data=sorted(data, key=lambda x: x.severity))
 
 
 @router.get("/by-tool", response_model=MetricsByToolResponse)
+@cached_metrics
 async def get_metrics_by_tool(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    current_user: User = Depends(get_current_user)
 ):
     """
     Obtener métricas agrupadas por herramienta
     """
-    results = db.query(
-        Finding.tool,
-        func.count(Finding.id).label("count")
-    ).join(Job, Finding.job_id == Job.id).filter(
-        Job.user_id == current_user.id
-    ).group_by(Finding.tool).all()
+    summary = await get_findings_summary(current_user.id)
     
     data = [
         ToolCount(tool=tool, count=count)
-        for tool, count in results
+        for tool, count in summary.by_tool.items()
     ]
     
     return MetricsByToolResponse(data=data)
 
 
 @router.get("/timeline", response_model=MetricsTimelineResponse)
+@cached_metrics
 async def get_metrics_timeline(
-    days: int = 30,
+    request: Request,
+    days: int = Query(30, ge=1, le=settings.metrics_timeline_max_days),
+    granularity: Literal["hour", "day", "week"] = "day",
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Obtener timeline de métricas (jobs y findings por día)
-    """
-    # Calcular fecha de inicio
-    start_date = datetime.utcnow() - timedelta(days=days)
+    Obtener timeline de métricas (jobs y findings por hora, día o semana)
     
-    # Obtener jobs por día
-    jobs_by_date = db.query(
-        func.date(Job.created_at).label("date"),
-        func.count(Job.id).label("count")
-    ).filter(
-        and_(
-            Job.user_id == current_user.id,
-            Job.created_at >= start_date
-        )
-    ).group_by(func.date(Job.created_at)).all()
-    
-    # Obtener findings por día
-    findings_by_date = db.query(
-        func.date(Finding.created_at).label("date"),
-        func.count(Finding.id).label("count")
-    ).join(Job, Finding.job_id == Job.id).filter(
-        and_(
-            Job.user_id == current_user.id,
-            Finding.created_at >= start_date
+    Devuelve todos los buckets de la ventana, también los que no tienen datos.
+    """
+    buckets = days * timedelta(days=1) // TIMELINE_STEPS[granularity]
+    if buckets > settings.metrics_timeline_max_buckets:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Ventana demasiado grande para granularidad '{granularity}' (máximo {settings.metrics_timeline_max_buckets} puntos)"
         )
-    ).group_by(func.date(Finding.created_at)).all()
-    
-    # Combinar datos
-    jobs_dict = {str(date): count for date, count in jobs_by_date}
-    findings_dict = {str(date): count for date, count in findings_by_date}
     
-    # Obtener todas las fechas únicas
-    all_dates = set(jobs_dict.keys()) | set(findings_dict.keys())
+    results = await db.execute(timeline_query(current_user.id, days, granularity))
     
     data = [
         TimelinePoint(
-            date=date,
-            jobs=jobs_dict.get(date, 0),
-            findings=findings_dict.get(date, 0)
+            # Por hora se incluye la hora; por día/semana, solo la fecha
+            date=bucket.isoformat() if granularity == "hour" else bucket.date().isoformat(),
+            jobs=jobs,
+            findings=findings
         )
-        for date in sorted(all_dates)
+        for bucket, jobs, findings in results
     ]
     
     return MetricsTimelineResponse(data=data)
 
 
 @router.get("/top-targets", response_model=MetricsTopTargetsResponse)
+@cached_metrics
 async def get_top_targets(
+    request: Request,
     limit: int = 5,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Obtener top targets con más findings
     """
-    results = db.query(
-        Target.id,
-        Target.url,
-        func.count(Finding.id).label("count")
-    ).join(Job, Target.id == Job.target_id).join(Finding, Job.id == Finding.job_id).filter(
-        Job.user_id == current_user.id
-    ).group_by(Target.id, Target.url).order_by(
-        func.count(Finding.id).desc()
-    ).limit(limit).all()
+    results = await db.execute(
+        select(
+            Target.id,
+            Target.url,
+            func.sum(FindingRollup.count).label("count")
+        ).join(FindingRollup, Target.id == FindingRollup.target_id).where(
+            FindingRollup.user_id == current_user.id
+        ).group_by(Target.id, Target.url).order_by(
+            func.sum(FindingRollup.count).desc()
+        ).limit(limit)
+    )
     
     data = [
         TargetCount(
@@ -207,4 +194,3 @@ async def get_top_targets(
     ]
     
     return MetricsTopTargetsResponse(data=data)
-
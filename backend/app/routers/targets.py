@@ -2,20 +2,26 @@
 Router de Targets
 """
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List
-from app.database import get_db
+from uuid import UUID
+from app.database import get_db, get_async_db
+from app.models.job import Job, JobStatus
 from app.models.target import Target
 from app.models.user import User
 from app.schemas.target import TargetCreate, TargetResponse, TargetUpdate
 from app.security.dependencies import get_current_user
+from app.services import job_queue
+from app.services.metrics_cache import notify_metrics_changed
 from app.utils.url_validators import validate_target_url
 
 router = APIRouter(prefix="/targets", tags=["targets"])
 
 
 @router.post("", response_model=TargetResponse, status_code=status.HTTP_201_CREATED)
-async def create_target(
+def create_target(
     target_data: TargetCreate,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -46,28 +52,31 @@ async def create_target(
 @router.get("", response_model=List[TargetResponse])
 async def list_targets(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Listar todos los targets del usuario autenticado
     """
-    targets = db.query(Target).filter(Target.user_id == current_user.id).all()
-    return targets
+    result = await db.execute(select(Target).where(Target.user_id == current_user.id))
+    return result.scalars().all()
 
 
 @router.get("/{target_id}", response_model=TargetResponse)
 async def get_target(
-    target_id: str,
+    target_id: UUID,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Obtener un target específico (solo si pertenece al usuario)
     """
-    target = db.query(Target).filter(
-        Target.id == target_id,
-        Target.user_id == current_user.id
-    ).first()
+    result = await db.execute(
+        select(Target).where(
+            Target.id == target_id,
+            Target.user_id == current_user.id
+        )
+    )
+    target = result.scalar_one_or_none()
     
     if not target:
         raise HTTPException(
@@ -79,7 +88,7 @@ async def get_target(
 
 
 @router.delete("/{target_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_target(
+def delete_target(
     target_id: str,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -98,7 +107,17 @@ async def delete_target(
             detail="Target no encontrado"
         )
     
+    # Jobs idénticos de otros targets que esperaban a uno de estos: vuelven a la cola
+    in_flight = db.query(Job).filter(
+        Job.target_id == target.id,
+        Job.status.in_([JobStatus.QUEUED, JobStatus.RUNNING]),
+        Job.leader_job_id.is_(None)
+    ).all()
+    for job in in_flight:
+        job_queue.release_followers(db, job, exclude_target_id=target.id)
+    
     db.delete(target)
+    notify_metrics_changed(db, current_user.id)  # Sus jobs y findings se borran en cascada
     db.commit()
     
     return None
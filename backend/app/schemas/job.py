@@ -2,7 +2,7 @@
 Schemas Pydantic para Jobs
 """
 from datetime import datetime
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 from uuid import UUID
 
 from pydantic import BaseModel, Field
@@ -26,6 +26,8 @@ class JobResponse(BaseModel):
     created_at: datetime
     started_at: Optional[datetime] = None
     finished_at: Optional[datetime] = None
+    tool_results: Optional[Dict[str, Dict[str, Any]]] = None
+    leader_job_id: Optional[UUID] = None
     
     class Config:
         from_attributes = True
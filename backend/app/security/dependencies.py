@@ -1,25 +1,50 @@
 """
 Dependencias de Seguridad para FastAPI
 """
+import uuid
 from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.database import get_async_db
 from app.models.user import User
 from app.security.jwt import verify_token, get_user_from_token
+from app.utils.cache import TTLCache
 
 # Configurar HTTPBearer para extraer token del header Authorization
 security = HTTPBearer()
 
+# Caché de usuarios autenticados (clave: claim "sub" del token).
+# Guarda instancias desasociadas de cualquier sesión, de solo lectura.
+user_cache = TTLCache(
+    maxsize=settings.auth_cache_max_entries,
+    ttl=settings.auth_cache_ttl_seconds
+)
+
+
+def invalidate_user(user_id: str) -> None:
+    """Eliminar un usuario de la caché (tras actualizarlo o borrarlo)"""
+    user_cache.delete(str(user_id))
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_cached_user(mapper, connection, target) -> None:
+    invalidate_user(target.id)
+
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> User:
     """
     Dependencia para obtener el usuario actual desde el token JWT
     
+    Usa la sesión asíncrona: la consulta (cuando no hay acierto en caché)
+    no bloquea el event loop.
+    
     Args:
         credentials: Credenciales HTTP con el token
         db: Sesión de base de datos
@@ -33,14 +58,24 @@ async def get_current_user(
     token = credentials.credentials
     user_id = get_user_from_token(token)
     
-    if user_id is None:
+    try:
+        user_uuid = uuid.UUID(str(user_id)) if user_id is not None else None
+    except ValueError:
+        user_uuid = None
+    
+    if user_uuid is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token inválido o expirado",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    user = db.query(User).filter(User.id == user_id).first()
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+    
+    result = await db.execute(select(User).where(User.id == user_uuid))
+    user = result.scalar_one_or_none()
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -48,6 +83,10 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Desasociar de la sesión: un commit posterior en el request no debe
+    # expirar la instancia que se comparte entre requests
+    db.expunge(user)
+    user_cache.set(user_id, user)
     return user
 
 
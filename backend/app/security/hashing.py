@@ -1,10 +1,31 @@
 """
 Módulo de Hashing de Contraseñas
 """
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
 
-# Configurar contexto de bcrypt
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.config import settings
+
+# Configurar contexto de bcrypt (el coste es configurable: cada +1 duplica el tiempo)
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.bcrypt_rounds
+)
+
+# Pool dedicado para bcrypt: cada hash bloquea ~100-300 ms de CPU y no debe
+# ejecutarse en el event loop ni agotar el threadpool general de FastAPI
+_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.password_hash_workers,
+    thread_name_prefix="bcrypt"
+)
+_pending = 0
+_pending_lock = threading.Lock()
 
 
 def hash_password(password: str) -> str:
@@ -32,3 +53,39 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         True si la contraseña es válida, False en caso contrario
     """
     return pwd_context.verify(plain_password, hashed_password)
+
+
+async def _run_in_hash_pool(func: Callable[..., Any], *args: Any) -> Any:
+    """
+    Ejecutar una operación de bcrypt en el pool dedicado
+    
+    Raises:
+        HTTPException: 429 si ya hay `password_hash_max_pending` operaciones
+            en curso o en espera (se descarta carga en vez de encolar sin límite)
+    """
+    global _pending
+    with _pending_lock:
+        if _pending >= settings.password_hash_max_pending:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Demasiadas solicitudes de autenticación, inténtalo de nuevo",
+                headers={"Retry-After": "1"},
+            )
+        _pending += 1
+    
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_hash_executor, func, *args)
+    finally:
+        with _pending_lock:
+            _pending -= 1
+
+
+async def hash_password_async(password: str) -> str:
+    """Versión de hash_password que no bloquea el event loop"""
+    return await _run_in_hash_pool(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Versión de verify_password que no bloquea el event loop"""
+    return await _run_in_hash_pool(verify_password, plain_password, hashed_password)
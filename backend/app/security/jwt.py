@@ -1,10 +1,18 @@
 """
 Módulo de JWT (JSON Web Tokens)
 """
+import time
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 from jose import JWTError, jwt
 from app.config import settings
+from app.utils.cache import TTLCache
+
+# Caché de tokens ya decodificados y verificados (clave: el token completo)
+token_cache = TTLCache(
+    maxsize=settings.auth_cache_max_entries,
+    ttl=settings.auth_cache_ttl_seconds
+)
 
 
 def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
@@ -34,17 +42,27 @@ def verify_token(token: str) -> Optional[Dict[str, Any]]:
     """
     Verifica y decodifica un token JWT
     
+    Los tokens válidos se cachean hasta su expiración (como mucho
+    `auth_cache_ttl_seconds`), evitando verificar la firma en cada request.
+    
     Args:
         token: Token JWT a verificar
     
     Returns:
         Payload del token si es válido, None en caso contrario
     """
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
+    
     try:
         payload = jwt.decode(token, settings.jwt_secret, algorithms=[settings.jwt_algorithm])
-        return payload
     except JWTError:
         return None
+    
+    expires_in = payload.get("exp", 0) - time.time()
+    token_cache.set(token, payload, ttl=expires_in)
+    return payload
 
 
 def get_user_from_token(token: str) -> Optional[str]:
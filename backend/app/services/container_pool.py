@@ -0,0 +1,260 @@
+"""
+Pool de contenedores precalentados para los scanners
+Mantiene contenedores de larga duración (daemon ZAP, Nuclei con plantillas
+cargadas) y despacha los escaneos con `docker exec`
+"""
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from app.config import settings
+from app.services.docker_client import get_docker_client
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _IdleContainer:
+    container: Any
+    idle_since: float
+
+
+class WarmContainerPool:
+    """
+    Pool acotado de contenedores de una imagen
+
+    - Los contenedores se arrancan bajo demanda hasta `size`
+    - Al reservar uno se comprueba su salud; si falla se descarta y se arranca otro
+    - `maintain()` elimina los que llevan más de `idle_seconds` sin usarse,
+      los que dejaron de estar sanos y los que montan datos (plantillas,
+      add-ons) de una versión que ya no es la publicada
+    """
+
+    def __init__(
+        self,
+        name: str,
+        size: int,
+        idle_seconds: int,
+        factory: Callable[[Any, str], Any],
+        health_check: Callable[[Any], bool],
+        is_current: Optional[Callable[[Any], bool]] = None
+    ):
+        self.name = name
+        self.size = size
+        self.idle_seconds = idle_seconds
+        self._factory = factory
+        self._health_check = health_check
+        self._is_current = is_current or (lambda container: True)
+        self._idle: List[_IdleContainer] = []
+        self._busy = 0  # Reservados, arrancando o en revisión
+        self._closed = False
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def lease(self, timeout: float) -> Iterator[Any]:
+        """
+        Reservar un contenedor del pool durante un escaneo
+
+        Args:
+            timeout: Segundos máximos de espera si todos están ocupados
+
+        Raises:
+            TimeoutError: Si no hay contenedor disponible a tiempo
+        """
+        container = self._acquire(timeout)
+        try:
+            yield container
+        except Exception:
+            # Tras un error no se sabe en qué estado quedó el contenedor
+            self._release(container, reusable=self._is_healthy(container))
+            raise
+        else:
+            self._release(container, reusable=True)
+
+    def maintain(self) -> None:
+        """Eliminar contenedores ociosos demasiado tiempo, no sanos o con datos desactualizados"""
+        now = time.monotonic()
+        with self._cond:
+            to_check = self._idle
+            self._idle = []
+            self._busy += len(to_check)
+
+        for entry in to_check:
+            keep = (
+                now - entry.idle_since < self.idle_seconds
+                and self._is_current(entry.container)
+                and self._is_healthy(entry.container)
+            )
+            with self._cond:
+                self._busy -= 1
+                # Puede ejecutarse en segundo plano mientras se cierra el pool
+                keep = keep and not self._closed
+                if keep:
+                    self._idle.append(entry)
+                self._cond.notify()
+            if not keep:
+                logger.info(f"Pool {self.name}: retirando contenedor {entry.container.name}")
+                self._discard(entry.container)
+
+    def shutdown(self) -> None:
+        """Eliminar los contenedores ociosos; los reservados se eliminan al liberarse"""
+        with self._cond:
+            self._closed = True
+            idle = self._idle
+            self._idle = []
+            self._cond.notify_all()
+        for entry in idle:
+            self._discard(entry.container)
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {"size": self.size, "idle": len(self._idle), "busy": self._busy}
+
+    def _acquire(self, timeout: float) -> Any:
+        deadline = time.monotonic() + timeout
+        while True:
+            entry = None
+            with self._cond:
+                while not self._idle and self._busy >= self.size:
+                    if self._closed:
+                        raise RuntimeError(f"Pool {self.name} cerrado")
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f"No hay contenedores libres en el pool {self.name}")
+                    self._cond.wait(remaining)
+                if self._closed:
+                    raise RuntimeError(f"Pool {self.name} cerrado")
+                # LIFO: se reutilizan los más recientes y los demás envejecen hasta ser retirados
+                if self._idle:
+                    entry = self._idle.pop()
+                self._busy += 1
+
+            if entry is not None:
+                if self._is_healthy(entry.container):
+                    return entry.container
+                logger.warning(f"Pool {self.name}: contenedor {entry.container.name} no sano, se descarta")
+                self._discard(entry.container)
+                with self._cond:
+                    self._busy -= 1
+                    self._cond.notify()
+                continue
+
+            try:
+                container_name = f"auditor-{self.name}-{uuid.uuid4().hex[:8]}"
+                logger.info(f"Pool {self.name}: arrancando contenedor {container_name}")
+                return self._factory(get_docker_client(), container_name)
+            except Exception:
+                with self._cond:
+                    self._busy -= 1
+                    self._cond.notify()
+                raise
+
+    def _release(self, container: Any, reusable: bool) -> None:
+        with self._cond:
+            self._busy -= 1
+            if reusable and not self._closed:
+                self._idle.append(_IdleContainer(container, time.monotonic()))
+                self._cond.notify()
+                return
+            self._cond.notify()
+        self._discard(container)
+
+    def _is_healthy(self, container: Any) -> bool:
+        try:
+            container.reload()
+            return container.status == "running" and self._health_check(container)
+        except Exception:
+            return False
+
+    @staticmethod
+    def _discard(container: Any) -> None:
+        try:
+            container.remove(force=True)
+        except Exception:
+            pass
+
+
+_pools: Dict[str, WarmContainerPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_warm_pool(tool: str) -> Optional[WarmContainerPool]:
+    """
+    Obtener el pool precalentado de una herramienta
+
+    Returns:
+        El pool, o None si el modo warm-pool está desactivado o la
+        herramienta no lo soporta
+    """
+    if not settings.scanner_warm_pool_enabled:
+        return None
+
+    with _pools_lock:
+        if tool not in _pools:
+            if tool == "ZAP":
+                from app.services.scanners.zap_scanner import ZAPScanner
+                _pools[tool] = WarmContainerPool(
+                    name="zap",
+                    size=settings.warm_pool_zap_size,
+                    idle_seconds=settings.warm_pool_idle_seconds,
+                    factory=ZAPScanner.start_warm_container,
+                    health_check=ZAPScanner.warm_container_ready,
+                    is_current=ZAPScanner.warm_container_current
+                )
+            elif tool == "Nuclei":
+                from app.services.scanners.nuclei_scanner import NucleiScanner
+                _pools[tool] = WarmContainerPool(
+                    name="nuclei",
+                    size=settings.warm_pool_nuclei_size,
+                    idle_seconds=settings.warm_pool_idle_seconds,
+                    factory=NucleiScanner.start_warm_container,
+                    health_check=NucleiScanner.warm_container_ready,
+                    is_current=NucleiScanner.warm_container_current
+                )
+            else:
+                return None
+        return _pools[tool]
+
+
+def maintain_pools() -> None:
+    """Mantenimiento periódico de todos los pools (llamado por el worker)"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        try:
+            pool.maintain()
+        except Exception as e:
+            logger.error(f"Error manteniendo pool {pool.name}: {str(e)}")
+
+
+def shutdown_pools() -> None:
+    """Eliminar los contenedores de todos los pools al detener el worker"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown()
+
+
+def wait_until_ready(container: Any, check: Callable[[Any], bool], timeout: int) -> None:
+    """
+    Esperar a que un contenedor recién arrancado esté listo
+
+    Raises:
+        TimeoutError: Si no está listo en `timeout` segundos (el contenedor se elimina)
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if check(container):
+                return
+        except Exception:
+            pass
+        time.sleep(2)
+
+    WarmContainerPool._discard(container)
+    raise TimeoutError(f"El contenedor {container.name} no estuvo listo en {timeout}s")
@@ -0,0 +1,117 @@
+"""
+Cliente de Docker compartido
+Un único DockerClient por proceso, con pool de conexiones acotado al socket
+"""
+import logging
+import threading
+import time
+from typing import Optional
+
+import docker
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Margen sobre el timeout de los escaneos para el timeout de lectura del cliente
+_STREAM_TIMEOUT_MARGIN = 60
+
+
+class DockerClientManager:
+    """
+    Gestor del cliente de Docker del proceso
+
+    - Crea el cliente de forma perezosa la primera vez que se necesita
+    - Usa una URL explícita, por lo que nunca lee ni modifica DOCKER_HOST
+    - Comprueba la conexión (ping) como mucho cada `health_check_interval`
+      segundos y reconecta si el daemon dejó de responder
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        max_pool_size: int,
+        timeout: int,
+        health_check_interval: int
+    ):
+        self.base_url = base_url
+        self.max_pool_size = max_pool_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._client: Optional[docker.DockerClient] = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def get_client(self) -> docker.DockerClient:
+        """
+        Obtener el cliente compartido, reconectando si es necesario
+
+        Raises:
+            Exception: Si no se puede conectar al daemon de Docker
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._client is not None and now - self._last_check >= self.health_check_interval:
+                try:
+                    self._client.ping()
+                    self._last_check = now
+                except Exception as e:
+                    logger.warning(f"Conexión con Docker perdida, reconectando: {str(e)}")
+                    self._close()
+
+            if self._client is None:
+                self._client = self._connect()
+                self._last_check = time.monotonic()
+
+            return self._client
+
+    def _connect(self) -> docker.DockerClient:
+        try:
+            client = docker.DockerClient(
+                base_url=self.base_url,
+                version="auto",
+                timeout=self.timeout,
+                max_pool_size=self.max_pool_size
+            )
+            client.ping()
+        except Exception as e:
+            logger.error(f"No se pudo conectar a Docker en {self.base_url}: {str(e)}")
+            raise Exception(f"No se pudo conectar a Docker: {str(e)}")
+
+        logger.info(f"Cliente de Docker inicializado ({self.base_url}, pool={self.max_pool_size})")
+        return client
+
+    def _close(self) -> None:
+        if self._client is not None:
+            try:
+                self._client.close()
+            except Exception:
+                pass
+            self._client = None
+
+
+def read_timeout() -> int:
+    """
+    Timeout de lectura del cliente
+
+    Al seguir los logs de Nuclei (o el stream de un exec) puede no llegar
+    nada durante todo el escaneo, p. ej. un lote `-l` grande sin
+    resultados. Ese límite ya lo aplica el temporizador que mata el
+    contenedor, así que la lectura debe esperar al menos hasta entonces.
+    """
+    longest_scan = max(settings.nuclei_timeout, settings.nuclei_batch_timeout)
+    return max(settings.docker_api_timeout, longest_scan + _STREAM_TIMEOUT_MARGIN)
+
+
+# Instancia global del proceso
+docker_manager = DockerClientManager(
+    base_url=settings.docker_base_url,
+    max_pool_size=settings.docker_max_pool_size,
+    timeout=read_timeout(),
+    health_check_interval=settings.docker_health_check_interval_seconds
+)
+
+
+def get_docker_client() -> docker.DockerClient:
+    """Obtener el cliente de Docker compartido del proceso"""
+    return docker_manager.get_client()
@@ -0,0 +1,140 @@
+"""
+Particiones mensuales de la tabla findings
+Creación anticipada de particiones futuras y retirada de las antiguas sin DELETE
+
+Las filas sin partición mensual (p. ej. un created_at muy futuro) van a la
+partición DEFAULT `findings_default`; se mueven a su mes al crearlo.
+"""
+import logging
+import re
+from datetime import date, datetime, timezone
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Clave del advisory lock que serializa el mantenimiento entre workers
+_ADVISORY_LOCK_KEY = 720200
+
+_PARTITION_NAME = re.compile(r"^findings_y(\d{4})m(\d{2})$")
+
+DEFAULT_PARTITION = "findings_default"
+
+# DETACH (sin CONCURRENTLY, incompatible con la partición DEFAULT) toma un
+# ACCESS EXCLUSIVE sobre findings: si no lo consigue enseguida se reintenta
+# en la siguiente vuelta en lugar de encolar detrás de él las consultas
+_DETACH_LOCK_TIMEOUT = "5s"
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    """Nombre de la partición de un mes (findings_yAAAAmMM)"""
+    return f"findings_y{month.year:04d}m{month.month:02d}"
+
+
+def create_partition(connection: Connection, month: date) -> None:
+    """
+    Crear (si no existe) la partición [primer día del mes, primer día del siguiente) en UTC
+
+    PostgreSQL no adjunta una partición si DEFAULT tiene filas de su rango:
+    la tabla se crea suelta, recibe esas filas y después se adjunta. Debe
+    llamarse dentro de una transacción (engine.begin()).
+    """
+    if month in attached_partitions(connection):
+        return
+
+    name = partition_name(month)
+    lower = f"'{month.isoformat()} 00:00:00+00'"
+    upper = f"'{_add_months(month, 1).isoformat()} 00:00:00+00'"
+    connection.execute(text(f"CREATE TABLE {name} (LIKE findings INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    moved = connection.execute(text(
+        f"WITH moved AS ("
+        f"DELETE FROM {DEFAULT_PARTITION} WHERE created_at >= {lower} AND created_at < {upper} RETURNING *"
+        f") INSERT INTO {name} SELECT * FROM moved"
+    )).rowcount
+    # ATTACH crea en la partición los índices y las FKs de findings
+    connection.execute(text(f"ALTER TABLE findings ATTACH PARTITION {name} FOR VALUES FROM ({lower}) TO ({upper})"))
+    if moved:
+        logger.warning(f"{moved} findings movidos de {DEFAULT_PARTITION} a la partición {name}")
+
+
+def attached_partitions(connection: Connection) -> List[date]:
+    """Meses con partición adjunta a findings, en orden"""
+    names = connection.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE parent.relname = 'findings'"
+    )).scalars()
+    months = []
+    for name in names:
+        match = _PARTITION_NAME.match(name)
+        if match:
+            months.append(date(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+
+def maintain_partitions(engine: Engine) -> None:
+    """
+    Mantenimiento periódico de particiones (lo ejecuta el worker)
+
+    - Crea las particiones del mes actual y de los `findings_partitions_ahead`
+      siguientes, para que ningún INSERT se quede sin partición.
+    - Si `findings_retention_months` > 0, desadjunta las particiones más
+      antiguas con DETACH PARTITION (sin DELETE). El lock se espera como
+      mucho `_DETACH_LOCK_TIMEOUT`; si no se obtiene, la partición se
+      retira en la siguiente vuelta. Las tablas desadjuntas se conservan
+      para archivarlas (pg_dump) salvo que `findings_drop_detached` esté activo.
+
+    Las métricas no cambian al retirar particiones: el rollup conserva los
+    conteos históricos.
+    """
+    today = datetime.now(timezone.utc).date()
+    current = date(today.year, today.month, 1)
+
+    # El advisory lock es de sesión: se mantiene entre las transacciones de _maintain
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        # Un solo worker a la vez; los demás lo intentarán en la siguiente vuelta
+        if not connection.execute(text(f"SELECT pg_try_advisory_lock({_ADVISORY_LOCK_KEY})")).scalar():
+            return
+        try:
+            _maintain(engine, connection, current)
+        finally:
+            connection.execute(text(f"SELECT pg_advisory_unlock({_ADVISORY_LOCK_KEY})"))
+
+
+def _maintain(engine: Engine, connection: Connection, current: date) -> None:
+    # Cada partición nueva en su propia transacción (ver create_partition)
+    for months in range(settings.findings_partitions_ahead + 1):
+        with engine.begin() as transaction:
+            create_partition(transaction, _add_months(current, months))
+
+    if settings.findings_retention_months <= 0:
+        return
+
+    oldest_kept = _add_months(current, -settings.findings_retention_months)
+    for month in attached_partitions(connection):
+        if month >= oldest_kept:
+            break
+        name = partition_name(month)
+        try:
+            with engine.begin() as transaction:
+                transaction.execute(text(f"SET LOCAL lock_timeout = '{_DETACH_LOCK_TIMEOUT}'"))
+                transaction.execute(text(f"ALTER TABLE findings DETACH PARTITION {name}"))
+                if settings.findings_drop_detached:
+                    transaction.execute(text(f"DROP TABLE {name}"))
+        except Exception as e:
+            logger.warning(f"No se pudo desadjuntar la partición {name}, se reintentará: {str(e)}")
+            break
+        if settings.findings_drop_detached:
+            logger.info(f"Partición {name} desadjuntada y eliminada")
+        else:
+            logger.info(f"Partición {name} desadjuntada; queda como tabla independiente para archivar")
@@ -0,0 +1,295 @@
+"""
+Cola persistente de jobs
+Los workers reclaman jobs QUEUED directamente desde la tabla jobs
+"""
+import hashlib
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+from uuid import UUID
+
+from sqlalchemy import func, insert, select, true
+from sqlalchemy.orm import Session, aliased
+
+from app.config import settings
+from app.models.finding import Finding
+from app.models.job import Job, JobStatus
+from app.models.target import Target
+from app.services import metrics_rollup
+from app.services.metrics_cache import notify_metrics_changed
+from app.utils.url_validators import normalize_url
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ClaimedJob:
+    """Datos mínimos que necesita un worker para ejecutar un job"""
+    job_id: str
+    target_url: str
+    tools: List[str]
+
+
+def claim_jobs(db: Session, worker_id: str, limit: int) -> List[ClaimedJob]:
+    """
+    Reclamar hasta `limit` jobs en cola para este worker
+
+    Usa SELECT ... FOR UPDATE SKIP LOCKED para que varios workers puedan
+    reclamar en paralelo sin bloquearse ni tomar el mismo job.
+
+    Args:
+        db: Sesión de base de datos
+        worker_id: Identificador del worker
+        limit: Número máximo de jobs a reclamar
+
+    Returns:
+        Lista de jobs reclamados (ya marcados como RUNNING)
+    """
+    if limit <= 0:
+        return []
+
+    # Los seguidores no se ejecutan: reciben el resultado de su líder
+    rows = db.query(Job, Target.url).join(Target, Job.target_id == Target.id).filter(
+        Job.status == JobStatus.QUEUED,
+        Job.leader_job_id.is_(None)
+    ).order_by(Job.created_at).limit(limit).with_for_update(
+        of=Job, skip_locked=True
+    ).all()
+
+    now = datetime.now(timezone.utc)
+    claimed = []
+    for job, target_url in rows:
+        job.status = JobStatus.RUNNING
+        job.started_at = now
+        job.worker_id = worker_id
+        job.heartbeat_at = now
+        job.attempts = (job.attempts or 0) + 1
+        claimed.append(ClaimedJob(
+            job_id=str(job.id),
+            target_url=target_url,
+            tools=list(job.tools_used or [])
+        ))
+
+    if rows:
+        db.query(Job).filter(
+            Job.leader_job_id.in_([job.id for job, _ in rows]),
+            Job.status == JobStatus.QUEUED
+        ).update({Job.status: JobStatus.RUNNING, Job.started_at: now}, synchronize_session=False)
+
+    db.commit()
+    return claimed
+
+
+def heartbeat(db: Session, worker_id: str, job_ids: List[str]) -> None:
+    """
+    Renovar el lease de los jobs que este worker está ejecutando
+
+    Args:
+        db: Sesión de base de datos
+        worker_id: Identificador del worker
+        job_ids: IDs de los jobs en ejecución
+    """
+    if not job_ids:
+        return
+
+    db.query(Job).filter(
+        Job.id.in_(job_ids),
+        Job.worker_id == worker_id,
+        Job.status == JobStatus.RUNNING
+    ).update({Job.heartbeat_at: func.now()}, synchronize_session=False)
+    db.commit()
+
+
+def requeue_stale_jobs(db: Session) -> int:
+    """
+    Devolver a la cola los jobs cuyo worker dejó de enviar heartbeats
+
+    Los hallazgos parciales del intento anterior se eliminan (y se restan
+    del rollup de métricas) para que el nuevo intento no los duplique. Sus
+    seguidores (sin worker ni heartbeat propios) vuelven a la cola con él.
+    Si el job superó `worker_max_attempts` se marca como FAILED y sus
+    seguidores se liberan (ver `release_followers`).
+
+    Args:
+        db: Sesión de base de datos
+
+    Returns:
+        Número de jobs recuperados
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.worker_lease_timeout_seconds)
+
+    # Los jobs creados antes de existir los heartbeats no tienen heartbeat_at
+    last_seen = func.coalesce(Job.heartbeat_at, Job.started_at, Job.created_at)
+    stale_jobs = db.query(Job).filter(
+        Job.status == JobStatus.RUNNING,
+        Job.leader_job_id.is_(None),
+        last_seen < cutoff
+    ).with_for_update(skip_locked=True).all()
+
+    if not stale_jobs:
+        return 0
+
+    stale_ids = [job.id for job in stale_jobs]
+    metrics_rollup.subtract_job_findings(db, stale_ids)
+    db.query(Finding).filter(Finding.job_id.in_(stale_ids)).delete(synchronize_session=False)
+
+    now = datetime.now(timezone.utc)
+    for job in stale_jobs:
+        logger.warning(f"Job {job.id} sin heartbeat del worker {job.worker_id}, intento {job.attempts}")
+        if (job.attempts or 0) >= settings.worker_max_attempts:
+            job.status = JobStatus.FAILED
+            job.finished_at = now
+            release_followers(db, job)
+        else:
+            job.status = JobStatus.QUEUED
+            job.started_at = None
+            db.query(Job).filter(
+                Job.leader_job_id == job.id,
+                Job.status == JobStatus.RUNNING
+            ).update({Job.status: JobStatus.QUEUED, Job.started_at: None}, synchronize_session=False)
+        job.worker_id = None
+        job.heartbeat_at = None
+        job.tool_results = None  # Sus findings se acaban de borrar
+        notify_metrics_changed(db, job.user_id)
+
+    db.commit()
+    return len(stale_jobs)
+
+
+def dedup_key(target_url: str, tools: List[str]) -> str:
+    """Clave de escaneos idénticos: URL normalizada y conjunto de herramientas"""
+    payload = f"{normalize_url(target_url)}|{','.join(sorted(set(tools)))}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def lock_dedup_key(db: Session, key: str) -> None:
+    """
+    Serializar por clave la creación de jobs y la finalización de su líder
+
+    Advisory lock de transacción: se libera con el commit. Así un job
+    nuevo o ve al líder todavía en curso (y el líder le copiará el
+    resultado al terminar) o ya terminado (y se ejecuta por su cuenta).
+    """
+    db.execute(select(func.pg_advisory_xact_lock(func.hashtextextended(key, 0))))
+
+
+def find_leader(db: Session, key: str) -> Optional[Job]:
+    """
+    Job en cola o en ejecución con la misma clave (llamar con el lock de la clave)
+
+    Returns:
+        El líder más antiguo, o None si no hay un escaneo idéntico en curso
+    """
+    return db.query(Job).filter(
+        Job.dedup_key == key,
+        Job.status.in_([JobStatus.QUEUED, JobStatus.RUNNING]),
+        Job.leader_job_id.is_(None)
+    ).order_by(Job.created_at).first()
+
+
+def finish_followers(db: Session, leader: Job) -> int:
+    """
+    Entregar el resultado de un líder que acaba de terminar a sus seguidores
+
+    Copia los findings del líder a cada seguidor (con su usuario y target),
+    los suma al rollup de métricas y les pone el estado, las fechas y el
+    `tool_results` del líder. No hace commit: debe ir en la misma
+    transacción que marca el líder como DONE o FAILED.
+
+    Args:
+        db: Sesión de base de datos
+        leader: Job líder, ya con su estado final
+
+    Returns:
+        Número de seguidores completados
+    """
+    if leader.dedup_key is None:
+        return 0
+
+    lock_dedup_key(db, leader.dedup_key)
+    followers = db.query(Job).filter(
+        Job.leader_job_id == leader.id,
+        Job.status.in_([JobStatus.QUEUED, JobStatus.RUNNING])
+    ).with_for_update().all()
+    if not followers:
+        return 0
+
+    follower_ids = [follower.id for follower in followers]
+    follower = aliased(Job)
+    db.execute(
+        insert(Finding).from_select(
+            ["id", "job_id", "user_id", "target_id", "severity", "title",
+             "description", "evidence", "recommendation", "tool"],
+            select(
+                func.gen_random_uuid(),
+                follower.id,
+                follower.user_id,
+                follower.target_id,
+                Finding.severity,
+                Finding.title,
+                Finding.description,
+                Finding.evidence,
+                Finding.recommendation,
+                Finding.tool,
+            ).select_from(Finding).join(follower, true()).where(
+                Finding.job_id == leader.id,
+                Finding.created_at >= leader.created_at,  # Poda de particiones
+                follower.id.in_(follower_ids)
+            )
+        )
+    )
+    metrics_rollup.add_job_findings(db, follower_ids)
+
+    for job in followers:
+        job.status = leader.status
+        job.started_at = job.started_at or leader.started_at
+        job.finished_at = leader.finished_at
+        job.tool_results = leader.tool_results
+    for user_id in {job.user_id for job in followers}:
+        notify_metrics_changed(db, user_id)
+
+    logger.info(f"Resultado del job {leader.id} copiado a {len(followers)} jobs idénticos")
+    return len(followers)
+
+
+def release_followers(db: Session, leader: Job, exclude_target_id: Optional[UUID] = None) -> int:
+    """
+    Devolver a la cola los seguidores de un líder que no les entregará resultado
+
+    Se usa cuando el líder falla o se va a eliminar (con su target). El
+    seguidor más antiguo pasa a ser el nuevo líder y los demás le siguen
+    a él, todos en QUEUED: el escaneo idéntico se ejecuta una sola vez más
+    y nadie espera al timeout del lease. No hace commit.
+
+    Args:
+        db: Sesión de base de datos
+        leader: Job líder que deja de serlo
+        exclude_target_id: Target cuyos jobs no se tocan (se van a eliminar con él)
+
+    Returns:
+        Número de seguidores devueltos a la cola
+    """
+    if leader.dedup_key is not None:
+        lock_dedup_key(db, leader.dedup_key)
+    query = db.query(Job).filter(
+        Job.leader_job_id == leader.id,
+        Job.status.in_([JobStatus.QUEUED, JobStatus.RUNNING])
+    )
+    if exclude_target_id is not None:
+        query = query.filter(Job.target_id != exclude_target_id)
+    followers = query.order_by(Job.created_at, Job.id).with_for_update().all()
+    if not followers:
+        return 0
+
+    new_leader = followers[0]
+    for job in followers:
+        job.leader_job_id = None if job is new_leader else new_leader.id
+        job.status = JobStatus.QUEUED
+        job.started_at = None
+        job.finished_at = None
+    for user_id in {job.user_id for job in followers}:
+        notify_metrics_changed(db, user_id)
+
+    logger.info(f"Job {new_leader.id} sustituye al job {leader.id} como líder de {len(followers)} jobs idénticos")
+    return len(followers)
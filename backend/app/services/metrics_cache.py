@@ -0,0 +1,181 @@
+"""
+Caché de respuestas de /metrics
+Por usuario, con TTL e invalidación entre procesos vía LISTEN/NOTIFY de PostgreSQL
+"""
+import asyncio
+import hashlib
+import logging
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, Optional
+
+import asyncpg
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.services.metrics_service import forget_all_inflight, forget_inflight
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Canal de NOTIFY; el payload es el UUID del usuario cuyas métricas cambiaron
+CHANNEL = "metrics_invalidated"
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    """Cuerpo JSON ya serializado y su ETag"""
+    body: bytes
+    etag: str
+
+
+class MetricsResponseCache:
+    """
+    Respuestas de /metrics por usuario
+
+    Cada usuario tiene una "generación" aleatoria que forma parte de la
+    clave; invalidar un usuario cambia su generación y deja inalcanzables
+    todas sus respuestas, que salen de la caché por TTL o LRU.
+
+    Solo está activa mientras el listener recibe las invalidaciones
+    (`enabled`); sin él cada petición se calcula de nuevo.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._responses = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._generations = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.invalidations = 0
+        self.enabled = False
+
+    def generation(self, user_id: Hashable) -> str:
+        """Generación actual del usuario (obtenerla ANTES de calcular la respuesta)"""
+        generation = self._generations.get(user_id)
+        if generation is None:
+            generation = uuid.uuid4().hex
+            self._generations.set(user_id, generation)
+        return generation
+
+    def get(self, user_id: Hashable, generation: str, key: str) -> Optional[CachedResponse]:
+        if not self.enabled:
+            return None
+        return self._responses.get((user_id, generation, key))
+
+    def set(self, user_id: Hashable, generation: str, key: str, body: bytes) -> CachedResponse:
+        """
+        Guardar una respuesta calculada con la generación indicada
+
+        Si el usuario se invalidó mientras se calculaba, la respuesta queda
+        bajo una generación antigua y no se vuelve a servir.
+        """
+        response = CachedResponse(body=body, etag=f'"{hashlib.sha1(body).hexdigest()}"')
+        if self.enabled:
+            self._responses.set((user_id, generation, key), response)
+        return response
+
+    def invalidate(self, user_id: Hashable) -> None:
+        self._generations.delete(user_id)
+        self.invalidations += 1
+
+    def clear(self) -> None:
+        self._responses.clear()
+        self._generations.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._responses.stats(), "invalidations": self.invalidations}
+
+
+# Instancia global del proceso (API)
+metrics_cache = MetricsResponseCache(
+    maxsize=settings.metrics_cache_max_entries,
+    ttl=settings.metrics_cache_ttl_seconds
+)
+
+
+def notify_metrics_changed(db: Session, user_id: uuid.UUID) -> None:
+    """
+    Avisar a las réplicas de la API de que las métricas de un usuario cambiaron
+
+    NOTIFY es transaccional: el aviso se entrega al hacer commit de `db`
+    (y se descarta si la transacción se deshace).
+    """
+    db.execute(select(func.pg_notify(CHANNEL, str(user_id))))
+
+
+def invalidate_user_metrics(user_id: Hashable) -> None:
+    """Invalidar en este proceso las respuestas y cálculos en curso de un usuario"""
+    metrics_cache.invalidate(user_id)
+    forget_inflight(user_id)
+
+
+def reset_metrics_cache(enabled: bool) -> None:
+    """
+    Vaciar la caché y los cálculos en curso de todos los usuarios
+
+    Args:
+        enabled: Si la caché puede volver a guardar respuestas (hay listener)
+    """
+    metrics_cache.clear()
+    forget_all_inflight()
+    metrics_cache.enabled = enabled
+
+
+class MetricsInvalidationListener:
+    """
+    Conexión dedicada con LISTEN sobre el canal de invalidación
+
+    Si la conexión se pierde se vacía la caché entera y se desactiva hasta
+    reconectar: sin LISTEN no llegan los avisos, así que nada de lo que se
+    guardara mientras tanto se invalidaría. Al reconectar se vacía de
+    nuevo (con los cálculos en curso) y se vuelve a activar.
+    """
+
+    def __init__(self, dsn: str, keepalive_seconds: float = 10.0):
+        self.dsn = dsn
+        self.keepalive_seconds = keepalive_seconds
+        self.connected = False
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(self.dsn)
+                await connection.add_listener(CHANNEL, self._on_notify)
+                reset_metrics_cache(enabled=True)
+                self.connected = True
+                logger.info(f"Escuchando invalidaciones de métricas en el canal {CHANNEL}")
+                while True:
+                    await asyncio.sleep(self.keepalive_seconds)
+                    # Detecta conexiones muertas, que is_closed() no ve sin tráfico
+                    await connection.execute("SELECT 1")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Conexión LISTEN de métricas perdida, reintentando: {str(e)}")
+            finally:
+                reset_metrics_cache(enabled=False)
+                self.connected = False
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            await asyncio.sleep(self.keepalive_seconds)
+
+    @staticmethod
+    def _on_notify(connection, pid, channel, payload) -> None:
+        try:
+            invalidate_user_metrics(uuid.UUID(payload))
+        except ValueError:
+            logger.warning(f"Payload inválido en {channel}: {payload!r}")
@@ -0,0 +1,177 @@
+"""
+Rollup de métricas de findings
+Mantiene la tabla finding_rollups en las mismas transacciones que escriben findings
+
+Reconstrucción completa (o de un usuario):
+    python -m app.services.metrics_rollup [--user-id UUID]
+"""
+import argparse
+import logging
+import uuid
+from collections import Counter
+from typing import Iterable, List, Optional
+
+from sqlalchemy import and_, delete, func, insert, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.database import WorkerSessionLocal
+from app.models.finding import Finding, FindingSeverity
+from app.models.finding_rollup import FindingRollup
+
+logger = logging.getLogger(__name__)
+
+_KEY_COLUMNS = ["user_id", "day", "tool", "severity", "target_id"]
+
+
+def record_findings(
+    db: Session,
+    user_id: uuid.UUID,
+    target_id: uuid.UUID,
+    tool: str,
+    severities: Iterable[FindingSeverity]
+) -> None:
+    """
+    Sumar al rollup los findings recién insertados de un job
+
+    Debe llamarse en la misma transacción que el INSERT de los findings:
+    si la transacción se deshace, el rollup también. El día es
+    CURRENT_DATE, el mismo que `date(created_at)` de las filas insertadas.
+
+    Args:
+        db: Sesión de base de datos (sin commit)
+        user_id: UUID del usuario propietario del job
+        target_id: UUID del target del job
+        tool: Herramienta que generó los findings
+        severities: Severidad de cada finding insertado
+    """
+    counts = Counter(severities)
+    if not counts:
+        return
+
+    # Orden fijo de filas: dos jobs del mismo target no se bloquean en orden cruzado
+    stmt = pg_insert(FindingRollup).values([
+        {
+            "user_id": user_id,
+            "day": func.current_date(),
+            "tool": tool,
+            "severity": severity,
+            "target_id": target_id,
+            "count": counts[severity],
+        }
+        for severity in sorted(counts, key=lambda s: s.name)
+    ])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=_KEY_COLUMNS,
+        set_={"count": FindingRollup.count + stmt.excluded.count}
+    ))
+
+
+def add_job_findings(db: Session, job_ids: List[uuid.UUID]) -> None:
+    """
+    Sumar al rollup todos los findings de unos jobs (p. ej. recién copiados)
+
+    Args:
+        db: Sesión de base de datos (sin commit; en la transacción que los insertó)
+        job_ids: Jobs cuyos findings se acaban de insertar
+    """
+    if not job_ids:
+        return
+
+    stmt = pg_insert(FindingRollup).from_select(
+        _KEY_COLUMNS + ["count"],
+        _grouped_findings().where(Finding.job_id.in_(job_ids))
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=_KEY_COLUMNS,
+        set_={"count": FindingRollup.count + stmt.excluded.count}
+    ))
+
+
+def subtract_job_findings(db: Session, job_ids: List[uuid.UUID]) -> None:
+    """
+    Restar del rollup los findings de unos jobs antes de borrarlos
+
+    Args:
+        db: Sesión de base de datos (sin commit; los findings se borran después)
+        job_ids: Jobs cuyos findings se van a eliminar
+    """
+    if not job_ids:
+        return
+
+    removed = _grouped_findings().where(Finding.job_id.in_(job_ids)).subquery()
+    db.execute(
+        update(FindingRollup)
+        .where(and_(*(getattr(FindingRollup, column) == removed.c[column] for column in _KEY_COLUMNS)))
+        .values(count=FindingRollup.count - removed.c.count)
+    )
+
+    affected_users = select(Finding.user_id).where(Finding.job_id.in_(job_ids))
+    db.execute(
+        delete(FindingRollup).where(
+            FindingRollup.user_id.in_(affected_users),
+            FindingRollup.count <= 0
+        )
+    )
+
+
+def rebuild(db: Session, user_id: Optional[uuid.UUID] = None) -> int:
+    """
+    Recalcular el rollup desde la tabla findings
+
+    Bloquea las escrituras concurrentes en finding_rollups mientras dura:
+    un escaneo que inserta findings espera y suma sus filas después.
+
+    Args:
+        db: Sesión de base de datos (hace commit)
+        user_id: Limitar a un usuario (por defecto, todos)
+
+    Returns:
+        Número de filas del rollup escritas
+    """
+    db.execute(text("LOCK TABLE finding_rollups IN SHARE ROW EXCLUSIVE MODE"))
+
+    source = _grouped_findings()
+    clear = delete(FindingRollup)
+    if user_id is not None:
+        source = source.where(Finding.user_id == user_id)
+        clear = clear.where(FindingRollup.user_id == user_id)
+
+    db.execute(clear)
+    result = db.execute(insert(FindingRollup).from_select(_KEY_COLUMNS + ["count"], source))
+    db.commit()
+    return result.rowcount
+
+
+def _grouped_findings():
+    """Findings agrupados por la clave del rollup"""
+    day = func.date(Finding.created_at)
+    return select(
+        Finding.user_id.label("user_id"),
+        day.label("day"),
+        Finding.tool.label("tool"),
+        Finding.severity.label("severity"),
+        Finding.target_id.label("target_id"),
+        func.count(Finding.id).label("count"),
+    ).group_by(
+        Finding.user_id, day, Finding.tool, Finding.severity, Finding.target_id
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Reconstruir el rollup de métricas de findings")
+    parser.add_argument("--user-id", type=uuid.UUID, help="Reconstruir solo este usuario")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    db = WorkerSessionLocal()
+    try:
+        rows = rebuild(db, args.user_id)
+        logger.info(f"Rollup de métricas reconstruido: {rows} filas")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Servicio de métricas
+Agregados de findings por usuario calculados en una sola pasada sobre el rollup
+"""
+import asyncio
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict
+from uuid import UUID
+
+from sqlalchemy import Date, DateTime, Interval, cast, func, literal, literal_column, select, text
+from sqlalchemy.sql import Select
+
+from app.database import AsyncSessionLocal
+from app.models.finding import Finding, FindingSeverity
+from app.models.finding_rollup import FindingRollup
+from app.models.job import Job
+
+
+@dataclass
+class FindingsSummary:
+    """Totales de jobs y findings de un usuario, por severidad y por herramienta"""
+    total_jobs: int = 0
+    total_findings: int = 0
+    by_severity: Dict[str, int] = field(default_factory=dict)
+    by_tool: Dict[str, int] = field(default_factory=dict)
+
+
+# Cálculos en curso por usuario: /summary, /by-severity y /by-tool se piden
+# a la vez al cargar el dashboard y comparten una única consulta
+_inflight: Dict[UUID, "asyncio.Task[FindingsSummary]"] = {}
+
+
+async def get_findings_summary(user_id: UUID) -> FindingsSummary:
+    """
+    Resumen de findings del usuario
+
+    Si ya hay un cálculo en curso para el mismo usuario se espera su
+    resultado en lugar de lanzar otra consulta.
+    """
+    task = _inflight.get(user_id)
+    if task is None:
+        task = asyncio.ensure_future(_compute_summary(user_id))
+        _inflight[user_id] = task
+        task.add_done_callback(lambda done: _inflight.pop(user_id, None) if _inflight.get(user_id) is done else None)
+    # shield: si un cliente se desconecta no se cancela el cálculo de los demás
+    return await asyncio.shield(task)
+
+
+def forget_inflight(user_id: UUID) -> None:
+    """
+    Desligar el cálculo en curso de un usuario (sus métricas acaban de cambiar)
+
+    Las peticiones que ya lo esperaban reciben su resultado; las nuevas
+    lanzan una consulta nueva.
+    """
+    _inflight.pop(user_id, None)
+
+
+def forget_all_inflight() -> None:
+    """Desligar los cálculos en curso de todos los usuarios"""
+    _inflight.clear()
+
+
+async def _compute_summary(user_id: UUID) -> FindingsSummary:
+    """
+    Una sola consulta sobre el rollup de findings del usuario:
+
+        GROUPING SETS ((severity), (tool), ())
+
+    El conjunto vacío da el total de findings (y garantiza una fila aunque
+    no haya findings); el total de jobs va como subconsulta escalar.
+    """
+    total_jobs = (
+        select(func.count(Job.id))
+        .where(Job.user_id == user_id)
+        .scalar_subquery()
+    )
+    query = (
+        select(
+            FindingRollup.severity,
+            FindingRollup.tool,
+            func.grouping(FindingRollup.severity).label("all_severities"),
+            func.grouping(FindingRollup.tool).label("all_tools"),
+            func.coalesce(func.sum(FindingRollup.count), 0).label("count"),
+            total_jobs.label("total_jobs"),
+        )
+        .where(FindingRollup.user_id == user_id)
+        .group_by(func.grouping_sets(FindingRollup.severity, FindingRollup.tool, text("()")))
+    )
+
+    summary = FindingsSummary(by_severity={severity.value: 0 for severity in FindingSeverity})
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(query)
+        for row in result:
+            summary.total_jobs = row.total_jobs
+            if not row.all_severities:
+                summary.by_severity[row.severity.value] = row.count
+            elif not row.all_tools:
+                summary.by_tool[row.tool] = row.count
+            else:
+                summary.total_findings = row.count
+
+    return summary
+
+
+# Granularidades del timeline y el paso de generate_series de cada una
+TIMELINE_STEPS = {
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+    "week": timedelta(weeks=1),
+}
+
+
+def timeline_query(user_id: UUID, days: int, granularity: str) -> Select:
+    """
+    Timeline de jobs y findings del usuario en una sola consulta
+
+    generate_series produce todos los buckets de la ventana (también los
+    vacíos) y se cruzan con los conteos agregados de jobs y findings. Por
+    día o semana los findings salen del rollup; por hora, de la tabla
+    findings (ix_findings_user_id_created_at).
+
+    Args:
+        user_id: UUID del usuario
+        days: Tamaño de la ventana en días (ya validado contra el máximo)
+        granularity: "hour", "day" o "week"
+
+    Returns:
+        SELECT con columnas bucket, jobs, findings ordenado por bucket
+    """
+    step = TIMELINE_STEPS[granularity]
+    # Literal en el SQL (viene de una lista cerrada): date_trunc debe ser la
+    # misma expresión en el SELECT y en el GROUP BY
+    unit = literal_column(f"'{granularity}'")
+
+    def bucket(column):
+        return func.date_trunc(unit, column)
+
+    window_start = bucket(literal(datetime.now(timezone.utc) - timedelta(days=days), DateTime(timezone=True)))
+
+    buckets = select(
+        func.generate_series(window_start, bucket(func.now()), literal(step, Interval)).label("bucket")
+    ).subquery("buckets")
+
+    jobs = select(
+        bucket(Job.created_at).label("bucket"),
+        func.count(Job.id).label("count")
+    ).where(
+        Job.user_id == user_id,
+        Job.created_at >= window_start
+    ).group_by(bucket(Job.created_at)).subquery("jobs_by_bucket")
+
+    if granularity == "hour":
+        findings = select(
+            bucket(Finding.created_at).label("bucket"),
+            func.count(Finding.id).label("count")
+        ).where(
+            Finding.user_id == user_id,
+            Finding.created_at >= window_start
+        ).group_by(bucket(Finding.created_at)).subquery("findings_by_bucket")
+    else:
+        rollup_day = cast(FindingRollup.day, DateTime(timezone=True))
+        findings = select(
+            bucket(rollup_day).label("bucket"),
+            func.sum(FindingRollup.count).label("count")
+        ).where(
+            FindingRollup.user_id == user_id,
+            FindingRollup.day >= cast(window_start, Date)
+        ).group_by(bucket(rollup_day)).subquery("findings_by_bucket")
+
+    return select(
+        buckets.c.bucket,
+        func.coalesce(jobs.c.count, 0).label("jobs"),
+        func.coalesce(findings.c.count, 0).label("findings"),
+    ).select_from(
+        buckets
+        .outerjoin(jobs, jobs.c.bucket == buckets.c.bucket)
+        .outerjoin(findings, findings.c.bucket == buckets.c.bucket)
+    ).order_by(buckets.c.bucket)
@@ -0,0 +1,148 @@
+"""
+Exportación de findings de un job (NDJSON / CSV)
+Streaming con cursor de servidor: la memoria no depende del tamaño del job
+"""
+import csv
+import io
+import json
+import logging
+import os
+from datetime import datetime
+from typing import AsyncIterator, Callable, Dict, List, Optional, Sequence, TextIO
+from uuid import UUID, uuid4
+
+import anyio
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.finding import Finding
+
+logger = logging.getLogger(__name__)
+
+# Columnas exportadas, en el orden de la cabecera CSV
+EXPORT_COLUMNS = (
+    "id", "job_id", "severity", "title", "description",
+    "evidence", "recommendation", "tool", "created_at",
+)
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def _row_values(row) -> List:
+    return [
+        str(row.id),
+        str(row.job_id),
+        row.severity.value,
+        row.title,
+        row.description,
+        row.evidence,
+        row.recommendation,
+        row.tool,
+        row.created_at.isoformat(),
+    ]
+
+
+def _ndjson_chunk(rows: Sequence) -> str:
+    return "".join(
+        json.dumps(dict(zip(EXPORT_COLUMNS, _row_values(row))), ensure_ascii=False) + "\n"
+        for row in rows
+    )
+
+
+def _csv_chunk(rows: Sequence, header: bool = False) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    writer.writerows(_row_values(row) for row in rows)
+    return buffer.getvalue()
+
+
+_FORMATTERS: Dict[str, Callable[[Sequence], str]] = {
+    "ndjson": _ndjson_chunk,
+    "csv": _csv_chunk,
+}
+
+
+def report_path(job_id: UUID, export_format: str) -> str:
+    """Ruta del informe de un job dentro del volumen de reports"""
+    return os.path.join(settings.reports_dir, f"{job_id}-findings.{export_format}")
+
+
+def _open_report(partial_path: str) -> Optional[TextIO]:
+    try:
+        os.makedirs(settings.reports_dir, exist_ok=True)
+        return open(partial_path, "w", encoding="utf-8", newline="")
+    except OSError as e:
+        # El volumen de reports es opcional: sin él solo se pierde la copia en disco
+        logger.warning(f"No se pudo escribir el informe en {partial_path}: {str(e)}")
+        return None
+
+
+def _close_report(report: TextIO, partial_path: str, final_path: str, completed: bool) -> None:
+    report.close()
+    try:
+        if completed:
+            os.replace(partial_path, final_path)
+        else:
+            # Cliente desconectado o error: no dejar informes truncados
+            os.remove(partial_path)
+    except OSError as e:
+        logger.warning(f"No se pudo publicar el informe {final_path}: {str(e)}")
+
+
+async def stream_findings(job_id: UUID, job_created_at: datetime, export_format: str) -> AsyncIterator[bytes]:
+    """
+    Generar el informe de findings de un job por bloques
+
+    Las filas se leen con un cursor de servidor (`yield_per`) y solo las
+    columnas exportadas, sin instanciar objetos ORM ni modelos Pydantic.
+    Cada bloque se envía al cliente y se copia a `reports_dir`; el fichero
+    solo se publica (rename atómico) si la exportación termina completa.
+    La E/S del fichero va al threadpool para no bloquear el event loop.
+
+    Args:
+        job_id: UUID del job (la pertenencia se valida en el router)
+        job_created_at: Creación del job (descarta particiones anteriores)
+        export_format: "ndjson" o "csv"
+    """
+    formatter = _FORMATTERS[export_format]
+    final_path = report_path(job_id, export_format)
+    # Nombre único: dos exportaciones simultáneas del mismo job no se pisan
+    partial_path = f"{final_path}.{uuid4().hex}.partial"
+    completed = False
+    report = await run_in_threadpool(_open_report, partial_path)
+
+    async def emit(chunk: str) -> bytes:
+        if report is not None:
+            await run_in_threadpool(report.write, chunk)
+        return chunk.encode("utf-8")
+
+    query = (
+        select(*(getattr(Finding, column) for column in EXPORT_COLUMNS))
+        .where(Finding.job_id == job_id, Finding.created_at >= job_created_at)
+        .order_by(Finding.severity.desc(), Finding.created_at.desc(), Finding.id.desc())
+        .execution_options(yield_per=settings.export_batch_size)
+    )
+
+    try:
+        if export_format == "csv":
+            yield await emit(_csv_chunk([], header=True))
+
+        async with AsyncSessionLocal() as db:
+            result = await db.stream(query)
+            async for rows in result.partitions():
+                yield await emit(formatter(rows))
+
+        completed = True
+    finally:
+        if report is not None:
+            # Si el cliente se desconecta la tarea está cancelada: sin el
+            # escudo el await no llegaría a cerrar ni borrar el fichero
+            with anyio.CancelScope(shield=True):
+                await run_in_threadpool(_close_report, report, partial_path, final_path, completed)
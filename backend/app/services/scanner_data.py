@@ -0,0 +1,229 @@
+"""
+Caché de datos de los scanners (plantillas de Nuclei, add-ons de ZAP)
+Un único actualizador en segundo plano; los escaneos la montan en solo lectura
+"""
+import fcntl
+import json
+import logging
+import os
+import shutil
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Set
+
+from app.config import settings
+from app.services.docker_client import get_docker_client
+
+logger = logging.getLogger(__name__)
+
+# Ruta de montaje dentro de los contenedores de escaneo
+NUCLEI_TEMPLATES_MOUNT = "/templates"
+ZAP_ADDONS_MOUNT = "/zap/plugin"  # Directorio de add-ons de la instalación de ZAP
+
+# Script del contenedor actualizador de ZAP: parte de los add-ons de la
+# imagen, aplica las actualizaciones (y pscanrulesBeta, que instala
+# zap-baseline.py) y deja el conjunto completo en /data/<versión>
+_ZAP_UPDATE_SCRIPT = """
+set -e
+mkdir -p "/data/$1"
+cp -r /zap/plugin/. "/data/$1/"
+zap.sh -cmd -dir /tmp/zaphome -addonupdate -addoninstall pscanrulesBeta
+cp /tmp/zaphome/plugin/*.zap "/data/$1/" 2>/dev/null || true
+"""
+
+
+class ScannerDataCache:
+    """
+    Directorios de datos versionados compartidos por los escaneos
+
+    Cada actualización escribe una versión nueva en
+    `{scanner_cache_dir}/{herramienta}/{versión}` y, solo si termina bien,
+    la publica en el fichero de estado. Los escaneos montan la versión
+    publicada en solo lectura, así que nunca ven una actualización a medias.
+    Un lock (fcntl) en `scanner_state_dir` garantiza un solo actualizador
+    entre todos los workers del host.
+
+    El directorio debe existir con la MISMA ruta en el host y en el worker
+    (los contenedores se lanzan contra el Docker del host).
+    """
+
+    def __init__(self, cache_dir: str, state_dir: str):
+        self.cache_dir = cache_dir
+        self.state_file = os.path.join(state_dir, "scanner_data.json")
+        self.lock_file = os.path.join(state_dir, "scanner_data.lock")
+        self._lock = threading.Lock()
+
+    def volumes(self, tool: str, version: Optional[str] = None) -> Dict[str, Dict[str, str]]:
+        """
+        Volúmenes de solo lectura para un contenedor de `tool`
+
+        Args:
+            tool: Herramienta
+            version: Versión a montar (por defecto, la publicada)
+
+        Returns:
+            Argumento `volumes` de docker-py (vacío si aún no hay versión publicada)
+        """
+        version = version or self.version(tool)
+        if not version:
+            return {}
+        mount = NUCLEI_TEMPLATES_MOUNT if tool == "Nuclei" else ZAP_ADDONS_MOUNT
+        return {self._version_dir(tool, version): {"bind": mount, "mode": "ro"}}
+
+    def version(self, tool: str) -> Optional[str]:
+        """Versión publicada de `tool` (None si aún no hay ninguna)"""
+        return (self.status().get(tool) or {}).get("version")
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        """Versión publicada por herramienta"""
+        try:
+            with open(self.state_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Actualizar los datos que hayan caducado
+
+        Si otro proceso tiene el lock no hace nada: ya hay una actualización en curso.
+
+        Args:
+            force: Actualizar aunque no hayan caducado
+
+        Returns:
+            True si este proceso ejecutó la actualización
+        """
+        os.makedirs(os.path.dirname(self.lock_file), exist_ok=True)
+        with self._lock, open(self.lock_file, "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                logger.info("Otro proceso está actualizando los datos de los scanners")
+                return False
+
+            try:
+                now = datetime.now(timezone.utc)
+                for tool, updater in (("Nuclei", self._update_nuclei), ("ZAP", self._update_zap)):
+                    entry = self.status().get(tool) or {}
+                    if not force and not self._is_due(entry, now):
+                        continue
+                    version = now.strftime("v%Y%m%d%H%M%S")
+                    try:
+                        updater(version)
+                    except Exception as e:
+                        # Los escaneos siguen usando la versión anterior
+                        logger.error(f"No se pudieron actualizar los datos de {tool}: {str(e)}")
+                        shutil.rmtree(self._version_dir(tool, version), ignore_errors=True)
+                        continue
+                    self._publish(tool, version, now)
+                    self._prune(tool)
+                    logger.info(f"Datos de {tool} actualizados a la versión {version}")
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+        return True
+
+    def _update_nuclei(self, version: str) -> None:
+        from app.services.scanners.nuclei_scanner import NucleiScanner
+        self._run_updater(
+            "Nuclei",
+            NucleiScanner.IMAGE,
+            entrypoint=["nuclei"],
+            command=["-update-templates", "-ud", f"/data/{version}", "-silent"]
+        )
+
+    def _update_zap(self, version: str) -> None:
+        from app.services.scanners.zap_scanner import ZAPScanner
+        self._run_updater(
+            "ZAP",
+            ZAPScanner.IMAGE,
+            entrypoint=["sh", "-c", _ZAP_UPDATE_SCRIPT, "zap-update"],
+            command=[version]
+        )
+
+    def _run_updater(self, tool: str, image: str, entrypoint, command) -> None:
+        from app.services.scanner_images import image_registry
+
+        tool_dir = os.path.join(self.cache_dir, tool.lower())
+        os.makedirs(tool_dir, exist_ok=True)
+        os.chmod(tool_dir, 0o777)  # La imagen de ZAP ejecuta como usuario zap
+
+        container = get_docker_client().containers.run(
+            image_registry.resolve(image),
+            entrypoint=entrypoint,
+            command=command,
+            detach=True,
+            volumes={tool_dir: {"bind": "/data", "mode": "rw"}},
+            mem_limit="2g",
+            labels={"auditor.updater": tool.lower()}
+        )
+        try:
+            result = container.wait(timeout=settings.scanner_data_update_timeout)
+            if result.get("StatusCode") != 0:
+                output = container.logs(stdout=True, stderr=True).decode("utf-8", errors="ignore")
+                raise RuntimeError(f"exit code {result.get('StatusCode')}: {output[-500:]}")
+        finally:
+            try:
+                container.remove(force=True)
+            except Exception:
+                pass
+
+    def _publish(self, tool: str, version: str, now: datetime) -> None:
+        state = self.status()
+        state[tool] = {"version": version, "updated_at": now.isoformat()}
+        tmp_file = f"{self.state_file}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_file, self.state_file)
+
+    def _prune(self, tool: str) -> None:
+        """
+        Conservar las `scanner_data_keep_versions` versiones más recientes
+
+        Tampoco se borra ninguna versión que monte un contenedor en marcha
+        (un daemon del pool precalentado puede vivir más que varias
+        actualizaciones); se eliminará en una actualización posterior.
+        """
+        tool_dir = os.path.join(self.cache_dir, tool.lower())
+        versions = sorted(name for name in os.listdir(tool_dir) if name.startswith("v"))
+        try:
+            mounted = self._mounted_versions(tool_dir)
+        except Exception as e:
+            logger.warning(f"No se pudo comprobar qué versiones de {tool} están montadas: {str(e)}")
+            return
+
+        for name in versions[:-settings.scanner_data_keep_versions]:
+            if name in mounted:
+                logger.info(f"Versión {name} de {tool} aún montada, no se elimina")
+                continue
+            shutil.rmtree(os.path.join(tool_dir, name), ignore_errors=True)
+
+    @staticmethod
+    def _mounted_versions(tool_dir: str) -> Set[str]:
+        """Versiones de `tool_dir` montadas por algún contenedor en marcha"""
+        mounted = set()
+        # sparse: los datos del listado ya incluyen los montajes
+        for container in get_docker_client().containers.list(sparse=True):
+            for mount in container.attrs.get("Mounts") or []:
+                source = mount.get("Source") or ""
+                if os.path.dirname(source.rstrip("/")) == tool_dir:
+                    mounted.add(os.path.basename(source.rstrip("/")))
+        return mounted
+
+    def _version_dir(self, tool: str, version: str) -> str:
+        return os.path.join(self.cache_dir, tool.lower(), version)
+
+    @staticmethod
+    def _is_due(entry: Dict[str, Any], now: datetime) -> bool:
+        updated_at: Optional[str] = entry.get("updated_at")
+        if not updated_at:
+            return True
+        age = now - datetime.fromisoformat(updated_at)
+        return age.total_seconds() >= settings.scanner_data_refresh_seconds
+
+
+# Instancia global del proceso
+scanner_data = ScannerDataCache(
+    cache_dir=settings.scanner_cache_dir,
+    state_dir=settings.scanner_state_dir
+)
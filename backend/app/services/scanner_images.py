@@ -0,0 +1,142 @@
+"""
+Imágenes de los scanners
+Pre-descarga de imágenes y fijado de tags mutables a digests
+"""
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from app.config import settings
+from app.services.docker_client import get_docker_client
+
+logger = logging.getLogger(__name__)
+
+# Estados posibles de una imagen
+PULLED = "pulled"  # Descargada y fijada al digest actual del registry
+PRESENT = "present"  # Disponible localmente sin consultar la red (modo offline)
+STALE = "stale"  # Falló la descarga; se usa la copia local existente
+MISSING = "missing"  # No hay copia local y no se pudo descargar
+
+
+def scanner_image_tags() -> List[str]:
+    """Tags de imagen usados por los scanners"""
+    from app.services.scanners import NucleiScanner, SSLyzeScanner, ZAPScanner
+    tags = [ZAPScanner.IMAGE, NucleiScanner.IMAGE]
+    if settings.sslyze_backend != "python":
+        tags.append(SSLyzeScanner.IMAGE)
+    return tags
+
+
+class ImageRegistry:
+    """
+    Registro local de imágenes de scanners
+
+    Resuelve cada tag a un digest y lo persiste en un fichero de estado
+    compartido (`scanner_state_dir`), de modo que los escaneos usan la
+    imagen fijada y la API puede mostrar el estado en /health.
+    """
+
+    def __init__(self, state_file: str, offline: bool):
+        self.state_file = state_file
+        self.offline = offline
+        self._state: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, tag: str) -> str:
+        """
+        Referencia con la que lanzar un contenedor para `tag`
+
+        Returns:
+            `repo@sha256:...` (o el ID de la imagen) si está fijada, el tag si no
+        """
+        with self._lock:
+            entry = self._state.get(tag)
+        if entry and entry.get("reference"):
+            return entry["reference"]
+        return tag
+
+    def prepull(self, tags: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Descargar (o localizar en modo offline) y fijar cada imagen
+
+        Args:
+            tags: Tags a procesar (por defecto, los de todos los scanners)
+
+        Returns:
+            Estado por tag
+        """
+        client = get_docker_client()
+        for tag in tags or scanner_image_tags():
+            entry = self._prepull_one(client, tag)
+            logger.info(f"Imagen {tag}: {entry['status']} {entry.get('reference') or ''}")
+            with self._lock:
+                self._state[tag] = entry
+
+        self._save()
+        return self.status()
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        """Estado de las imágenes; si este proceso no las gestiona se lee del fichero compartido"""
+        with self._lock:
+            if self._state:
+                return dict(self._state)
+        try:
+            with open(self.state_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _prepull_one(self, client, tag: str) -> Dict[str, Any]:
+        entry: Dict[str, Any] = {
+            "status": MISSING,
+            "reference": None,
+            "checked_at": datetime.now(timezone.utc).isoformat(),
+        }
+
+        if not self.offline:
+            try:
+                image = client.images.pull(tag)
+                entry.update(status=PULLED, reference=self._pinned_reference(tag, image))
+                return entry
+            except Exception as e:
+                logger.warning(f"No se pudo descargar {tag}, se usará la copia local: {str(e)}")
+                entry["error"] = str(e)
+
+        try:
+            image = client.images.get(tag)
+            entry.update(
+                status=PRESENT if self.offline else STALE,
+                reference=self._pinned_reference(tag, image)
+            )
+        except Exception:
+            pass
+        return entry
+
+    @staticmethod
+    def _pinned_reference(tag: str, image) -> str:
+        repository = tag.rsplit(":", 1)[0] if ":" in tag.rsplit("/", 1)[-1] else tag
+        for repo_digest in image.attrs.get("RepoDigests") or []:
+            if repo_digest.split("@", 1)[0] == repository:
+                return repo_digest
+        # Imagen sin digest de registry (construida o cargada localmente)
+        return image.id
+
+    def _save(self) -> None:
+        try:
+            os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+            tmp_file = f"{self.state_file}.tmp"
+            with self._lock, open(tmp_file, "w") as f:
+                json.dump(self._state, f, indent=2)
+            os.replace(tmp_file, self.state_file)
+        except OSError as e:
+            logger.warning(f"No se pudo guardar el estado de imágenes en {self.state_file}: {str(e)}")
+
+
+# Instancia global del proceso
+image_registry = ImageRegistry(
+    state_file=os.path.join(settings.scanner_state_dir, "scanner_images.json"),
+    offline=settings.scanner_images_offline
+)
@@ -2,69 +2,72 @@
 Servicio de Escaneo de Seguridad
 Integra con Docker para ejecutar herramientas de seguridad
 """
-import docker
+import contextlib
+import csv
+import io
 import json
-import os
 import logging
+import threading
+import time
 import uuid
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional
 from datetime import datetime
+from sqlalchemy import JSON, bindparam, cast, func, insert, text, update
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Session
 from app.models.job import Job, JobStatus
 from app.models.finding import Finding, FindingSeverity
 from app.config import settings
-from app.database import SessionLocal
+from app.database import WorkerSessionLocal
+from app.services import job_queue, metrics_rollup
+from app.services.docker_client import get_docker_client
+from app.services.metrics_cache import notify_metrics_changed
 
 # Configurar logging
 logger = logging.getLogger(__name__)
 
+# Marcador de NULL para COPY (así una cadena vacía sigue siendo '' y no NULL)
+_COPY_NULL = "\\N"
+
+# Cupos por herramienta compartidos por todos los jobs del proceso
+_TOOL_SLOTS = {
+    "ZAP": threading.BoundedSemaphore(settings.zap_max_concurrency),
+    "Nuclei": threading.BoundedSemaphore(settings.nuclei_max_concurrency),
+    "SSLyze": threading.BoundedSemaphore(settings.sslyze_max_concurrency),
+}
+
+
+@dataclass
+class BulkInsertResult:
+    """Resultado de una ingesta en bloque de findings"""
+    rows: int
+    seconds: float
+    
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else float(self.rows)
+
 
 class ScannerService:
     """Servicio para ejecutar escaneos de seguridad"""
     
-    def __init__(self):
-        """Inicializar cliente de Docker"""
-        original_docker_host = None
-        try:
-            # Limpiar cualquier variable de entorno DOCKER_HOST que pueda estar mal configurada
-            # y que pueda estar interfiriendo con la conexión
-            original_docker_host = os.environ.pop('DOCKER_HOST', None)
-            if original_docker_host:
-                logger.info(f"Variable DOCKER_HOST encontrada (será ignorada): {original_docker_host}")
-            
-            # Crear cliente usando el socket de Unix directamente
-            # La ruta correcta es /var/run/docker.sock (con barra inicial)
-            # El formato debe ser unix:///var/run/docker.sock (tres barras después de unix:)
-            self.docker_client = docker.DockerClient(
-                base_url='unix:///var/run/docker.sock',
-                version='auto'
-            )
-            
-            # Verificar que la conexión funciona
-            self.docker_client.ping()
-            logger.info("Cliente de Docker inicializado correctamente")
-            
-        except docker.errors.APIError as e:
-            logger.error(f"Error de API de Docker: {str(e)}")
-            # Restaurar DOCKER_HOST si existía
-            if original_docker_host:
-                os.environ['DOCKER_HOST'] = original_docker_host
-            raise Exception(f"No se pudo conectar a Docker: {str(e)}")
-        except Exception as e:
-            logger.error(f"No se pudo conectar a Docker: {str(e)}", exc_info=True)
-            # Intentar restaurar DOCKER_HOST si existía (aunque probablemente esté mal configurada)
-            if original_docker_host:
-                os.environ['DOCKER_HOST'] = original_docker_host
-            raise Exception(f"No se pudo conectar a Docker: {str(e)}")
+    @property
+    def docker_client(self):
+        """Cliente de Docker compartido del proceso"""
+        # El cliente se crea una sola vez por proceso (ver docker_client.py);
+        # aquí solo se obtiene, con un ping perezoso si hace falta. Se pide al
+        # lanzar cada herramienta: SSLyze con backend "python" no usa Docker.
+        return get_docker_client()
     
     @staticmethod
     def execute_scan(job_id: str, target_url: str, tools: List[str]):
         """
-        Ejecutar escaneo de seguridad en background
+        Ejecutar escaneo de seguridad (invocado por el worker, ver app/worker.py)
         
         IMPORTANTE: Esta función crea su propia sesión de base de datos
-        porque se ejecuta en una background task que puede ejecutarse
-        después de que el request HTTP haya terminado.
+        porque se ejecuta en un hilo del worker, fuera de cualquier request HTTP.
         
         Args:
             job_id: ID del job
@@ -72,7 +75,7 @@ class ScannerService:
             tools: Lista de herramientas a ejecutar
         """
         # Crear una nueva sesión de base de datos para esta tarea
-        db = SessionLocal()
+        db = WorkerSessionLocal()
         service = ScannerService()
         
         # Convertir job_id a UUID si es string (fuera del try para que esté disponible en except)
@@ -93,52 +96,42 @@ class ScannerService:
                 return
             
             job.status = JobStatus.RUNNING
-            job.started_at = datetime.utcnow()
+            if job.started_at is None:
+                job.started_at = datetime.utcnow()
             db.commit()
             db.refresh(job)
             logger.info(f"Job {job_id} actualizado a estado RUNNING")
             
-            # Ejecutar cada herramienta
-            for tool in tools:
-                logger.info(f"Ejecutando herramienta {tool} para job {job_id}")
-                findings = []
-                
-                try:
-                    if tool == "ZAP":
-                        findings = service._run_zap(target_url)
-                    elif tool == "Nuclei":
-                        findings = service._run_nuclei(target_url)
-                    elif tool == "SSLyze":
-                        findings = service._run_sslyze(target_url)
-                    
-                    logger.info(f"Herramienta {tool} encontró {len(findings)} hallazgos")
-                    
-                    # Guardar findings en la base de datos
-                    for finding_data in findings:
-                        finding = Finding(
-                            job_id=job_uuid,
-                            severity=finding_data["severity"],
-                            title=finding_data["title"],
-                            description=finding_data.get("description"),
-                            evidence=finding_data.get("evidence"),
-                            recommendation=finding_data.get("recommendation"),
-                            tool=tool
-                        )
-                        db.add(finding)
-                    
+            # Ejecutar las herramientas en paralelo: el tiempo total del job
+            # es el de la herramienta más lenta, no la suma de todas.
+            # Cada herramienta usa su propia sesión y hace commit al terminar.
+            with ThreadPoolExecutor(
+                max_workers=max(len(tools), 1),
+                thread_name_prefix=f"scan-{str(job_uuid)[:8]}"
+            ) as executor:
+                futures = {
+                    executor.submit(service._run_tool, job_uuid, target_url, tool): tool
+                    for tool in tools
+                }
+                for future in as_completed(futures):
+                    tool = futures[future]
+                    try:
+                        future.result()
+                    except Exception as tool_error:
+                        # Una herramienta fallida no cancela las demás
+                        logger.error(f"Error ejecutando herramienta {tool}: {str(tool_error)}", exc_info=True)
+                    # Sus findings ya están guardados: invalidar /metrics del usuario
+                    notify_metrics_changed(db, job.user_id)
                     db.commit()
-                    logger.info(f"Hallazgos de {tool} guardados en la base de datos")
-                    
-                except Exception as tool_error:
-                    logger.error(f"Error ejecutando herramienta {tool}: {str(tool_error)}", exc_info=True)
-                    # Continuar con la siguiente herramienta aunque esta haya fallado
-                    continue
             
             # Actualizar estado del job a done
             job = db.query(Job).filter(Job.id == job_uuid).first()
             if job:
                 job.status = JobStatus.DONE
                 job.finished_at = datetime.utcnow()
+                # Jobs idénticos que esperaban este escaneo reciben sus findings
+                job_queue.finish_followers(db, job)
+                notify_metrics_changed(db, job.user_id)
                 db.commit()
                 logger.info(f"Job {job_id} completado exitosamente")
             
@@ -146,11 +139,15 @@ class ScannerService:
             logger.error(f"Error crítico ejecutando escaneo para job {job_id}: {str(e)}", exc_info=True)
             # Actualizar estado del job a failed
             try:
+                db.rollback()  # La transacción puede haber quedado abortada por el error
                 job_uuid = uuid.UUID(job_id) if isinstance(job_id, str) else job_id
                 job = db.query(Job).filter(Job.id == job_uuid).first()
                 if job:
                     job.status = JobStatus.FAILED
                     job.finished_at = datetime.utcnow()
+                    # Los jobs idénticos no heredan el fallo: vuelven a la cola
+                    job_queue.release_followers(db, job)
+                    notify_metrics_changed(db, job.user_id)
                     db.commit()
                     logger.info(f"Job {job_id} marcado como FAILED")
             except Exception as db_error:
@@ -158,6 +155,166 @@ class ScannerService:
         finally:
             db.close()
     
+    @staticmethod
+    def bulk_insert_findings(
+        db: Session,
+        job_id: uuid.UUID,
+        tool: str,
+        findings: List[Dict[str, Any]],
+        batch_size: Optional[int] = None
+    ) -> "BulkInsertResult":
+        """
+        Insertar findings normalizados en bloque, sin objetos ORM
+        
+        Los lotes se escriben con un INSERT multi-fila; a partir de
+        `findings_copy_threshold` filas se usa COPY de PostgreSQL. El rollup
+        de métricas se actualiza en la misma transacción. No hace commit:
+        las filas quedan en la transacción de `db`.
+        
+        Args:
+            db: Sesión de base de datos
+            job_id: UUID del job (FK a jobs)
+            tool: Herramienta que generó los findings
+            findings: Findings normalizados (severity, title, description, ...)
+            batch_size: Filas por sentencia (por defecto `findings_insert_batch_size`)
+        
+        Returns:
+            Filas insertadas, duración y filas por segundo
+        """
+        batch_size = batch_size or settings.findings_insert_batch_size
+        started = time.perf_counter()
+        if not findings:
+            return BulkInsertResult(rows=0, seconds=0.0)
+        
+        # user_id / target_id se copian en cada finding: las métricas filtran
+        # findings por usuario sin pasar por jobs
+        user_id, target_id = db.query(Job.user_id, Job.target_id).filter(Job.id == job_id).one()
+        
+        rows = [
+            {
+                "id": uuid.uuid4(),
+                "job_id": job_id,
+                "user_id": user_id,
+                "target_id": target_id,
+                "severity": FindingSeverity(finding_data["severity"]),
+                "title": str(finding_data["title"])[:500],
+                "description": finding_data.get("description"),
+                "evidence": finding_data.get("evidence"),
+                "recommendation": finding_data.get("recommendation"),
+                "tool": tool,
+            }
+            for finding_data in findings
+        ]
+        
+        if len(rows) >= settings.findings_copy_threshold:
+            ScannerService._copy_findings(db, rows)
+        else:
+            for offset in range(0, len(rows), batch_size):
+                db.execute(insert(Finding).values(rows[offset:offset + batch_size]))
+        
+        metrics_rollup.record_findings(db, user_id, target_id, tool, (row["severity"] for row in rows))
+        
+        result = BulkInsertResult(rows=len(rows), seconds=time.perf_counter() - started)
+        logger.info(
+            f"{result.rows} hallazgos de {tool} insertados para job {job_id} "
+            f"en {result.seconds:.3f}s ({result.rows_per_second:.0f} filas/s)"
+        )
+        return result
+    
+    @staticmethod
+    def _copy_findings(db: Session, rows: List[Dict[str, Any]]) -> None:
+        """Cargar filas con COPY ... FROM STDIN dentro de la transacción de la sesión"""
+        columns = [
+            "id", "job_id", "user_id", "target_id", "severity", "title",
+            "description", "evidence", "recommendation", "tool",
+        ]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([
+                row["id"],
+                row["job_id"],
+                row["user_id"],
+                row["target_id"],
+                row["severity"].name,  # El enum de PostgreSQL almacena los nombres
+                row["title"],
+                *(_COPY_NULL if row[column] is None else row[column] for column in columns[6:9]),
+                row["tool"],
+            ])
+        buffer.seek(0)
+        
+        raw_connection = db.connection().connection
+        with raw_connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY findings ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '{_COPY_NULL}')",
+                buffer
+            )
+    
+    def _run_tool(self, job_uuid: uuid.UUID, target_url: str, tool: str) -> int:
+        """
+        Ejecutar una herramienta y guardar sus hallazgos
+        
+        Se ejecuta en un hilo propio con su propia sesión de base de datos,
+        de modo que los hallazgos quedan visibles en cuanto la herramienta
+        termina, sin esperar al resto del job.
+        
+        Args:
+            job_uuid: UUID del job
+            target_url: URL objetivo
+            tool: Herramienta a ejecutar
+        
+        Returns:
+            Número de hallazgos guardados
+        """
+        runners = {
+            "ZAP": self._run_zap,
+            "Nuclei": self._run_nuclei,
+            "SSLyze": self._run_sslyze,
+        }
+        runner = runners.get(tool)
+        if runner is None:
+            logger.warning(f"Herramienta desconocida {tool} para job {job_uuid}")
+            return 0
+        
+        db = WorkerSessionLocal()
+        saved = 0
+        
+        def persist(findings: List[Dict[str, Any]]) -> None:
+            nonlocal saved
+            result = ScannerService.bulk_insert_findings(db, job_uuid, tool, findings)
+            db.commit()
+            saved += result.rows
+        
+        try:
+            # Limitar cuántas instancias de cada herramienta corren a la vez en
+            # este proceso (p. ej. ZAP usa contenedores de 2g)
+            with self._tool_slot(tool):
+                logger.info(f"Ejecutando herramienta {tool} para job {job_uuid}")
+                if tool == "Nuclei":
+                    # Nuclei entrega lotes mientras escanea: se guardan al vuelo
+                    runner(target_url, on_findings=persist)
+                elif tool == "SSLyze":
+                    # Puede salir de la caché TLS; el origen queda en el job
+                    persist(runner(target_url, db=db, job_uuid=job_uuid))
+                else:
+                    persist(runner(target_url))
+            
+            logger.info(f"Herramienta {tool}: {saved} hallazgos guardados en la base de datos")
+        finally:
+            db.close()
+        
+        return saved
+    
+    @staticmethod
+    def _tool_slot(tool: str):
+        """Cupo de la herramienta en este proceso"""
+        if tool == "Nuclei" and settings.nuclei_batch_enabled:
+            # Los jobs esperan a su lote sin cupo: si no, un lote nunca
+            # reuniría más targets que nuclei_max_concurrency. El agrupador
+            # limita los contenedores simultáneos.
+            return contextlib.nullcontext()
+        return _TOOL_SLOTS[tool]
+    
     def _run_zap(self, target_url: str) -> List[Dict[str, Any]]:
         """Ejecutar OWASP ZAP baseline scan"""
         try:
@@ -168,23 +325,81 @@ class ScannerService:
             print(f"Error ejecutando ZAP: {str(e)}")
             return []
     
-    def _run_nuclei(self, target_url: str) -> List[Dict[str, Any]]:
-        """Ejecutar Nuclei scan"""
+    def _run_nuclei(self, target_url: str, on_findings=None) -> List[Dict[str, Any]]:
+        """Ejecutar Nuclei scan (en streaming si se pasa on_findings)"""
         try:
             from app.services.scanners.nuclei_scanner import NucleiScanner
             scanner = NucleiScanner(self.docker_client)
-            return scanner.scan(target_url)
+            return scanner.scan(target_url, on_findings=on_findings)
         except Exception as e:
             print(f"Error ejecutando Nuclei: {str(e)}")
             return []
     
-    def _run_sslyze(self, target_url: str) -> List[Dict[str, Any]]:
-        """Ejecutar SSLyze scan"""
+    def _run_sslyze(self, target_url: str, db: Session, job_uuid: uuid.UUID) -> List[Dict[str, Any]]:
+        """
+        Ejecutar SSLyze scan, reutilizando la caché TLS si hay un resultado vigente
+        
+        El resultado solo depende del servidor: si otro job escaneó el mismo
+        hostname con la misma versión dentro del TTL, se normaliza su salida
+        sin lanzar el escaneo. La salida de un escaneo completo se guarda en
+        la caché en la misma transacción que sus findings.
+        """
         try:
+            from app.services import tls_cache
             from app.services.scanners.sslyze_scanner import SSLyzeScanner
-            scanner = SSLyzeScanner(self.docker_client)
-            return scanner.scan(target_url)
+            if settings.sslyze_backend == "python":
+                scanner = SSLyzeScanner()
+            else:
+                scanner = SSLyzeScanner(self.docker_client)
+            
+            if not tls_cache.enabled():
+                return scanner.scan(target_url)
+            
+            hostname, port, tool_version = scanner.server_key(target_url)
+            cached = tls_cache.lookup(db, hostname, port, tool_version)
+            if cached is not None:
+                logger.info(f"SSLyze para job {job_uuid}: resultado cacheado de {hostname}:{port}")
+                ScannerService.record_tool_result(db, job_uuid, "SSLyze", {
+                    "source": "cache",
+                    "scanned_at": cached.scanned_at.isoformat(),
+                    "tool_version": tool_version,
+                })
+                return scanner.findings_from_output(cached.output)
+            
+            def on_output(output: str) -> None:
+                scanned_at = tls_cache.store(db, hostname, port, tool_version, output)
+                ScannerService.record_tool_result(db, job_uuid, "SSLyze", {
+                    "source": "scan",
+                    "scanned_at": scanned_at.isoformat(),
+                    "tool_version": tool_version,
+                })
+            
+            return scanner.scan(target_url, on_output=on_output)
         except Exception as e:
             print(f"Error ejecutando SSLyze: {str(e)}")
             return []
+    
+    @staticmethod
+    def record_tool_result(db: Session, job_uuid: uuid.UUID, tool: str, entry: Dict[str, Any]) -> None:
+        """
+        Anotar en `jobs.tool_results` el origen del resultado de una herramienta
+        
+        Se fusiona en SQL (jsonb ||): las herramientas de un job se ejecutan
+        en paralelo con sesiones distintas y no deben pisarse.
+        
+        Args:
+            db: Sesión de base de datos (sin commit)
+            job_uuid: UUID del job
+            tool: Herramienta
+            entry: Datos a guardar bajo la clave de la herramienta
+        """
+        # CAST explícito: jsonb_build_object acepta cualquier tipo y un parámetro
+        # sin tipo se guardaría como string JSON (y || crearía un array)
+        value = cast(bindparam(None, entry, type_=JSONB), JSONB)
+        current = func.coalesce(cast(Job.tool_results, JSONB), text("'{}'::jsonb"))
+        db.execute(
+            update(Job)
+            .where(Job.id == job_uuid)
+            .values(tool_results=cast(current.op("||")(func.jsonb_build_object(tool, value)), JSON))
+        )
 
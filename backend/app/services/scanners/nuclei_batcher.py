@@ -0,0 +1,229 @@
+"""
+Lotes de Nuclei entre jobs
+Agrupa los escaneos Nuclei en cola en una sola ejecución con `-l` y reparte
+cada resultado al job que lo pidió
+"""
+import json
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import urlparse
+
+from app.config import settings
+from app.services.docker_client import get_docker_client
+
+logger = logging.getLogger(__name__)
+
+# Marca de fin de resultados en la cola de cada petición
+_DONE = object()
+
+
+class NucleiBatchRequest:
+    """Escaneo de un target dentro de un lote; sus resultados llegan por una cola"""
+
+    def __init__(self, target_url: str):
+        self.target_url = target_url
+        self.queued_at = time.monotonic()
+        self._lines: "queue.Queue" = queue.Queue()
+
+    def lines(self) -> Iterator[bytes]:
+        """
+        Líneas JSONL de este target a medida que el lote las produce
+
+        Raises:
+            Exception: El error del lote, si el contenedor falló
+        """
+        while True:
+            item = self._lines.get()
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item + b"\n"
+
+    def put(self, item) -> None:
+        self._lines.put(item)
+
+
+class _ResultRouter:
+    """
+    Decide a qué target de un lote pertenece cada resultado
+
+    Por orden: `host` o `matched-at` igual al target, target más largo del
+    que `matched-at` es prefijo, y por último mismo hostname.
+    """
+
+    def __init__(self, requests: List[NucleiBatchRequest]):
+        self.by_target: Dict[str, List[NucleiBatchRequest]] = {}
+        for request in requests:
+            self.by_target.setdefault(self._key(request.target_url), []).append(request)
+        # Prefijos más largos primero
+        self._prefixes = sorted(self.by_target, key=len, reverse=True)
+        self._by_hostname: Dict[str, str] = {}
+        for target in self._prefixes:
+            self._by_hostname.setdefault(self._hostname(target), target)
+
+    @property
+    def targets(self) -> List[str]:
+        return list(self.by_target)
+
+    def route(self, result: Dict) -> List[NucleiBatchRequest]:
+        host = self._key(str(result.get("host") or ""))
+        matched_at = self._key(str(result.get("matched-at") or ""))
+
+        for candidate in (host, matched_at):
+            if candidate in self.by_target:
+                return self.by_target[candidate]
+        for target in self._prefixes:
+            if matched_at.startswith(target):
+                return self.by_target[target]
+        for candidate in (host, matched_at):
+            target = self._by_hostname.get(self._hostname(candidate))
+            if target is not None:
+                return self.by_target[target]
+        return []
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return url.strip().rstrip("/").lower()
+
+    @staticmethod
+    def _hostname(value: str) -> str:
+        # `host` puede venir sin esquema (p. ej. "example.com:443")
+        parsed = urlparse(value if "://" in value else f"//{value}")
+        return parsed.hostname or value
+
+
+class NucleiBatcher:
+    """
+    Agrupador de escaneos Nuclei del proceso worker
+
+    Un lote sale cuando reúne `max_targets` targets o cuando el más antiguo
+    lleva `max_wait` segundos esperando, lo que antes ocurra. Se ejecutan a
+    la vez como mucho `concurrency` lotes (un contenedor cada uno).
+    """
+
+    def __init__(self, max_targets: int, max_wait: float, concurrency: int):
+        self.max_targets = max_targets
+        self.max_wait = max_wait
+        self._pending: List[NucleiBatchRequest] = []
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="nuclei-batch")
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+    def submit(self, target_url: str) -> NucleiBatchRequest:
+        """Encolar un target; los resultados se leen con `lines()` de la petición devuelta"""
+        request = NucleiBatchRequest(target_url)
+        with self._cond:
+            if self._stopped:
+                raise RuntimeError("Nuclei batcher detenido")
+            self._pending.append(request)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._collect, name="nuclei-batcher", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return request
+
+    def shutdown(self) -> None:
+        with self._cond:
+            self._stopped = True
+            pending, self._pending = self._pending, []
+            self._cond.notify()
+        for request in pending:
+            request.put(RuntimeError("Nuclei batcher detenido"))
+        self._executor.shutdown(wait=False)
+
+    def _collect(self) -> None:
+        """Formar lotes y pasarlos al executor"""
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+
+                deadline = self._pending[0].queued_at + self.max_wait
+                while len(self._pending) < self.max_targets and not self._stopped:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if self._stopped:
+                    return
+
+                batch = self._pending[:self.max_targets]
+                self._pending = self._pending[self.max_targets:]
+
+            try:
+                self._executor.submit(self._run, batch)
+            except RuntimeError as e:
+                # shutdown() entre sacar el lote y enviarlo: sin esto sus
+                # jobs esperarían en lines() para siempre
+                for request in batch:
+                    request.put(e)
+                    request.put(_DONE)
+
+    def _run(self, batch: List[NucleiBatchRequest]) -> None:
+        from app.services.scanners.nuclei_scanner import NucleiScanner
+
+        router = _ResultRouter(batch)
+        unrouted = 0
+
+        def on_line(line: bytes) -> None:
+            nonlocal unrouted
+            line = line.strip()
+            if not line:
+                return
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                return
+            requests = router.route(result)
+            if not requests:
+                unrouted += 1
+            for request in requests:
+                request.put(line)
+
+        logger.info(f"Lote de Nuclei con {len(router.targets)} targets ({len(batch)} escaneos)")
+        error: Optional[Exception] = None
+        try:
+            NucleiScanner(get_docker_client()).run_batch(router.targets, on_line)
+        except Exception as e:
+            error = e
+        finally:
+            if unrouted:
+                logger.warning(f"{unrouted} resultados de Nuclei sin target del lote")
+            for request in batch:
+                if error is not None:
+                    request.put(error)
+                request.put(_DONE)
+
+
+_batcher: Optional[NucleiBatcher] = None
+_batcher_lock = threading.Lock()
+
+
+def get_nuclei_batcher() -> NucleiBatcher:
+    """Agrupador de Nuclei del proceso (se crea la primera vez)"""
+    global _batcher
+    with _batcher_lock:
+        if _batcher is None:
+            _batcher = NucleiBatcher(
+                max_targets=settings.nuclei_batch_max_targets,
+                max_wait=settings.nuclei_batch_max_wait_seconds,
+                concurrency=settings.nuclei_max_concurrency
+            )
+        return _batcher
+
+
+def shutdown_nuclei_batcher() -> None:
+    """Cancelar los lotes pendientes al detener el worker"""
+    global _batcher
+    with _batcher_lock:
+        batcher, _batcher = _batcher, None
+    if batcher is not None:
+        batcher.shutdown()
@@ -2,18 +2,36 @@
 Scanner de Nuclei
 """
 import json
+import os
+import shutil
+import tempfile
+import threading
 import docker
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional
 from app.models.finding import FindingSeverity
 from app.config import settings
+from app.services.container_pool import get_warm_pool, wait_until_ready
+from app.services.scanner_data import NUCLEI_TEMPLATES_MOUNT, scanner_data
+from app.services.scanner_images import image_registry
+
+# Etiqueta con la versión de plantillas montada en un contenedor del pool
+_TEMPLATES_LABEL = "auditor.templates"
+
+# Fichero con la lista de targets de un lote (ver nuclei_batcher.py)
+_TARGETS_FILE = "targets.txt"
+
+# Códigos de salida de `timeout` al cortar la ejecución (124, o 128+SIGTERM)
+_TIMEOUT_EXIT_CODES = (124, 143)
 
 
 class NucleiScanner:
     """Scanner para Nuclei"""
     
+    IMAGE = "projectdiscovery/nuclei:latest"
+    
     def __init__(self, docker_client):
         self.docker_client = docker_client
-        self.image = "projectdiscovery/nuclei:latest"
+        self.image = image_registry.resolve(self.IMAGE)
         self.timeout = settings.nuclei_timeout
     
     def _normalize_severity(self, nuclei_severity: str) -> FindingSeverity:
@@ -27,67 +45,276 @@ class NucleiScanner:
         }
         return mapping.get(nuclei_severity.lower(), FindingSeverity.INFO)
     
-    def scan(self, target_url: str) -> List[Dict[str, Any]]:
+    def _parse_line(self, line: bytes) -> Optional[Dict[str, Any]]:
+        """Convertir una línea JSONL de Nuclei en un finding normalizado"""
+        line = line.strip()
+        if not line:
+            return None
+        try:
+            result = json.loads(line)
+        except json.JSONDecodeError:
+            return None
+        
+        info = result.get("info", {})
+        return {
+            "severity": self._normalize_severity(info.get("severity", "info")),
+            "title": info.get("name", "Nuclei Finding"),
+            "description": info.get("description", ""),
+            "evidence": json.dumps(result.get("matched-at", "")),
+            "recommendation": f"Review and remediate: {info.get('reference', 'No reference available')}"
+        }
+    
+    def scan(
+        self,
+        target_url: str,
+        on_findings: Optional[Callable[[List[Dict[str, Any]]], None]] = None
+    ) -> List[Dict[str, Any]]:
         """
         Ejecutar escaneo Nuclei
         
+        El contenedor se lanza en modo detached (o se usa uno del pool
+        precalentado, o el target entra en un lote compartido con otros
+        jobs si están activos) y su salida se consume línea a línea
+        mientras el escaneo sigue en curso. Si se pasa `on_findings`,
+        los findings se entregan en lotes de `nuclei_stream_batch_size` en
+        cuanto están disponibles y no se acumulan en memoria.
+        
         Args:
             target_url: URL objetivo
+            on_findings: Callback opcional que recibe cada lote de findings
         
         Returns:
-            Lista de findings normalizados
+            Lista de findings normalizados (vacía si se usó `on_findings`)
         """
         findings = []
+        batch = []
+        total = 0
+        batch_size = settings.nuclei_stream_batch_size
+        
+        def emit(finding: Dict[str, Any], flush: bool = False) -> None:
+            nonlocal total
+            if finding is not None:
+                batch.append(finding)
+                total += 1
+            if batch and (flush or len(batch) >= batch_size):
+                if on_findings is not None:
+                    on_findings(list(batch))
+                else:
+                    findings.extend(batch)
+                batch.clear()
         
         try:
-            # Ejecutar Nuclei con salida JSON
-            container = self.docker_client.containers.run(
-                self.image,
-                command=f"-u {target_url} -json -rate-limit {settings.nuclei_rate_limit}",
-                detach=False,
-                remove=True,
-                network_mode="host",
-                timeout=self.timeout,
-                mem_limit="1g"
-            )
-            
-            # Parsear salida JSON línea por línea
-            if container:
-                output_lines = container.decode('utf-8').strip().split('\n')
-                for line in output_lines:
-                    if line.strip():
-                        try:
-                            result = json.loads(line)
-                            severity = self._normalize_severity(result.get("info", {}).get("severity", "info"))
-                            
-                            findings.append({
-                                "severity": severity,
-                                "title": result.get("info", {}).get("name", "Nuclei Finding"),
-                                "description": result.get("info", {}).get("description", ""),
-                                "evidence": json.dumps(result.get("matched-at", "")),
-                                "recommendation": f"Review and remediate: {result.get('info', {}).get('reference', 'No reference available')}"
-                            })
-                        except json.JSONDecodeError:
-                            continue
+            pool = get_warm_pool("Nuclei")
+            if settings.nuclei_batch_enabled:
+                # Una sola ejecución con los targets de varios jobs
+                from app.services.scanners.nuclei_batcher import get_nuclei_batcher
+                self._consume_lines(get_nuclei_batcher().submit(target_url).lines(), emit)
+            elif pool is not None:
+                # Contenedor precalentado con las plantillas ya cargadas
+                with pool.lease(timeout=self.timeout) as container:
+                    self._consume_lines(self._exec_in_warm_container(container, target_url), emit)
+            else:
+                self._run_container(target_url, emit)
+            emit(None, flush=True)
             
             # Si no hay findings, crear uno genérico
-            if not findings:
-                findings.append({
+            if total == 0:
+                emit({
                     "severity": FindingSeverity.INFO,
                     "title": "Nuclei Scan Completed",
                     "description": f"Nuclei scan completed for {target_url}",
                     "evidence": "No vulnerabilities found or scan completed without findings.",
                     "recommendation": "Continue regular security scanning."
-                })
+                }, flush=True)
             
         except Exception as e:
-            findings.append({
+            emit({
                 "severity": FindingSeverity.INFO,
                 "title": "Nuclei Scan Error",
                 "description": f"Error executing Nuclei scan: {str(e)}",
                 "evidence": str(e),
                 "recommendation": "Check Nuclei configuration and target accessibility."
-            })
+            }, flush=True)
         
         return findings
-
+    
+    def _command_args(self, target_args: List[str], templates: bool = False) -> List[str]:
+        args = [*target_args, "-json", "-rate-limit", str(settings.nuclei_rate_limit)]
+        if templates:
+            # Plantillas de la caché compartida (solo lectura): sin descargas ni comprobaciones
+            args += ["-ud", NUCLEI_TEMPLATES_MOUNT, "-duc"]
+        return args
+    
+    def _run_container(self, target_url: str, emit: Callable) -> None:
+        """Ejecutar Nuclei en un contenedor nuevo y consumir sus logs en streaming"""
+        volumes = scanner_data.volumes("Nuclei")
+        self._run_detached(
+            self._command_args(["-u", target_url], templates=bool(volumes)),
+            volumes,
+            self.timeout,
+            lambda chunks: self._consume_lines(chunks, emit)
+        )
+    
+    def run_batch(self, targets: List[str], on_line: Callable[[bytes], None]) -> None:
+        """
+        Escanear varios targets en un solo contenedor (`-l` con un fichero de targets)
+        
+        Las plantillas se cargan una vez para todo el lote. Cada línea JSONL
+        se entrega sin parsear a `on_line`, que la reparte al job que corresponda.
+        
+        Args:
+            targets: URLs objetivo (sin duplicados)
+            on_line: Callback que recibe cada línea de resultados
+        """
+        # El fichero de targets va en un directorio de trabajo con la misma
+        # ruta en el host, como el informe de ZAP
+        os.makedirs(settings.scanner_work_dir, exist_ok=True)
+        work_dir = tempfile.mkdtemp(prefix="nuclei-", dir=settings.scanner_work_dir)
+        try:
+            with open(os.path.join(work_dir, _TARGETS_FILE), "w") as f:
+                f.write("\n".join(targets) + "\n")
+            os.chmod(work_dir, 0o755)
+            
+            data_volumes = scanner_data.volumes("Nuclei")
+            self._run_detached(
+                self._command_args(["-l", f"/work/{_TARGETS_FILE}"], templates=bool(data_volumes)),
+                {work_dir: {"bind": "/work", "mode": "ro"}, **data_volumes},
+                settings.nuclei_batch_timeout,
+                lambda chunks: self._consume_raw_lines(chunks, on_line)
+            )
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    
+    def _run_detached(
+        self,
+        command: List[str],
+        volumes: Dict[str, Dict[str, str]],
+        timeout: int,
+        consume: Callable[[Iterable[bytes]], None]
+    ) -> None:
+        """
+        Lanzar Nuclei en segundo plano y pasar su stdout a `consume` mientras se ejecuta
+        
+        Raises:
+            TimeoutError: Si hubo que matar el contenedor por superar `timeout`
+        """
+        container = None
+        killer = None
+        timed_out = threading.Event()
+        try:
+            # Ejecutar Nuclei con salida JSON en segundo plano
+            container = self.docker_client.containers.run(
+                self.image,
+                command=command,
+                detach=True,
+                network_mode="host",
+                volumes=volumes,
+                mem_limit="1g"
+            )
+            
+            # El timeout se aplica matando el contenedor; eso cierra el stream de logs
+            killer = threading.Timer(timeout, self._kill, args=(container, timed_out))
+            killer.daemon = True
+            killer.start()
+            
+            consume(container.logs(stream=True, follow=True, stdout=True, stderr=False))
+            if timed_out.is_set():
+                raise TimeoutError(f"Nuclei no terminó en {timeout}s")
+        finally:
+            if killer is not None:
+                killer.cancel()
+            if container is not None:
+                try:
+                    container.remove(force=True)
+                except Exception:
+                    pass
+    
+    def _exec_in_warm_container(self, container, target_url: str) -> Iterator[bytes]:
+        """
+        Lanzar Nuclei con `docker exec` en un contenedor del pool y devolver su stdout
+        
+        Raises:
+            TimeoutError: Si `timeout` cortó la ejecución
+        """
+        # `timeout` (busybox) acota la ejecución: un exec no se puede matar desde fuera
+        templates = bool(container.labels.get(_TEMPLATES_LABEL))
+        args = self._command_args(["-u", target_url], templates=templates)
+        if not templates:
+            args.append("-duc")
+        # API de bajo nivel para poder leer el código de salida tras el stream
+        api = container.client.api
+        exec_id = api.exec_create(container.id, ["timeout", str(self.timeout), "nuclei", *args])["Id"]
+        for stdout, _stderr in api.exec_start(exec_id, stream=True, demux=True):
+            if stdout:
+                yield stdout
+        if api.exec_inspect(exec_id).get("ExitCode") in _TIMEOUT_EXIT_CODES:
+            raise TimeoutError(f"Nuclei no terminó en {self.timeout}s")
+    
+    def _consume_lines(self, chunks: Iterable[bytes], emit: Callable) -> None:
+        """Parsear salida JSONL línea por línea a medida que llega"""
+        def on_line(line: bytes) -> None:
+            finding = self._parse_line(line)
+            if finding is not None:
+                emit(finding)
+        
+        self._consume_raw_lines(chunks, on_line)
+    
+    @staticmethod
+    def _consume_raw_lines(chunks: Iterable[bytes], on_line: Callable[[bytes], None]) -> None:
+        """Partir la salida en líneas a medida que llega"""
+        buffer = b""
+        for chunk in chunks:
+            buffer += chunk
+            while b"\n" in buffer:
+                line, buffer = buffer.split(b"\n", 1)
+                on_line(line)
+        if buffer:
+            on_line(buffer)
+    
+    @staticmethod
+    def start_warm_container(docker_client, name: str):
+        """
+        Arrancar un contenedor de larga duración con las plantillas precargadas
+        
+        Si la caché compartida ya tiene plantillas se montan en solo lectura;
+        si no, el contenedor las descarga al arrancar.
+        """
+        version = scanner_data.version("Nuclei")
+        volumes = scanner_data.volumes("Nuclei", version)
+        labels = {"auditor.pool": "nuclei"}
+        if volumes:
+            labels[_TEMPLATES_LABEL] = version
+            startup = "touch /tmp/ready; "
+        else:
+            startup = "nuclei -update-templates -silent >/dev/null 2>&1; touch /tmp/ready; "
+        container = docker_client.containers.run(
+            image_registry.resolve(NucleiScanner.IMAGE),
+            entrypoint=["sh", "-c", startup + "while true; do sleep 3600; done"],
+            name=name,
+            detach=True,
+            network_mode="host",
+            volumes=volumes,
+            mem_limit="1g",
+            labels=labels
+        )
+        wait_until_ready(container, NucleiScanner.warm_container_ready, settings.warm_pool_start_timeout)
+        return container
+    
+    @staticmethod
+    def warm_container_ready(container) -> bool:
+        """Las plantillas están cargadas y el contenedor acepta ejecuciones"""
+        return container.exec_run(["test", "-f", "/tmp/ready"]).exit_code == 0
+    
+    @staticmethod
+    def warm_container_current(container) -> bool:
+        """El contenedor monta la versión de plantillas publicada"""
+        return container.labels.get(_TEMPLATES_LABEL) == scanner_data.version("Nuclei")
+    
+    @staticmethod
+    def _kill(container, timed_out: threading.Event) -> None:
+        """Detener un contenedor que superó el timeout"""
+        timed_out.set()
+        try:
+            container.kill()
+        except Exception:
+            pass
@@ -2,19 +2,185 @@
 Scanner de SSLyze
 """
 import json
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import docker
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional, Tuple
 from urllib.parse import urlparse
 from app.models.finding import FindingSeverity
 from app.config import settings
+from app.services.scanner_images import image_registry
+
+logger = logging.getLogger(__name__)
+
+# Backends disponibles (SSLYZE_BACKEND)
+DOCKER_BACKEND = "docker"
+PYTHON_BACKEND = "python"
+
+# SSLyze escanea el puerto por defecto de TLS (solo recibe el hostname)
+TLS_PORT = 443
+
+
+def _scan_hostnames(hostnames: List[str]) -> Dict[str, Tuple[bool, str]]:
+    """
+    Escanear varios hostnames con una sola instancia de `sslyze.Scanner`
+
+    Se ejecuta en un proceso del pool: la librería reparte los hostnames
+    entre sus propios hilos. Cada hostname devuelve el mismo JSON que
+    `sslyze --json_out -` (así la normalización es idéntica a la del
+    backend Docker) o el mensaje de error.
+
+    Returns:
+        {hostname: (True, json) | (False, error)}
+    """
+    from datetime import datetime, timezone
+    from sslyze import (
+        Scanner,
+        ServerNetworkLocation,
+        ServerScanRequest,
+        ServerScanResultAsJson,
+        SslyzeOutputAsJson,
+    )
+    from sslyze.errors import ServerHostnameCouldNotBeResolved
+
+    results: Dict[str, Tuple[bool, str]] = {}
+    requests = []
+    for hostname in hostnames:
+        try:
+            requests.append(ServerScanRequest(server_location=ServerNetworkLocation(hostname=hostname)))
+        except ServerHostnameCouldNotBeResolved as e:
+            results[hostname] = (False, f"Could not resolve hostname {hostname}: {str(e)}")
+
+    if requests:
+        started = datetime.now(timezone.utc)
+        scanner = Scanner(concurrent_server_scans_limit=len(requests))
+        scanner.queue_scans(requests)
+        for server_scan_result in scanner.get_results():
+            output = SslyzeOutputAsJson(
+                server_scan_results=[ServerScanResultAsJson.model_validate(server_scan_result)],
+                invalid_server_strings=[],
+                date_scans_started=started,
+                date_scans_completed=datetime.now(timezone.utc),
+            )
+            results[server_scan_result.server_location.hostname] = (True, output.model_dump_json())
+
+    return results
+
+
+class SSLyzeProcessPool:
+    """
+    Pool de procesos que ejecuta SSLyze con su API de Python
+
+    Los escaneos pendientes se agrupan: cada proceso libre recibe todos los
+    hostnames en espera (hasta `sslyze_batch_size`) y los escanea con un
+    único `Scanner`. Con poca carga cada lote es un solo hostname y no se
+    añade latencia.
+    """
+
+    def __init__(self, workers: int, batch_size: int):
+        self.workers = workers
+        self.batch_size = batch_size
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending: List[Tuple[str, Future]] = []
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def scan(self, hostname: str, timeout: float) -> str:
+        """
+        Escanear un hostname y devolver el JSON de SSLyze
+
+        Raises:
+            TimeoutError: Si no termina en `timeout` segundos
+            RuntimeError: Si SSLyze no pudo escanear el hostname
+        """
+        future: Future = Future()
+        with self._lock:
+            self._pending.append((hostname, future))
+            self._dispatch()
+        ok, output = future.result(timeout=timeout)
+        if not ok:
+            raise RuntimeError(output)
+        return output
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _dispatch(self) -> None:
+        """Enviar lotes mientras haya procesos libres (con el lock tomado)"""
+        while self._pending and self._in_flight < self.workers:
+            batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+            if self._executor is None:
+                # spawn: el worker tiene hilos en marcha y fork no es seguro
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            self._in_flight += 1
+            hostnames = sorted({hostname for hostname, _ in batch})
+            self._executor.submit(_scan_hostnames, hostnames).add_done_callback(
+                lambda done, batch=batch: self._complete(batch, done)
+            )
+
+    def _complete(self, batch: List[Tuple[str, Future]], done: Future) -> None:
+        try:
+            results = done.result()
+            error = None
+        except Exception as e:
+            results = {}
+            error = f"SSLyze process failed: {str(e)}"
+            if isinstance(e, BrokenProcessPool):
+                with self._lock:
+                    self._executor = None  # Se recrea en el siguiente lote
+
+        for hostname, future in batch:
+            if not future.done():
+                future.set_result(results.get(hostname, (False, error or f"No SSLyze result for {hostname}")))
+
+        with self._lock:
+            self._in_flight -= 1
+            self._dispatch()
+
+
+_process_pool: Optional[SSLyzeProcessPool] = None
+_process_pool_lock = threading.Lock()
+
+
+def get_process_pool() -> SSLyzeProcessPool:
+    """Pool de procesos de SSLyze del proceso (se crea la primera vez)"""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = SSLyzeProcessPool(
+                workers=settings.sslyze_process_workers,
+                batch_size=settings.sslyze_batch_size
+            )
+        return _process_pool
+
+
+def shutdown_process_pool() -> None:
+    """Detener los procesos de SSLyze al detener el worker"""
+    global _process_pool
+    with _process_pool_lock:
+        pool, _process_pool = _process_pool, None
+    if pool is not None:
+        pool.shutdown()
 
 
 class SSLyzeScanner:
     """Scanner para SSLyze"""
     
-    def __init__(self, docker_client):
+    IMAGE = "nablac0d3/sslyze:latest"
+    
+    def __init__(self, docker_client=None):
         self.docker_client = docker_client
-        self.image = "nablac0d3/sslyze:latest"
+        self.backend = settings.sslyze_backend
+        self.image = image_registry.resolve(self.IMAGE)
         self.timeout = settings.sslyze_timeout
     
     def _extract_hostname(self, url: str) -> str:
@@ -22,20 +188,104 @@ class SSLyzeScanner:
         parsed = urlparse(url)
         return parsed.hostname or url
     
+    def server_key(self, target_url: str) -> Tuple[str, int, str]:
+        """(hostname, puerto, versión de la herramienta) de los que depende el resultado"""
+        return self._extract_hostname(target_url), TLS_PORT, self.tool_version()
+    
+    def tool_version(self) -> str:
+        """Versión de SSLyze del backend activo (imagen fijada o paquete instalado)"""
+        if self.backend == PYTHON_BACKEND:
+            from importlib.metadata import PackageNotFoundError, version
+            try:
+                return f"python:{version('sslyze')}"
+            except PackageNotFoundError:
+                return "python:unknown"
+        return f"docker:{self.image}"
+    
+    def findings_from_output(self, output: str) -> List[Dict[str, Any]]:
+        """Findings a partir de una salida de SSLyze ya obtenida (p. ej. cacheada)"""
+        return self._normalize_sslyze_findings(output)
+    
+    @staticmethod
+    def _is_complete(output: str) -> bool:
+        """La salida es JSON y todos los servidores y comprobaciones se pudieron escanear"""
+        try:
+            results = json.loads(output).get("server_scan_results") or []
+        except (json.JSONDecodeError, AttributeError):
+            return False
+        return bool(results) and all(
+            SSLyzeScanner._scan_error(result) is None and not SSLyzeScanner._failed_commands(result)
+            for result in results
+        )
+    
+    @staticmethod
+    def _scan_error(server_result: Dict[str, Any]) -> Optional[str]:
+        """Motivo por el que SSLyze no pudo escanear un servidor (None si lo escaneó)"""
+        connectivity_status = server_result.get("connectivity_status")
+        if connectivity_status != "COMPLETED":
+            # La última línea de la traza es la excepción (p. ej. ServerRejectedConnection)
+            trace = (server_result.get("connectivity_error_trace") or "").strip()
+            return trace.splitlines()[-1] if trace else f"connectivity status {connectivity_status}"
+        scan_status = server_result.get("scan_status")
+        if scan_status != "COMPLETED":
+            return f"scan status {scan_status}"
+        return None
+    
+    @staticmethod
+    def _failed_commands(server_result: Dict[str, Any]) -> Dict[str, str]:
+        """Comprobaciones de SSLyze que terminaron con error: {comando: motivo}"""
+        return {
+            command: attempt.get("error_reason") or "ERROR"
+            for command, attempt in (server_result.get("scan_result") or {}).items()
+            if attempt and attempt.get("status") == "ERROR"
+        }
+    
     def _normalize_sslyze_findings(self, sslyze_output: str) -> List[Dict[str, Any]]:
-        """Normalizar salida de SSLyze a findings"""
+        """Normalizar salida JSON de SSLyze 6 (`SslyzeOutputAsJson`) a findings"""
         findings = []
         
         # Parsear JSON de SSLyze
         try:
             data = json.loads(sslyze_output)
             
-            # Extraer información de certificados y configuración TLS
-            for server_info in data.get("server_scan_results", []):
-                hostname = server_info.get("server_info", {}).get("hostname", "")
+            # Hostnames que SSLyze no llegó a escanear (p. ej. DNS)
+            for invalid in data.get("invalid_server_strings") or []:
+                findings.append({
+                    "severity": FindingSeverity.INFO,
+                    "title": "SSLyze Scan Error",
+                    "description": f"SSLyze could not scan {invalid.get('server_string')}: {invalid.get('error_message')}",
+                    "evidence": json.dumps(invalid),
+                    "recommendation": "Check that the hostname resolves and is reachable."
+                })
+            
+            for server_result in data.get("server_scan_results") or []:
+                location = server_result.get("server_location") or {}
+                hostname = location.get("hostname", "")
+                
+                # Sin conectividad o escaneo interrumpido: no hay resultados
+                error = self._scan_error(server_result)
+                if error:
+                    findings.append({
+                        "severity": FindingSeverity.INFO,
+                        "title": "SSLyze Scan Error",
+                        "description": f"SSLyze could not scan {hostname}:{location.get('port')}: {error}",
+                        "evidence": json.dumps({
+                            key: server_result.get(key)
+                            for key in ("connectivity_status", "scan_status", "connectivity_error_trace")
+                        }),
+                        "recommendation": "Check that the target accepts TLS connections and is reachable."
+                    })
+                    continue
+                
+                # Resultado de cada comprobación que terminó bien
+                results = {
+                    command: attempt["result"]
+                    for command, attempt in (server_result.get("scan_result") or {}).items()
+                    if attempt and attempt.get("status") == "COMPLETED" and attempt.get("result") is not None
+                }
                 
                 # Verificar certificado
-                cert_info = server_info.get("certificate_info", {})
+                cert_info = results.pop("certificate_info", None)
                 if cert_info:
                     findings.append({
                         "severity": FindingSeverity.INFO,
@@ -46,15 +296,24 @@ class SSLyzeScanner:
                     })
                 
                 # Verificar configuración TLS
-                tls_info = server_info.get("scan_commands_results", {})
-                if tls_info:
+                if results:
                     findings.append({
                         "severity": FindingSeverity.INFO,
                         "title": f"TLS Configuration for {hostname}",
-                        "description": f"TLS configuration details: {json.dumps(tls_info, indent=2)}",
-                        "evidence": json.dumps(tls_info),
+                        "description": f"TLS configuration details: {json.dumps(results, indent=2)}",
+                        "evidence": json.dumps(results),
                         "recommendation": "Review TLS configuration for security best practices."
                     })
+                
+                failed = self._failed_commands(server_result)
+                if failed:
+                    findings.append({
+                        "severity": FindingSeverity.INFO,
+                        "title": f"SSLyze Scan Errors for {hostname}",
+                        "description": f"Some SSLyze checks failed: {', '.join(sorted(failed))}",
+                        "evidence": json.dumps(failed),
+                        "recommendation": "Re-run the scan; the failed checks were not evaluated."
+                    })
         
         except json.JSONDecodeError:
             # Si no es JSON válido, crear un finding genérico
@@ -68,12 +327,21 @@ class SSLyzeScanner:
         
         return findings
     
-    def scan(self, target_url: str) -> List[Dict[str, Any]]:
+    def scan(
+        self,
+        target_url: str,
+        on_output: Optional[Callable[[str], None]] = None
+    ) -> List[Dict[str, Any]]:
         """
         Ejecutar escaneo SSLyze
         
+        Según `sslyze_backend`, en un contenedor (docker) o con la API de
+        Python en el pool de procesos (python); ambos producen el mismo JSON.
+        
         Args:
             target_url: URL objetivo
+            on_output: Callback opcional que recibe la salida JSON si el
+                escaneo se completó (para cachearla)
         
         Returns:
             Lista de findings normalizados
@@ -93,20 +361,15 @@ class SSLyzeScanner:
             return findings
         
         try:
-            # Ejecutar SSLyze con salida JSON
-            container = self.docker_client.containers.run(
-                self.image,
-                command=f"--json_out - {hostname}",
-                detach=False,
-                remove=True,
-                network_mode="host",
-                timeout=self.timeout,
-                mem_limit="512m"
-            )
+            if self.backend == PYTHON_BACKEND:
+                output = get_process_pool().scan(hostname, timeout=self.timeout)
+            else:
+                output = self._run_container(hostname)
             
-            if container:
-                output = container.decode('utf-8')
+            if output:
                 findings = self._normalize_sslyze_findings(output)
+                if on_output is not None and self._is_complete(output):
+                    on_output(output)
             else:
                 findings.append({
                     "severity": FindingSeverity.INFO,
@@ -126,4 +389,26 @@ class SSLyzeScanner:
             })
         
         return findings
-
+    
+    def _run_container(self, hostname: str) -> str:
+        """Ejecutar SSLyze en un contenedor y devolver su salida JSON"""
+        # Ejecutar SSLyze con salida JSON; el timeout se aplica a la espera
+        container = self.docker_client.containers.run(
+            self.image,
+            command=f"--json_out - {hostname}",
+            detach=True,
+            network_mode="host",
+            mem_limit="512m"
+        )
+        try:
+            try:
+                container.wait(timeout=self.timeout)
+            except Exception:
+                container.kill()
+                raise TimeoutError(f"SSLyze no terminó en {self.timeout}s")
+            return container.logs(stdout=True, stderr=False).decode('utf-8')
+        finally:
+            try:
+                container.remove(force=True)
+            except Exception:
+                pass
@@ -2,19 +2,88 @@
 Scanner de OWASP ZAP
 """
 import json
+import os
+import random
+import re
+import shutil
 import tempfile
 import docker
-from typing import List, Dict, Any
+import ijson
+from typing import List, Dict, Any, BinaryIO, Iterator, Optional
 from app.models.finding import FindingSeverity
 from app.config import settings
+from app.services.container_pool import get_warm_pool, wait_until_ready
+from app.services.scanner_data import scanner_data
+from app.services.scanner_images import image_registry
+
+# Nombre del informe JSON dentro del directorio de trabajo (/zap/wrk)
+_REPORT_NAME = "report.json"
+
+# Instancias (URLs) de cada alerta que se guardan como evidencia
+_MAX_INSTANCES = 20
+
+# riskcode / confidence del informe de ZAP
+_RISK_LABELS = {"0": "Informational", "1": "Low", "2": "Medium", "3": "High"}
+_CONFIDENCE_LABELS = {"0": "False Positive", "1": "Low", "2": "Medium", "3": "High", "4": "Confirmed"}
+
+_RISK_SEVERITY = {
+    "informational": FindingSeverity.INFO,
+    "low": FindingSeverity.LOW,
+    "medium": FindingSeverity.MEDIUM,
+    "high": FindingSeverity.HIGH,
+}
+
+_HTML_TAG = re.compile(r"<[^>]+>")
+
+
+def _strip_html(text: Optional[str]) -> Optional[str]:
+    """ZAP devuelve descripciones y soluciones con etiquetas <p>"""
+    if not text:
+        return text
+    return _HTML_TAG.sub(" ", text).strip()
+
+
+# Etiqueta con el puerto del daemon ZAP de un contenedor precalentado. Usan
+# la red del host (como el baseline en frío), así que cada daemon escucha en
+# su propio puerto del rango `warm_pool_zap_base_port`.
+_PORT_LABEL = "auditor.zap-port"
+
+# Etiqueta con la versión de add-ons montada en un contenedor del pool
+_ADDONS_LABEL = "auditor.addons"
+
+# Script ejecutado con `docker exec` dentro de un daemon ZAP precalentado.
+# Reproduce el baseline (spider de 1 minuto + escaneo pasivo) usando la API
+# de ZAP y la librería zapv2 que ya incluye la imagen; imprime las alertas en JSON.
+_WARM_SCAN_SCRIPT = """
+import json, sys, time
+from zapv2 import ZAPv2
+target = sys.argv[1]
+proxy = f"http://127.0.0.1:{sys.argv[2]}"
+zap = ZAPv2(apikey="", proxies={"http": proxy, "https": proxy})
+zap.core.new_session(overwrite=True)
+zap.spider.set_option_max_duration(1)
+scan_id = zap.spider.scan(target)
+while int(zap.spider.status(scan_id)) < 100:
+    time.sleep(1)
+while int(zap.pscan.records_to_scan) > 0:
+    time.sleep(1)
+print(json.dumps(zap.core.alerts(baseurl=target)))
+"""
+
+_WARM_READY_SCRIPT = """
+import sys, urllib.request
+urllib.request.urlopen(f"http://127.0.0.1:{sys.argv[1]}/JSON/core/view/version/", timeout=5).read()
+"""
 
 
 class ZAPScanner:
     """Scanner para OWASP ZAP"""
     
+    IMAGE = "ghcr.io/zaproxy/zaproxy:stable"
+    
     def __init__(self, docker_client):
         self.docker_client = docker_client
-        self.image = "ghcr.io/zaproxy/zaproxy:stable"
+        self.image = image_registry.resolve(self.IMAGE)
         self.timeout = settings.zap_baseline_timeout
     
     def scan(self, target_url: str) -> List[Dict[str, Any]]:
@@ -27,41 +96,57 @@ class ZAPScanner:
         Returns:
             Lista de findings normalizados
         """
+        pool = get_warm_pool("ZAP")
+        if pool is not None:
+            return self._scan_warm(pool, target_url)
+        
         findings = []
+        work_dir = None
+        container = None
         
         try:
-            # Ejecutar ZAP baseline scan
-            container_output = self.docker_client.containers.run(
+            # Directorio de trabajo compartido con el contenedor: zap-baseline.py
+            # escribe ahí el informe JSON. Debe existir con la misma ruta en el
+            # host, porque el contenedor se lanza contra el daemon del host.
+            os.makedirs(settings.scanner_work_dir, exist_ok=True)
+            work_dir = tempfile.mkdtemp(prefix="zap-", dir=settings.scanner_work_dir)
+            os.chmod(work_dir, 0o777)  # La imagen de ZAP ejecuta como usuario zap
+            
+            # Ejecutar ZAP baseline scan; los add-ons salen de la caché
+            # compartida (solo lectura) si ya está disponible
+            container = self.docker_client.containers.run(
                 self.image,
-                command=f"zap-baseline.py -t {target_url} -J -I",
-                detach=False,
-                remove=True,
+                command=f"zap-baseline.py -t {target_url} -J {_REPORT_NAME} -I",
+                detach=True,
                 network_mode="host",  # Para acceder a localhost si es necesario
-                timeout=self.timeout,
+                volumes={work_dir: {"bind": "/zap/wrk", "mode": "rw"}, **scanner_data.volumes("ZAP")},
                 mem_limit="2g",
                 cpu_period=100000,
                 cpu_quota=50000
             )
             
-            # Convertir output a string si es bytes
-            if isinstance(container_output, bytes):
-                output_str = container_output.decode('utf-8', errors='ignore')
-            else:
-                output_str = str(container_output)
+            try:
+                container.wait(timeout=self.timeout)
+            except Exception:
+                container.kill()
+                raise TimeoutError(f"ZAP baseline no terminó en {self.timeout}s")
             
-            # Parsear salida JSON (si está disponible)
-            # ZAP baseline puede generar JSON, pero también puede fallar
-            # Por ahora, creamos un finding genérico si el escaneo se completó
+            report_path = os.path.join(work_dir, _REPORT_NAME)
+            if not os.path.exists(report_path):
+                output_str = container.logs(stdout=True, stderr=True).decode('utf-8', errors='ignore')
+                raise RuntimeError(f"ZAP no generó el informe JSON. Container output: {output_str[-500:]}")
             
-            # Nota: En producción, deberías parsear el JSON real de ZAP
-            # Por ahora, simulamos un resultado básico
-            findings.append({
-                "severity": FindingSeverity.INFO,
-                "title": "ZAP Baseline Scan Completed",
-                "description": f"OWASP ZAP baseline scan completed for {target_url}",
-                "evidence": f"Scan executed successfully. Container output: {output_str[:500]}",
-                "recommendation": "Review the full ZAP report for detailed findings."
-            })
+            with open(report_path, "rb") as report:
+                findings = list(self._parse_report(report))
+            
+            if not findings:
+                findings.append({
+                    "severity": FindingSeverity.INFO,
+                    "title": "ZAP Baseline Scan Completed",
+                    "description": f"OWASP ZAP baseline scan completed for {target_url}",
+                    "evidence": "No alerts raised.",
+                    "recommendation": "Continue regular security scanning."
+                })
             
         except Exception as e:
             # Si el escaneo falla, crear un finding de error
@@ -72,6 +157,198 @@ class ZAPScanner:
                 "evidence": str(e),
                 "recommendation": "Check ZAP configuration and target accessibility."
             })
+        finally:
+            if container is not None:
+                try:
+                    container.remove(force=True)
+                except Exception:
+                    pass
+            if work_dir is not None:
+                shutil.rmtree(work_dir, ignore_errors=True)
         
         return findings
-
+    
+    def _parse_report(self, report: BinaryIO) -> Iterator[Dict[str, Any]]:
+        """
+        Convertir cada alerta del informe JSON de zap-baseline.py en un finding
+        
+        El informe se recorre en streaming con ijson: solo una alerta (con sus
+        instancias) está en memoria a la vez, aunque el informe ocupe decenas de MB.
+        """
+        for alert in ijson.items(report, "site.item.alerts.item"):
+            confidence = _CONFIDENCE_LABELS.get(str(alert.get("confidence")), "Unknown")
+            if confidence == "False Positive":
+                continue
+            
+            instances = alert.get("instances") or []
+            yield self._build_finding(
+                title=alert.get("alert") or alert.get("name"),
+                risk=_RISK_LABELS.get(str(alert.get("riskcode")), "Informational"),
+                confidence=confidence,
+                description=alert.get("desc"),
+                solution=alert.get("solution"),
+                details={
+                    "pluginid": alert.get("pluginid"),
+                    "cweid": alert.get("cweid"),
+                    "wascid": alert.get("wascid"),
+                    "count": alert.get("count", len(instances)),
+                    "reference": _strip_html(alert.get("reference")),
+                    "instances": [
+                        {key: instance.get(key) for key in ("uri", "method", "param", "evidence")}
+                        for instance in instances[:_MAX_INSTANCES]
+                    ],
+                }
+            )
+    
+    def _scan_warm(self, pool, target_url: str) -> List[Dict[str, Any]]:
+        """Ejecutar el baseline contra un daemon ZAP precalentado del pool"""
+        try:
+            with pool.lease(timeout=self.timeout) as container:
+                result = container.exec_run(
+                    [
+                        "timeout", str(self.timeout), "python3", "-c", _WARM_SCAN_SCRIPT,
+                        target_url, container.labels[_PORT_LABEL]
+                    ],
+                    demux=True
+                )
+            stdout, stderr = result.output
+            if result.exit_code != 0:
+                error = (stderr or b"").decode("utf-8", errors="ignore")
+                raise RuntimeError(f"exit code {result.exit_code}: {error[:500]}")
+            
+            findings = self._normalize_alerts(json.loads(stdout or b"[]"))
+            if not findings:
+                findings.append({
+                    "severity": FindingSeverity.INFO,
+                    "title": "ZAP Baseline Scan Completed",
+                    "description": f"OWASP ZAP baseline scan completed for {target_url}",
+                    "evidence": "No alerts raised.",
+                    "recommendation": "Continue regular security scanning."
+                })
+            return findings
+        
+        except Exception as e:
+            return [{
+                "severity": FindingSeverity.INFO,
+                "title": "ZAP Scan Error",
+                "description": f"Error executing ZAP scan: {str(e)}",
+                "evidence": str(e),
+                "recommendation": "Check ZAP configuration and target accessibility."
+            }]
+    
+    def _normalize_alerts(self, alerts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Agrupar las alertas de la API de ZAP por regla y convertirlas en findings"""
+        grouped: Dict[str, Dict[str, Any]] = {}
+        for alert in alerts:
+            if alert.get("confidence") == "False Positive":
+                continue
+            key = f"{alert.get('pluginId')}:{alert.get('alert')}"
+            group = grouped.setdefault(key, {"alert": alert, "instances": [], "count": 0})
+            group["count"] += 1
+            if len(group["instances"]) < _MAX_INSTANCES:
+                group["instances"].append({
+                    "uri": alert.get("url"),
+                    "method": alert.get("method"),
+                    "param": alert.get("param"),
+                    "evidence": alert.get("evidence"),
+                })
+        
+        findings = []
+        for group in grouped.values():
+            alert = group["alert"]
+            findings.append(self._build_finding(
+                title=alert.get("alert") or alert.get("name"),
+                risk=alert.get("risk", "Informational"),
+                confidence=alert.get("confidence", "Unknown"),
+                description=alert.get("description"),
+                solution=alert.get("solution"),
+                details={
+                    "pluginid": alert.get("pluginId"),
+                    "cweid": alert.get("cweid"),
+                    "wascid": alert.get("wascid"),
+                    "count": group["count"],
+                    "reference": alert.get("reference"),
+                    "instances": group["instances"],
+                }
+            ))
+        return findings
+    
+    def _build_finding(
+        self,
+        title: Optional[str],
+        risk: str,
+        confidence: str,
+        description: Optional[str],
+        solution: Optional[str],
+        details: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Finding normalizado a partir de una alerta de ZAP (informe o API)"""
+        return {
+            "severity": _RISK_SEVERITY.get(str(risk).lower(), FindingSeverity.INFO),
+            "title": title or "ZAP Alert",
+            "description": _strip_html(description),
+            "evidence": json.dumps({"risk": risk, "confidence": confidence, **details}, default=str),
+            "recommendation": _strip_html(solution) or "Review the ZAP alert details.",
+        }
+    
+    @staticmethod
+    def start_warm_container(docker_client, name: str):
+        """Arrancar un daemon ZAP de larga duración y esperar a que su API responda"""
+        port = ZAPScanner._free_warm_port(docker_client)
+        version = scanner_data.version("ZAP")
+        labels = {"auditor.pool": "zap", _PORT_LABEL: str(port)}
+        if version:
+            labels[_ADDONS_LABEL] = version
+        container = docker_client.containers.run(
+            image_registry.resolve(ZAPScanner.IMAGE),
+            command=[
+                "zap.sh", "-daemon",
+                "-host", "127.0.0.1",
+                "-port", str(port),
+                "-config", "api.disablekey=true",
+            ],
+            name=name,
+            detach=True,
+            network_mode="host",
+            volumes=scanner_data.volumes("ZAP", version),
+            mem_limit="2g",
+            cpu_period=100000,
+            cpu_quota=50000,
+            labels=labels
+        )
+        wait_until_ready(container, ZAPScanner.warm_container_ready, settings.warm_pool_start_timeout)
+        return container
+    
+    @staticmethod
+    def warm_container_ready(container) -> bool:
+        """La API del daemon ZAP responde"""
+        return container.exec_run(
+            ["python3", "-c", _WARM_READY_SCRIPT, container.labels[_PORT_LABEL]]
+        ).exit_code == 0
+    
+    @staticmethod
+    def warm_container_current(container) -> bool:
+        """El daemon monta la versión de add-ons publicada"""
+        return container.labels.get(_ADDONS_LABEL) == scanner_data.version("ZAP")
+    
+    @staticmethod
+    def _free_warm_port(docker_client) -> int:
+        """
+        Puerto del rango de daemons ZAP que no usa ningún contenedor del pool
+        
+        Se elige al azar entre los libres para que dos workers del mismo host
+        no choquen; si aun así el puerto está ocupado, el daemon no llega a
+        estar listo y el pool lo descarta.
+        """
+        used = {
+            container.labels.get(_PORT_LABEL)
+            for container in docker_client.containers.list(filters={"label": "auditor.pool=zap"})
+        }
+        base = settings.warm_pool_zap_base_port
+        free = [
+            port for port in range(base, base + settings.warm_pool_zap_port_range)
+            if str(port) not in used
+        ]
+        if not free:
+            raise RuntimeError("No quedan puertos libres para daemons ZAP")
+        return random.choice(free)
@@ -0,0 +1,60 @@
+"""
+Caché de resultados de escaneos TLS
+Salida de SSLyze por (hostname, puerto, versión de la herramienta) con TTL
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.tls_scan_result import TlsScanResult
+
+
+def enabled() -> bool:
+    return settings.tls_cache_ttl_seconds > 0
+
+
+def lookup(db: Session, hostname: str, port: int, tool_version: str) -> Optional[TlsScanResult]:
+    """
+    Resultado vigente (más reciente que el TTL) para un servidor
+
+    Returns:
+        El resultado cacheado, o None si no hay o caducó
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.tls_cache_ttl_seconds)
+    return db.execute(
+        select(TlsScanResult).where(
+            TlsScanResult.hostname == hostname,
+            TlsScanResult.port == port,
+            TlsScanResult.tool_version == tool_version,
+            TlsScanResult.scanned_at >= cutoff
+        )
+    ).scalar_one_or_none()
+
+
+def store(db: Session, hostname: str, port: int, tool_version: str, output: str) -> datetime:
+    """
+    Guardar (o reemplazar) la salida de un escaneo
+
+    Args:
+        db: Sesión de base de datos (sin commit)
+
+    Returns:
+        Fecha del escaneo guardada
+    """
+    scanned_at = datetime.now(timezone.utc)
+    stmt = pg_insert(TlsScanResult).values(
+        hostname=hostname,
+        port=port,
+        tool_version=tool_version,
+        output=output,
+        scanned_at=scanned_at
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["hostname", "port", "tool_version"],
+        set_={"output": stmt.excluded.output, "scanned_at": stmt.excluded.scanned_at}
+    ))
+    return scanned_at
@@ -0,0 +1,41 @@
+"""
+Helpers para paginación por cursor (keyset).
+"""
+import base64
+import json
+from typing import Any, List
+
+from fastapi import HTTPException, status
+
+# Header con el cursor de la página siguiente (ausente en la última página)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values: List[Any]) -> str:
+    """Cursor opaco a partir de los valores de ordenación de la última fila."""
+    raw = json.dumps([str(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[str]:
+    """
+    Recupera los valores de un cursor generado por encode_cursor.
+
+    Lanza HTTPException 400 si el cursor no es válido.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, TypeError):
+        values = None
+
+    # encode_cursor solo genera strings: cualquier otro valor es un cursor manipulado
+    if (
+        not isinstance(values, list)
+        or len(values) != size
+        or not all(isinstance(value, str) for value in values)
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor inválido"
+        )
+    return values
@@ -0,0 +1,259 @@
+"""
+Worker de escaneos
+Proceso independiente de la API que reclama jobs en cola y los ejecuta
+
+Uso:
+    python -m app.worker
+"""
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional
+
+from app.config import settings
+from app.database import WorkerSessionLocal, pool_stats, worker_engine
+from app.services import container_pool, findings_partitions, job_queue
+from app.services.scanner_data import scanner_data
+from app.services.scanner_images import image_registry
+from app.services.scanner_service import ScannerService
+from app.services.scanners.nuclei_batcher import shutdown_nuclei_batcher
+from app.services.scanners.sslyze_scanner import shutdown_process_pool
+
+logger = logging.getLogger(__name__)
+
+
+class ScanWorker:
+    """
+    Worker que ejecuta jobs de escaneo con concurrencia limitada
+
+    Cada nodo ejecuta como máximo `concurrency` jobs a la vez. Se pueden
+    añadir nodos worker sin añadir réplicas de la API.
+    """
+
+    def __init__(self, concurrency: Optional[int] = None, worker_id: Optional[str] = None):
+        self.concurrency = concurrency or settings.worker_concurrency
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.concurrency,
+            thread_name_prefix="scan-worker"
+        )
+        self._active: Dict[str, Future] = {}
+        self._stop = threading.Event()
+        self._last_heartbeat = 0.0
+        self._last_reap = 0.0
+        self._last_pool_maintenance = 0.0
+        self._pool_maintenance_thread: Optional[threading.Thread] = None
+        self._last_partition_maintenance = float("-inf")  # Primera vuelta: al arrancar
+        self._partition_maintenance_thread: Optional[threading.Thread] = None
+        self._last_image_refresh = time.monotonic()
+        self._image_refresh_thread: Optional[threading.Thread] = None
+        self._last_data_refresh = float("-inf")  # Primera vuelta: al arrancar
+        self._data_refresh_thread: Optional[threading.Thread] = None
+
+    def stop(self) -> None:
+        """Dejar de reclamar jobs nuevos; los jobs en curso terminan normalmente"""
+        if not self._stop.is_set():
+            logger.info(f"Worker {self.worker_id} deteniéndose, esperando {len(self._active)} jobs en curso")
+        self._stop.set()
+
+    def run_forever(self) -> None:
+        """Bucle principal: reclamar, ejecutar, enviar heartbeats y recuperar jobs huérfanos"""
+        logger.info(f"Worker {self.worker_id} iniciado con concurrencia {self.concurrency}")
+
+        while not self._stop.is_set() or self._active:
+            self._collect_finished()
+
+            try:
+                self._maybe_heartbeat()
+                if not self._stop.is_set():
+                    self._maybe_requeue_stale()
+                    self._maybe_maintain_pools()
+                    self._maybe_maintain_partitions()
+                    self._maybe_refresh_images()
+                    self._maybe_refresh_scanner_data()
+                    self._claim_and_submit()
+            except Exception as e:
+                # Un fallo de BD no debe matar el worker; se reintenta en la siguiente vuelta
+                logger.error(f"Error en el bucle del worker: {str(e)}", exc_info=True)
+
+            time.sleep(settings.worker_poll_interval_seconds)
+
+        self._executor.shutdown(wait=True)
+        if self._pool_maintenance_thread is not None:
+            self._pool_maintenance_thread.join()
+        container_pool.shutdown_pools()
+        shutdown_nuclei_batcher()
+        shutdown_process_pool()
+        logger.info(f"Worker {self.worker_id} detenido")
+
+    def _collect_finished(self) -> None:
+        for job_id, future in list(self._active.items()):
+            if future.done():
+                del self._active[job_id]
+                if future.exception():
+                    logger.error(f"Job {job_id} terminó con excepción: {future.exception()}")
+
+    def _claim_and_submit(self) -> None:
+        free_slots = self.concurrency - len(self._active)
+        if free_slots <= 0:
+            return
+
+        db = WorkerSessionLocal()
+        try:
+            claimed = job_queue.claim_jobs(db, self.worker_id, free_slots)
+        finally:
+            db.close()
+
+        for job in claimed:
+            logger.info(f"Worker {self.worker_id} reclamó job {job.job_id}")
+            self._active[job.job_id] = self._executor.submit(
+                ScannerService.execute_scan,
+                job_id=job.job_id,
+                target_url=job.target_url,
+                tools=job.tools
+            )
+
+    def _maybe_heartbeat(self) -> None:
+        now = time.monotonic()
+        if not self._active or now - self._last_heartbeat < settings.worker_heartbeat_interval_seconds:
+            return
+
+        db = WorkerSessionLocal()
+        try:
+            job_queue.heartbeat(db, self.worker_id, list(self._active.keys()))
+            self._last_heartbeat = now
+        finally:
+            db.close()
+
+    def _maybe_requeue_stale(self) -> None:
+        now = time.monotonic()
+        if now - self._last_reap < settings.worker_heartbeat_interval_seconds:
+            return
+
+        db = WorkerSessionLocal()
+        try:
+            requeued = job_queue.requeue_stale_jobs(db)
+            if requeued:
+                logger.info(f"{requeued} jobs huérfanos recuperados")
+            self._last_reap = now
+            logger.debug(f"Pool de BD del worker: {pool_stats(worker_engine)}")
+        finally:
+            db.close()
+
+    def _maybe_maintain_pools(self) -> None:
+        now = time.monotonic()
+        if now - self._last_pool_maintenance < settings.worker_heartbeat_interval_seconds:
+            return
+        if self._pool_maintenance_thread is not None and self._pool_maintenance_thread.is_alive():
+            return
+
+        # Las comprobaciones de salud hacen `docker exec`: no bloquear el bucle de reclamación
+        self._pool_maintenance_thread = threading.Thread(
+            target=container_pool.maintain_pools,
+            name="pool-maintenance",
+            daemon=True
+        )
+        self._pool_maintenance_thread.start()
+        self._last_pool_maintenance = now
+
+    def _maybe_maintain_partitions(self) -> None:
+        now = time.monotonic()
+        if now - self._last_partition_maintenance < settings.findings_partition_check_seconds:
+            return
+        if self._partition_maintenance_thread is not None and self._partition_maintenance_thread.is_alive():
+            return
+
+        # Mover filas de la partición DEFAULT o esperar el lock de un DETACH
+        # pueden tardar: no bloquear el bucle de reclamación
+        self._partition_maintenance_thread = threading.Thread(
+            target=maintain_findings_partitions,
+            name="partition-maintenance",
+            daemon=True
+        )
+        self._partition_maintenance_thread.start()
+        self._last_partition_maintenance = now
+
+    def _maybe_refresh_images(self) -> None:
+        now = time.monotonic()
+        if now - self._last_image_refresh < settings.scanner_image_refresh_seconds:
+            return
+        if self._image_refresh_thread is not None and self._image_refresh_thread.is_alive():
+            return
+
+        # La descarga puede tardar minutos: no bloquear el bucle de reclamación
+        self._image_refresh_thread = threading.Thread(
+            target=prepull_images,
+            name="image-refresh",
+            daemon=True
+        )
+        self._image_refresh_thread.start()
+        self._last_image_refresh = now
+
+    def _maybe_refresh_scanner_data(self) -> None:
+        now = time.monotonic()
+        if now - self._last_data_refresh < settings.scanner_data_refresh_seconds:
+            return
+        if self._data_refresh_thread is not None and self._data_refresh_thread.is_alive():
+            return
+
+        # Plantillas de Nuclei y add-ons de ZAP: los escaneos siguen con la
+        # versión publicada mientras se descarga la nueva
+        self._data_refresh_thread = threading.Thread(
+            target=refresh_scanner_data,
+            name="scanner-data-refresh",
+            daemon=True
+        )
+        self._data_refresh_thread.start()
+        self._last_data_refresh = now
+
+
+def prepull_images() -> None:
+    """Descargar y fijar las imágenes de los scanners; un fallo no impide arrancar"""
+    try:
+        image_registry.prepull()
+    except Exception as e:
+        logger.error(f"Error pre-descargando imágenes de scanners: {str(e)}")
+
+
+def maintain_findings_partitions() -> None:
+    """Crear y retirar particiones de findings; un fallo se reintenta en la siguiente comprobación"""
+    try:
+        findings_partitions.maintain_partitions(worker_engine)
+    except Exception as e:
+        logger.error(f"Error manteniendo las particiones de findings: {str(e)}")
+
+
+def refresh_scanner_data() -> None:
+    """Actualizar la caché de datos de los scanners; un fallo no afecta a los escaneos"""
+    try:
+        scanner_data.refresh()
+    except Exception as e:
+        logger.error(f"Error actualizando los datos de los scanners: {str(e)}")
+
+
+def main() -> None:
+    logging.basicConfig(
+        level=settings.api_log_level.upper(),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+    # Descargar las imágenes antes de reclamar jobs, para que la primera
+    # descarga no consuma el timeout de ningún escaneo
+    prepull_images()
+    worker = ScanWorker()
+
+    def _handle_signal(signum, frame):
+        worker.stop()
+
+    signal.signal(signal.SIGTERM, _handle_signal)
+    signal.signal(signal.SIGINT, _handle_signal)
+
+    worker.run_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+"""
+Tests del cliente de Docker compartido
+"""
+from app.services import docker_client
+
+
+def test_read_timeout_covers_nuclei_batches(monkeypatch):
+    monkeypatch.setattr(docker_client.settings, "docker_api_timeout", 900)
+    monkeypatch.setattr(docker_client.settings, "nuclei_timeout", 300)
+    monkeypatch.setattr(docker_client.settings, "nuclei_batch_timeout", 1800)
+
+    # Un lote sin resultados no debe agotar la lectura antes que su timeout
+    assert docker_client.read_timeout() > 1800
+
+
+def test_read_timeout_keeps_larger_configured_value(monkeypatch):
+    monkeypatch.setattr(docker_client.settings, "docker_api_timeout", 7200)
+    monkeypatch.setattr(docker_client.settings, "nuclei_batch_timeout", 1800)
+
+    assert docker_client.read_timeout() == 7200
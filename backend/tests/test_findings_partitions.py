@@ -0,0 +1,98 @@
+"""
+Tests de las particiones mensuales de findings (requieren Postgres: TEST_DATABASE_URL)
+"""
+from datetime import date, datetime, timezone
+
+import pytest
+from sqlalchemy import text
+
+from app.models import FindingSeverity, JobStatus
+from app.services import findings_partitions
+from app.services.scanner_service import ScannerService
+
+# Mes sin partición: muy posterior a los que crean la migración y el worker
+_FAR_MONTH = date(2099, 1, 1)
+
+
+@pytest.fixture
+def far_month(db, migrated_engine):
+    yield _FAR_MONTH
+    db.rollback()  # DETACH espera a las transacciones abiertas sobre findings
+    name = findings_partitions.partition_name(_FAR_MONTH)
+    with migrated_engine.begin() as connection:
+        if _FAR_MONTH in findings_partitions.attached_partitions(connection):
+            connection.execute(text(f"ALTER TABLE findings DETACH PARTITION {name}"))
+        connection.execute(text(f"DROP TABLE IF EXISTS {name}"))
+
+
+def _partition_of(db, job_id) -> str:
+    return db.execute(
+        text("SELECT DISTINCT tableoid::regclass::text FROM findings WHERE job_id = :job_id"),
+        {"job_id": job_id}
+    ).scalar_one()
+
+
+def test_finding_without_monthly_partition_goes_to_default(db, make_job, far_month):
+    job = make_job(status=JobStatus.RUNNING)
+    ScannerService.bulk_insert_findings(db, job.id, "Nuclei", [
+        {"severity": FindingSeverity.LOW, "title": "Hoy"},
+    ])
+    db.execute(
+        text("UPDATE findings SET created_at = :created_at WHERE job_id = :job_id"),
+        {"created_at": datetime(2099, 1, 15, tzinfo=timezone.utc), "job_id": job.id}
+    )
+    db.commit()
+
+    assert _partition_of(db, job.id) == findings_partitions.DEFAULT_PARTITION
+
+
+def test_create_partition_moves_rows_out_of_default(db, make_job, migrated_engine, far_month):
+    job = make_job(status=JobStatus.RUNNING)
+    ScannerService.bulk_insert_findings(db, job.id, "Nuclei", [
+        {"severity": FindingSeverity.HIGH, "title": f"Finding {i}"} for i in range(3)
+    ])
+    db.execute(
+        text("UPDATE findings SET created_at = :created_at WHERE job_id = :job_id"),
+        {"created_at": datetime(2099, 1, 31, 23, 59, tzinfo=timezone.utc), "job_id": job.id}
+    )
+    db.commit()
+
+    with migrated_engine.begin() as connection:
+        findings_partitions.create_partition(connection, far_month)
+        # Idempotente: la partición ya está adjunta
+        findings_partitions.create_partition(connection, far_month)
+
+    assert _partition_of(db, job.id) == findings_partitions.partition_name(far_month)
+    assert db.execute(
+        text(f"SELECT count(*) FROM {findings_partitions.DEFAULT_PARTITION}")
+    ).scalar_one() == 0
+    assert db.execute(
+        text("SELECT count(*) FROM findings WHERE job_id = :job_id"), {"job_id": job.id}
+    ).scalar_one() == 3
+
+
+@pytest.fixture
+def expired_month(migrated_engine):
+    month = date(2000, 1, 1)
+    yield month
+    name = findings_partitions.partition_name(month)
+    with migrated_engine.begin() as connection:
+        if month in findings_partitions.attached_partitions(connection):
+            connection.execute(text(f"ALTER TABLE findings DETACH PARTITION {name}"))
+        connection.execute(text(f"DROP TABLE IF EXISTS {name}"))
+
+
+def test_retention_detaches_expired_partitions(migrated_engine, expired_month, monkeypatch):
+    with migrated_engine.begin() as connection:
+        findings_partitions.create_partition(connection, expired_month)
+    monkeypatch.setattr(findings_partitions.settings, "findings_retention_months", 12)
+    monkeypatch.setattr(findings_partitions.settings, "findings_drop_detached", False)
+
+    # findings tiene partición DEFAULT: DETACH ... CONCURRENTLY fallaría
+    findings_partitions.maintain_partitions(migrated_engine)
+
+    name = findings_partitions.partition_name(expired_month)
+    with migrated_engine.connect() as connection:
+        assert expired_month not in findings_partitions.attached_partitions(connection)
+        # Se conserva como tabla independiente para archivar
+        assert connection.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() == name
@@ -0,0 +1,139 @@
+"""
+Tests de los jobs idénticos (líder y seguidores; requieren Postgres: TEST_DATABASE_URL)
+"""
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, select
+
+from app.config import settings
+from app.models import Finding, FindingRollup, FindingSeverity, Job, JobStatus
+from app.routers.targets import delete_target
+from app.services import job_queue, metrics_rollup
+from app.services.scanner_service import ScannerService
+
+_FINDINGS = [
+    {"severity": FindingSeverity.HIGH, "title": "XSS"},
+    {"severity": FindingSeverity.LOW, "title": "Cookie sin Secure"},
+]
+
+
+def _make_group(make_job, followers=2, **leader_columns):
+    """Un líder y `followers` seguidores de usuarios distintos, del más antiguo al más nuevo"""
+    key = job_queue.dedup_key("https://example.com", ["Nuclei"])
+    created_at = datetime.now(timezone.utc) - timedelta(minutes=10)
+    leader = make_job(dedup_key=key, created_at=created_at, **leader_columns)
+    group = [
+        make_job(
+            status=leader.status,
+            started_at=leader.started_at,
+            dedup_key=key,
+            leader_job_id=leader.id,
+            created_at=created_at + timedelta(minutes=i + 1)
+        )
+        for i in range(followers)
+    ]
+    return leader, group
+
+
+def _count_findings(db, job):
+    return db.scalar(select(func.count()).select_from(Finding).where(Finding.job_id == job.id))
+
+
+def test_leader_success_is_copied_to_followers(db, make_job):
+    leader, followers = _make_group(make_job, status=JobStatus.RUNNING, started_at=datetime.now(timezone.utc))
+    ScannerService.bulk_insert_findings(db, leader.id, "Nuclei", _FINDINGS)
+    ScannerService.record_tool_result(db, leader.id, "Nuclei", {"source": "scan"})
+    db.commit()
+    db.refresh(leader)
+
+    leader.status = JobStatus.DONE
+    leader.finished_at = datetime.now(timezone.utc)
+    assert job_queue.finish_followers(db, leader) == 2
+    db.commit()
+
+    for follower in followers:
+        db.refresh(follower)
+        assert follower.status == JobStatus.DONE
+        assert follower.finished_at == leader.finished_at
+        assert follower.tool_results == {"Nuclei": {"source": "scan"}}
+        assert _count_findings(db, follower) == len(_FINDINGS)
+
+    rollup = db.execute(select(FindingRollup.tool, FindingRollup.severity, FindingRollup.count)).all()
+    grouped = metrics_rollup._grouped_findings().subquery()
+    recomputed = db.execute(select(grouped.c.tool, grouped.c.severity, grouped.c["count"])).all()
+    assert sorted(rollup) == sorted(recomputed)
+    assert sum(count for _, _, count in rollup) == 3 * len(_FINDINGS)
+
+
+def test_leader_failure_promotes_oldest_follower(db, make_job):
+    leader, (oldest, newest) = _make_group(make_job, status=JobStatus.RUNNING, started_at=datetime.now(timezone.utc))
+
+    leader.status = JobStatus.FAILED
+    assert job_queue.release_followers(db, leader) == 2
+    db.commit()
+
+    db.refresh(oldest)
+    db.refresh(newest)
+    assert (oldest.status, oldest.leader_job_id, oldest.started_at) == (JobStatus.QUEUED, None, None)
+    assert (newest.status, newest.leader_job_id) == (JobStatus.QUEUED, oldest.id)
+
+    # El nuevo líder es el que reclama un worker
+    claimed = job_queue.claim_jobs(db, "worker-1", limit=10)
+    assert [job.job_id for job in claimed] == [str(oldest.id)]
+
+
+def test_stale_leader_requeue_keeps_followers_attached(db, make_job):
+    long_ago = datetime.now(timezone.utc) - timedelta(hours=1)
+    leader, followers = _make_group(
+        make_job,
+        status=JobStatus.RUNNING,
+        started_at=long_ago,
+        heartbeat_at=long_ago,
+        worker_id="worker-muerto",
+        attempts=1
+    )
+
+    assert job_queue.requeue_stale_jobs(db) == 1
+
+    db.expire_all()
+    assert leader.status == JobStatus.QUEUED
+    for follower in followers:
+        assert (follower.status, follower.leader_job_id) == (JobStatus.QUEUED, leader.id)
+
+
+def test_stale_leader_at_max_attempts_promotes_followers(db, make_job):
+    long_ago = datetime.now(timezone.utc) - timedelta(hours=1)
+    leader, (oldest, newest) = _make_group(
+        make_job,
+        status=JobStatus.RUNNING,
+        started_at=long_ago,
+        heartbeat_at=long_ago,
+        worker_id="worker-muerto",
+        attempts=settings.worker_max_attempts
+    )
+
+    assert job_queue.requeue_stale_jobs(db) == 1
+
+    db.expire_all()
+    assert leader.status == JobStatus.FAILED
+    assert (oldest.status, oldest.leader_job_id) == (JobStatus.QUEUED, None)
+    assert (newest.status, newest.leader_job_id) == (JobStatus.QUEUED, oldest.id)
+
+
+def test_deleting_leader_target_promotes_followers(db, make_job):
+    leader, (oldest, newest) = _make_group(make_job)
+    # Otro job del mismo target que sigue al líder: se elimina con él
+    same_target = make_job(
+        target=leader.target,
+        dedup_key=leader.dedup_key,
+        leader_job_id=leader.id,
+        created_at=leader.created_at + timedelta(seconds=1)
+    )
+    same_target_id = same_target.id
+
+    delete_target(target_id=str(leader.target_id), current_user=leader.user, db=db)
+
+    db.expire_all()
+    assert db.get(Job, same_target_id) is None
+    assert (oldest.status, oldest.leader_job_id) == (JobStatus.QUEUED, None)
+    assert (newest.status, newest.leader_job_id) == (JobStatus.QUEUED, oldest.id)
@@ -0,0 +1,88 @@
+"""
+Tests de la caché de /metrics y su listener de invalidaciones
+"""
+import asyncio
+import uuid
+
+import pytest
+
+from app.services import metrics_cache as cache_module
+from app.services import metrics_service
+from app.services.metrics_cache import MetricsInvalidationListener, metrics_cache
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    cache_module.reset_metrics_cache(enabled=False)
+    yield
+    cache_module.reset_metrics_cache(enabled=False)
+
+
+def test_cache_does_not_store_while_disabled():
+    user_id = uuid.uuid4()
+    generation = metrics_cache.generation(user_id)
+
+    response = metrics_cache.set(user_id, generation, "/metrics/summary", b"{}")
+
+    assert response.etag
+    assert metrics_cache.get(user_id, generation, "/metrics/summary") is None
+
+
+def test_listener_reconnect_drops_entries_cached_without_invalidations(monkeypatch):
+    user_id = uuid.uuid4()
+    drop = asyncio.Event()
+    reconnect = asyncio.Event()
+    attempts = []
+
+    class FakeConnection:
+        async def add_listener(self, channel, callback):
+            pass
+
+        async def execute(self, query):
+            await drop.wait()
+            drop.clear()
+            raise ConnectionError("conexión cerrada")
+
+        def is_closed(self):
+            return False
+
+        async def close(self):
+            pass
+
+    async def connect(dsn):
+        attempts.append(dsn)
+        if len(attempts) > 1:
+            await reconnect.wait()
+        return FakeConnection()
+
+    async def wait_for(condition):
+        while not condition():
+            await asyncio.sleep(0.001)
+
+    async def scenario():
+        listener = MetricsInvalidationListener("postgresql://test", keepalive_seconds=0.01)
+        listener.start()
+        try:
+            await wait_for(lambda: listener.connected)
+            generation = metrics_cache.generation(user_id)
+            metrics_cache.set(user_id, generation, "/metrics/summary", b"{}")
+            assert metrics_cache.get(user_id, generation, "/metrics/summary") is not None
+            metrics_service._inflight[user_id] = asyncio.get_running_loop().create_future()
+
+            drop.set()
+            await wait_for(lambda: not listener.connected)
+            # Sin LISTEN nada se cachea: no llegarían sus invalidaciones
+            assert metrics_cache.get(user_id, generation, "/metrics/summary") is None
+            assert user_id not in metrics_service._inflight
+            generation = metrics_cache.generation(user_id)
+            metrics_cache.set(user_id, generation, "/metrics/summary", b"{}")
+            assert metrics_cache.get(user_id, generation, "/metrics/summary") is None
+
+            reconnect.set()
+            await wait_for(lambda: listener.connected)
+            assert metrics_cache.enabled
+        finally:
+            await listener.stop()
+
+    monkeypatch.setattr(cache_module.asyncpg, "connect", connect)
+    asyncio.run(scenario())
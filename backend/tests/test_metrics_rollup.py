@@ -0,0 +1,71 @@
+"""
+Tests del rollup de métricas (requieren Postgres: TEST_DATABASE_URL)
+"""
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+
+from app.models import FindingRollup, FindingSeverity, JobStatus
+from app.services import job_queue, metrics_rollup
+from app.services.scanner_service import ScannerService
+
+_FINDINGS = [
+    {"severity": FindingSeverity.HIGH, "title": "XSS"},
+    {"severity": FindingSeverity.HIGH, "title": "SQLi"},
+    {"severity": FindingSeverity.LOW, "title": "Cookie sin Secure"},
+]
+
+
+def _rollup(db):
+    """Contadores del rollup por (tool, severidad)"""
+    rows = db.execute(select(FindingRollup.tool, FindingRollup.severity, FindingRollup.count)).all()
+    return {(tool, severity): count for tool, severity, count in rows}
+
+
+def _recomputed(db):
+    """Los mismos contadores calculados desde la tabla findings"""
+    grouped = metrics_rollup._grouped_findings().subquery()
+    rows = db.execute(select(grouped.c.tool, grouped.c.severity, grouped.c["count"])).all()
+    return {(tool, severity): count for tool, severity, count in rows}
+
+
+def test_rollup_matches_findings_after_requeue(db, make_job):
+    long_ago = datetime.now(timezone.utc) - timedelta(hours=1)
+    finished = make_job(status=JobStatus.DONE)
+    # Mismo usuario y target: comparten filas del rollup con el job huérfano
+    stale = make_job(
+        target=finished.target,
+        status=JobStatus.RUNNING,
+        started_at=long_ago,
+        heartbeat_at=long_ago,
+        worker_id="worker-muerto",
+        attempts=1
+    )
+
+    for job in (finished, stale):
+        ScannerService.bulk_insert_findings(db, job.id, "Nuclei", _FINDINGS)
+    db.commit()
+    assert _rollup(db) == _recomputed(db) == {
+        ("Nuclei", FindingSeverity.HIGH): 4,
+        ("Nuclei", FindingSeverity.LOW): 2,
+    }
+
+    assert job_queue.requeue_stale_jobs(db) == 1
+
+    db.expire_all()
+    assert stale.status == JobStatus.QUEUED
+    assert _rollup(db) == _recomputed(db) == {
+        ("Nuclei", FindingSeverity.HIGH): 2,
+        ("Nuclei", FindingSeverity.LOW): 1,
+    }
+
+
+def test_rollup_rows_removed_when_requeued_job_was_the_only_source(db, make_job):
+    long_ago = datetime.now(timezone.utc) - timedelta(hours=1)
+    stale = make_job(status=JobStatus.RUNNING, started_at=long_ago, heartbeat_at=long_ago, attempts=1)
+    ScannerService.bulk_insert_findings(db, stale.id, "ZAP", _FINDINGS)
+    db.commit()
+
+    assert job_queue.requeue_stale_jobs(db) == 1
+
+    assert _rollup(db) == _recomputed(db) == {}
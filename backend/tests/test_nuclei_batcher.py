@@ -0,0 +1,18 @@
+"""
+Tests del agrupador de lotes de Nuclei
+"""
+import pytest
+
+from app.services.scanners.nuclei_batcher import NucleiBatcher
+
+
+def test_batch_rejected_by_stopped_executor_fails_its_requests():
+    batcher = NucleiBatcher(max_targets=1, max_wait=0.01, concurrency=1)
+    # Como si shutdown() llegara justo después de sacar el lote de la cola
+    batcher._executor.shutdown()
+
+    request = batcher.submit("https://example.com")
+
+    with pytest.raises(RuntimeError):
+        list(request.lines())
+    batcher.shutdown()
@@ -0,0 +1,72 @@
+"""
+Tests de la paginación por cursor (keyset)
+"""
+import base64
+import json
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from app.models.finding import FindingSeverity
+from app.routers.jobs import _FINDING_CURSOR, _JOB_CURSOR, _parse_cursor
+from app.utils.pagination import decode_cursor, encode_cursor
+
+
+def _raw_cursor(values) -> str:
+    """Cursor construido a mano, como lo haría un cliente que lo manipula"""
+    raw = json.dumps(values).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2024, 5, 17, 10, 30, 0, 123456, tzinfo=timezone.utc)
+    job_id = uuid.uuid4()
+
+    cursor = encode_cursor([created_at.isoformat(), job_id])
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor, 2) == [created_at.isoformat(), str(job_id)]
+    assert _parse_cursor(cursor, *_JOB_CURSOR) == [created_at, job_id]
+
+
+def test_findings_cursor_round_trip():
+    created_at = datetime(2024, 5, 17, 10, 30, tzinfo=timezone.utc)
+    finding_id = uuid.uuid4()
+
+    cursor = encode_cursor([FindingSeverity.HIGH.name, created_at.isoformat(), finding_id])
+
+    assert _parse_cursor(cursor, *_FINDING_CURSOR) == [FindingSeverity.HIGH, created_at, finding_id]
+
+
+@pytest.mark.parametrize("cursor", [
+    "no-es-base64!",
+    base64.urlsafe_b64encode(b"not json").decode("ascii"),
+    _raw_cursor({"created_at": "2024-05-17T10:30:00"}),
+    _raw_cursor(["2024-05-17T10:30:00"]),
+    _raw_cursor([1, 2]),
+    _raw_cursor([None, "3fa85f64-5717-4562-b3fc-2c963f66afa6"]),
+    _raw_cursor([["2024-05-17T10:30:00"], {}]),
+])
+def test_decode_rejects_invalid_cursor(cursor):
+    with pytest.raises(HTTPException) as exc_info:
+        decode_cursor(cursor, 2)
+    assert exc_info.value.status_code == 400
+
+
+@pytest.mark.parametrize("values", [
+    ["ayer", str(uuid.uuid4())],
+    ["2024-05-17T10:30:00", "no-es-un-uuid"],
+])
+def test_parse_rejects_unparseable_values(values):
+    with pytest.raises(HTTPException) as exc_info:
+        _parse_cursor(_raw_cursor(values), *_JOB_CURSOR)
+    assert exc_info.value.status_code == 400
+
+
+def test_parse_rejects_unknown_severity():
+    cursor = _raw_cursor(["SEVERE", "2024-05-17T10:30:00", str(uuid.uuid4())])
+    with pytest.raises(HTTPException) as exc_info:
+        _parse_cursor(cursor, *_FINDING_CURSOR)
+    assert exc_info.value.status_code == 400
@@ -0,0 +1,93 @@
+"""
+Tests de la caché de datos de los scanners y del reciclado del pool precalentado
+"""
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import container_pool, scanner_data as scanner_data_module
+from app.services.container_pool import WarmContainerPool
+from app.services.scanner_data import ScannerDataCache
+
+
+class _FakeContainers:
+    def __init__(self, containers):
+        self._containers = containers
+
+    def list(self, sparse=False):
+        return self._containers
+
+
+def _docker_with_mounts(*sources):
+    """Cliente de Docker falso con un contenedor en marcha por cada montaje"""
+    containers = [
+        SimpleNamespace(attrs={"Mounts": [{"Type": "bind", "Source": source, "Destination": "/templates"}]})
+        for source in sources
+    ]
+    return SimpleNamespace(containers=_FakeContainers(containers))
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(scanner_data_module.settings, "scanner_data_keep_versions", 2)
+    cache = ScannerDataCache(cache_dir=str(tmp_path / "cache"), state_dir=str(tmp_path / "state"))
+    for version in ("v20240101000000", "v20240102000000", "v20240103000000", "v20240104000000"):
+        os.makedirs(cache._version_dir("Nuclei", version))
+    return cache
+
+
+def _versions(cache):
+    return sorted(os.listdir(os.path.join(cache.cache_dir, "nuclei")))
+
+
+def test_prune_keeps_versions_mounted_by_live_containers(cache, monkeypatch):
+    mounted = cache._version_dir("Nuclei", "v20240101000000")
+    monkeypatch.setattr(scanner_data_module, "get_docker_client", lambda: _docker_with_mounts(mounted))
+
+    cache._prune("Nuclei")
+
+    assert _versions(cache) == ["v20240101000000", "v20240103000000", "v20240104000000"]
+
+
+def test_prune_keeps_everything_if_docker_is_unavailable(cache, monkeypatch):
+    def unavailable():
+        raise Exception("daemon caído")
+    monkeypatch.setattr(scanner_data_module, "get_docker_client", unavailable)
+
+    cache._prune("Nuclei")
+
+    assert len(_versions(cache)) == 4
+
+
+def test_maintain_recycles_containers_with_outdated_data(monkeypatch):
+    published = {"version": "v2"}
+    removed = []
+
+    def make_container(name, version):
+        return SimpleNamespace(
+            name=name,
+            status="running",
+            labels={"auditor.templates": version},
+            reload=lambda: None,
+            remove=lambda force: removed.append(name),
+        )
+
+    containers = iter([make_container("old", "v1"), make_container("new", "v2")])
+    monkeypatch.setattr(container_pool, "get_docker_client", lambda: None)
+    pool = WarmContainerPool(
+        name="nuclei",
+        size=2,
+        idle_seconds=900,
+        factory=lambda client, name: next(containers),
+        health_check=lambda container: True,
+        is_current=lambda container: container.labels["auditor.templates"] == published["version"],
+    )
+    # Dos contenedores en uso a la vez y devueltos al pool
+    with pool.lease(timeout=1), pool.lease(timeout=1):
+        pass
+
+    pool.maintain()
+
+    assert removed == ["old"]
+    assert pool.stats() == {"size": 2, "idle": 1, "busy": 0}
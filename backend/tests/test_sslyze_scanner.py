@@ -0,0 +1,97 @@
+"""
+Tests de la normalización de la salida de SSLyze 6
+
+Los fixtures son salidas reales de sslyze 6.0.0 (`SslyzeOutputAsJson`, el
+mismo JSON que `sslyze --json_out -`) contra un servidor TLS local con
+certificado autofirmado; las listas `rejected_cipher_suites` y
+`rejected_curves` se vaciaron para reducir su tamaño.
+"""
+import json
+import os
+
+import pytest
+
+from app.models import FindingSeverity
+from app.services.scanners.sslyze_scanner import SSLyzeScanner
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def _fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES_DIR, name)) as f:
+        return f.read()
+
+
+@pytest.fixture
+def scanner():
+    return SSLyzeScanner()
+
+
+def test_completed_scan(scanner):
+    output = _fixture("sslyze_v6_completed.json")
+
+    findings = scanner.findings_from_output(output)
+
+    assert [finding["title"] for finding in findings] == [
+        "SSL Certificate Information for localhost",
+        "TLS Configuration for localhost",
+    ]
+    assert all(finding["severity"] == FindingSeverity.INFO for finding in findings)
+
+    certificate = json.loads(findings[0]["evidence"])
+    deployment = certificate["certificate_deployments"][0]
+    assert deployment["received_certificate_chain"][0]["subject"]["rfc4514_string"] == "CN=localhost"
+
+    tls = json.loads(findings[1]["evidence"])
+    assert "certificate_info" not in tls
+    assert tls["tls_1_3_cipher_suites"]["is_tls_version_supported"] is True
+    assert tls["heartbleed"] == {"is_vulnerable_to_heartbleed": False}
+
+    assert SSLyzeScanner._is_complete(output)
+
+
+def test_no_connectivity(scanner):
+    output = _fixture("sslyze_v6_no_connectivity.json")
+
+    findings = scanner.findings_from_output(output)
+
+    assert len(findings) == 1
+    assert findings[0]["title"] == "SSLyze Scan Error"
+    assert "localhost:8444" in findings[0]["description"]
+    assert "ServerRejectedConnection" in findings[0]["description"]
+    assert json.loads(findings[0]["evidence"])["scan_status"] == "ERROR_NO_CONNECTIVITY"
+    # Un error de conectividad no se cachea
+    assert not SSLyzeScanner._is_complete(output)
+
+
+def test_failed_scan_command(scanner):
+    data = json.loads(_fixture("sslyze_v6_completed.json"))
+    data["server_scan_results"][0]["scan_result"]["robot"] = {
+        "status": "ERROR",
+        "error_reason": "BUG_IN_SSLYZE",
+        "error_trace": "Traceback (most recent call last): ...",
+        "result": None,
+    }
+    output = json.dumps(data)
+
+    findings = scanner.findings_from_output(output)
+
+    assert findings[-1]["title"] == "SSLyze Scan Errors for localhost"
+    assert json.loads(findings[-1]["evidence"]) == {"robot": "BUG_IN_SSLYZE"}
+    assert "robot" not in json.loads(findings[1]["evidence"])
+    assert not SSLyzeScanner._is_complete(output)
+
+
+def test_invalid_server_string(scanner):
+    output = json.dumps({
+        "server_scan_results": [],
+        "invalid_server_strings": [
+            {"server_string": "no-existe.invalid", "error_message": "Could not resolve hostname"}
+        ],
+    })
+
+    findings = scanner.findings_from_output(output)
+
+    assert [finding["title"] for finding in findings] == ["SSLyze Scan Error"]
+    assert "no-existe.invalid" in findings[0]["description"]
+    assert not SSLyzeScanner._is_complete(output)
@@ -0,0 +1,47 @@
+"""
+Tests de jobs.tool_results (requieren Postgres: TEST_DATABASE_URL)
+"""
+from app.models import JobStatus
+from app.schemas.job import JobResponse
+from app.services.scanner_service import ScannerService
+
+
+def test_record_tool_result_merges_entries_as_object(db, make_job):
+    job = make_job(status=JobStatus.RUNNING, tools=("SSLyze", "Nuclei"))
+    sslyze = {"source": "cache", "scanned_at": "2024-05-17T10:30:00+00:00", "tool_version": "python:6.0.0"}
+    nuclei = {"source": "scan", "scanned_at": "2024-05-17T10:31:00+00:00", "tool_version": "docker:nuclei"}
+
+    ScannerService.record_tool_result(db, job.id, "SSLyze", sslyze)
+    ScannerService.record_tool_result(db, job.id, "Nuclei", nuclei)
+    db.commit()
+    db.refresh(job)
+
+    assert job.tool_results == {"SSLyze": sslyze, "Nuclei": nuclei}
+    # GET /jobs serializa el job con JobResponse
+    assert JobResponse.model_validate(job).tool_results == {"SSLyze": sslyze, "Nuclei": nuclei}
+
+
+def test_record_tool_result_overwrites_same_tool(db, make_job):
+    job = make_job(status=JobStatus.RUNNING, tools=("SSLyze",))
+
+    ScannerService.record_tool_result(db, job.id, "SSLyze", {"source": "scan"})
+    ScannerService.record_tool_result(db, job.id, "SSLyze", {"source": "cache"})
+    db.commit()
+    db.refresh(job)
+
+    assert job.tool_results == {"SSLyze": {"source": "cache"}}
+
+
+def test_record_tool_result_after_requeue(db, make_job):
+    job = make_job(status=JobStatus.RUNNING, tools=("SSLyze",))
+    ScannerService.record_tool_result(db, job.id, "SSLyze", {"source": "scan"})
+    db.commit()
+
+    # requeue_stale_jobs borra el resultado del intento anterior
+    job.tool_results = None
+    db.commit()
+    ScannerService.record_tool_result(db, job.id, "SSLyze", {"source": "cache"})
+    db.commit()
+    db.refresh(job)
+
+    assert job.tool_results == {"SSLyze": {"source": "cache"}}
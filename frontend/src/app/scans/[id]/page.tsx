@@ -3,7 +3,7 @@
 import { useEffect, useState, useRef } from "react";
 import { useRouter, useParams } from "next/navigation";
 import Link from "next/link";
-import { apiFetch } from "@/lib/api";
+import { apiFetch, apiFetchPage } from "@/lib/api";
 import { getToken, clearToken } from "@/lib/auth";
 import { DashboardLayout } from "@/components/layouts/DashboardLayout";
 import { Card } from "@/components/ui/Card";
@@ -42,6 +42,30 @@ const SEVERITY_COLORS: Record<string, string> = {
   CRITICAL: "bg-red-100 text-red-800 border-red-300",
 };
 
+// Orden del listado de findings de la API: severidad, created_at e id descendentes
+const SEVERITY_ORDER = ["INFO", "LOW", "MEDIUM", "HIGH", "CRITICAL"];
+
+function compareFindings(a: Finding, b: Finding): number {
+  const bySeverity = SEVERITY_ORDER.indexOf(b.severity) - SEVERITY_ORDER.indexOf(a.severity);
+  if (bySeverity !== 0) return bySeverity;
+  const byDate = new Date(b.created_at).getTime() - new Date(a.created_at).getTime();
+  if (byDate !== 0) return byDate;
+  return b.id < a.id ? -1 : b.id > a.id ? 1 : 0;
+}
+
+// Refrescar la primera página sin perder las cargadas con "Cargar más"
+function mergeFirstPage(firstPage: Finding[], previous: Finding[]): Finding[] {
+  if (firstPage.length === 0) return firstPage;
+  const refreshed = new Set(firstPage.map((finding) => finding.id));
+  const last = firstPage[firstPage.length - 1];
+  return [
+    ...firstPage,
+    ...previous.filter(
+      (finding) => !refreshed.has(finding.id) && compareFindings(finding, last) > 0
+    ),
+  ];
+}
+
 export default function ScanDetailPage() {
   const router = useRouter();
   const params = useParams();
@@ -52,10 +76,14 @@ export default function ScanDetailPage() {
   const [job, setJob] = useState<Job | null>(null);
   const [target, setTarget] = useState<Target | null>(null);
   const [findings, setFindings] = useState<Finding[]>([]);
+  const [findingsCursor, setFindingsCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [severityFilter, setSeverityFilter] = useState<string>("all");
   
   // Usar refs para mantener referencias a los intervalos y timeouts
   const intervalRef = useRef<NodeJS.Timeout | null>(null);
+  // Tras "Cargar más" el cursor apunta al final de lo cargado y el polling no lo toca
+  const loadedMoreRef = useRef(false);
   const timeoutRef = useRef<NodeJS.Timeout | null>(null);
 
   useEffect(() => {
@@ -79,11 +107,13 @@ export default function ScanDetailPage() {
       try {
         const [jobData, findingsData] = await Promise.all([
           apiFetch<Job>(`/jobs/${jobId}`, { token }),
-          apiFetch<Finding[]>(`/jobs/${jobId}/findings`, { token }),
+          apiFetchPage<Finding>(`/jobs/${jobId}/findings`, null, { token }),
         ]);
 
         setJob(jobData);
-        setFindings(findingsData);
+        setFindings(findingsData.items);
+        setFindingsCursor(findingsData.nextCursor);
+        loadedMoreRef.current = false;
 
         // Fetch target details
         try {
@@ -112,11 +142,16 @@ export default function ScanDetailPage() {
               
               Promise.all([
                 apiFetch<Job>(`/jobs/${jobId}`, { token: currentToken }),
-                apiFetch<Finding[]>(`/jobs/${jobId}/findings`, { token: currentToken }),
+                apiFetchPage<Finding>(`/jobs/${jobId}/findings`, null, { token: currentToken }),
               ])
                 .then(([updatedJobData, updatedFindingsData]) => {
                   setJob(updatedJobData);
-                  setFindings(updatedFindingsData);
+                  if (loadedMoreRef.current) {
+                    setFindings((previous) => mergeFirstPage(updatedFindingsData.items, previous));
+                  } else {
+                    setFindings(updatedFindingsData.items);
+                    setFindingsCursor(updatedFindingsData.nextCursor);
+                  }
                   
                   // Si el job terminó, detener el polling
                   if (updatedJobData.status === "done" || updatedJobData.status === "failed") {
@@ -154,6 +189,23 @@ export default function ScanDetailPage() {
     };
   }, [router, jobId]);
 
+  const loadMoreFindings = async () => {
+    const token = getToken();
+    if (!token || !findingsCursor) return;
+
+    setLoadingMore(true);
+    try {
+      const page = await apiFetchPage<Finding>(`/jobs/${jobId}/findings`, findingsCursor, { token });
+      setFindings((previous) => [...previous, ...page.items]);
+      setFindingsCursor(page.nextCursor);
+      loadedMoreRef.current = true;
+    } catch (err) {
+      console.error("Error fetching findings:", err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const filteredFindings =
     severityFilter === "all"
       ? findings
@@ -269,6 +321,11 @@ export default function ScanDetailPage() {
                 </div>
               ))}
             </div>
+            {findingsCursor && (
+              <p className="mt-4 text-xs text-gray-500">
+                Resumen de los {findings.length} hallazgos cargados; hay más por cargar.
+              </p>
+            )}
           </Card>
         )}
 
@@ -345,6 +402,19 @@ export default function ScanDetailPage() {
                     </div>
                   ))}
                 </div>
+
+                {findingsCursor && (
+                  <div className="mt-4 flex justify-center">
+                    <Button
+                      variant="secondary"
+                      className="!w-auto"
+                      onClick={loadMoreFindings}
+                      isLoading={loadingMore}
+                    >
+                      Cargar más hallazgos
+                    </Button>
+                  </div>
+                )}
               </>
             )}
           </Card>
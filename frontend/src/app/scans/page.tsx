@@ -3,7 +3,7 @@
 import { useEffect, useState, useRef } from "react";
 import { useRouter } from "next/navigation";
 import Link from "next/link";
-import { apiFetch } from "@/lib/api";
+import { apiFetchPage } from "@/lib/api";
 import { getToken, clearToken } from "@/lib/auth";
 import { DashboardLayout } from "@/components/layouts/DashboardLayout";
 import { Card } from "@/components/ui/Card";
@@ -24,12 +24,28 @@ const STATUS_COLORS: Record<string, string> = {
   failed: "bg-red-100 text-red-800",
 };
 
+// Primera página refrescada + jobs más antiguos ya cargados con "Cargar más"
+// (el orden es por created_at descendente, así el cursor sigue siendo válido)
+function mergeFirstPage(firstPage: Job[], previous: Job[]): Job[] {
+  if (firstPage.length === 0) return firstPage;
+  const refreshed = new Set(firstPage.map((job) => job.id));
+  const oldest = new Date(firstPage[firstPage.length - 1].created_at).getTime();
+  return [
+    ...firstPage,
+    ...previous.filter(
+      (job) => !refreshed.has(job.id) && new Date(job.created_at).getTime() < oldest
+    ),
+  ];
+}
+
 export default function ScansPage() {
   const router = useRouter();
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
   const [jobs, setJobs] = useState<Job[]>([]);
   const [statusFilter, setStatusFilter] = useState<string>("all");
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   
   // Usar refs para mantener referencias a los intervalos
   const intervalRef = useRef<NodeJS.Timeout | null>(null);
@@ -50,8 +66,9 @@ export default function ScansPage() {
     const fetchJobs = async () => {
       try {
         const params = statusFilter !== "all" ? `?status_filter=${statusFilter}` : "";
-        const data = await apiFetch<Job[]>(`/jobs${params}`, { token });
+        const { items: data, nextCursor: cursor } = await apiFetchPage<Job>(`/jobs${params}`, null, { token });
         setJobs(data);
+        setNextCursor(cursor);
         setError(null);
         setLoading(false);
         
@@ -74,9 +91,10 @@ export default function ScansPage() {
           }
           
           const currentParams = statusFilter !== "all" ? `?status_filter=${statusFilter}` : "";
-          apiFetch<Job[]>(`/jobs${currentParams}`, { token: currentToken })
-            .then((updatedData) => {
-              setJobs(updatedData);
+          apiFetchPage<Job>(`/jobs${currentParams}`, null, { token: currentToken })
+            .then(({ items: updatedData }) => {
+              // Se refresca la primera página; las siguientes ya cargadas se conservan
+              setJobs((previous) => mergeFirstPage(updatedData, previous));
               
               // Si no hay jobs en ejecución, detener polling (independientemente del filtro)
               const stillHasRunning = updatedData.some((job) => job.status === "running" || job.status === "queued");
@@ -109,6 +127,27 @@ export default function ScansPage() {
     };
   }, [router, statusFilter]);
 
+  const loadMore = async () => {
+    const token = getToken();
+    if (!token || !nextCursor) return;
+
+    setLoadingMore(true);
+    try {
+      const params = statusFilter !== "all" ? `?status_filter=${statusFilter}` : "";
+      const page = await apiFetchPage<Job>(`/jobs${params}`, nextCursor, { token });
+      setJobs((previous) => {
+        const loaded = new Set(previous.map((job) => job.id));
+        return [...previous, ...page.items.filter((job) => !loaded.has(job.id))];
+      });
+      setNextCursor(page.nextCursor);
+      setError(null);
+    } catch (err) {
+      setError((err as Error).message || "Error al cargar escaneos");
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const formatDate = (dateString: string | null) => {
     if (!dateString) return "-";
     return new Date(dateString).toLocaleString("es-ES", {
@@ -227,6 +266,18 @@ export default function ScansPage() {
                 </div>
               </Card>
             ))}
+            {nextCursor && (
+              <div className="flex justify-center">
+                <Button
+                  variant="secondary"
+                  className="!w-auto"
+                  onClick={loadMore}
+                  isLoading={loadingMore}
+                >
+                  Cargar más
+                </Button>
+              </div>
+            )}
           </div>
         )}
       </div>
@@ -1,14 +1,22 @@
 export const API_BASE_URL =
   process.env.NEXT_PUBLIC_API_BASE_URL ?? "http://localhost:8000";
 
+// Header con el cursor de la página siguiente (ausente en la última página)
+export const NEXT_CURSOR_HEADER = "X-Next-Cursor";
+
 type ApiFetchOptions = RequestInit & {
   token?: string | null;
 };
 
-export async function apiFetch<T = unknown>(
+export type Page<T> = {
+  items: T[];
+  nextCursor: string | null;
+};
+
+async function apiRequest<T>(
   path: string,
   { token, headers, ...rest }: ApiFetchOptions = {}
-): Promise<T> {
+): Promise<{ data: T; response: Response }> {
   const response = await fetch(`${API_BASE_URL}${path}`, {
     headers: {
       "Content-Type": "application/json",
@@ -30,6 +38,29 @@ export async function apiFetch<T = unknown>(
     throw new Error(message);
   }
 
-  return data as T;
+  return { data: data as T, response };
+}
+
+export async function apiFetch<T = unknown>(
+  path: string,
+  options: ApiFetchOptions = {}
+): Promise<T> {
+  const { data } = await apiRequest<T>(path, options);
+  return data;
 }
 
+/**
+ * Obtener una página de un listado paginado por cursor.
+ * Si se pasa `cursor`, se añade como parámetro de la URL.
+ */
+export async function apiFetchPage<T = unknown>(
+  path: string,
+  cursor: string | null = null,
+  options: ApiFetchOptions = {}
+): Promise<Page<T>> {
+  const url = cursor
+    ? `${path}${path.includes("?") ? "&" : "?"}cursor=${encodeURIComponent(cursor)}`
+    : path;
+  const { data, response } = await apiRequest<T[]>(url, options);
+  return { items: data, nextCursor: response.headers.get(NEXT_CURSOR_HEADER) };
+}
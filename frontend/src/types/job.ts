@@ -1,5 +1,11 @@
 export type JobStatus = "queued" | "running" | "done" | "failed";
 
+export interface ToolResult {
+  source: "scan" | "cache";
+  scanned_at: string;
+  tool_version: string;
+}
+
 export interface Job {
   id: string;
   user_id: string;
@@ -9,6 +15,8 @@ export interface Job {
   created_at: string;
   started_at: string | null;
   finished_at: string | null;
+  tool_results: Record<string, ToolResult> | null;
+  leader_job_id: string | null;
 }
 
 export interface JobCreate {